@@ -1,32 +1,245 @@
-import pandas as pd
+"""
+Equipment Data Profiler
+
+Profiles every column of the equipment store and saves the result as a JSON
+profile the chatbot can load instead of re-profiling. Each column is read one
+chunk at a time and every statistic is updated from that chunk in the same pass;
+columns are spread across a process pool, with each worker memory-mapping the
+store itself so no column data is pickled between processes.
+
+Exact mode keeps a set of distinct values per column. Approximate mode replaces it
+with a HyperLogLog sketch, so memory per column is constant for very large exports.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from equipment_aggregates import file_hash
+from equipment_dataset import DATA_DIR, STORE_PATH, load_equipment_table
+
+PROFILE_PATH = os.path.join(DATA_DIR, 'equipment_profile.json')
+
+# Rows per column chunk processed in one pass
+CHUNK_ROWS = 500000
+# Sample values kept per text column
+SAMPLE_SIZE = 3
+# HyperLogLog precision: 2**14 registers, ~0.8% standard error
+HLL_PRECISION = 14
+
+
+class HyperLogLog:
+    """HyperLogLog distinct-count sketch updated from vectors of 64-bit hashes."""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        """Fold an array of uint64 hashes into the sketch."""
+        if len(hashes) == 0:
+            return
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << (64 - p)) - 1)
+        # Rank = position of the leftmost 1-bit in the remaining 64-p bits
+        _, bit_length = np.frexp(remainder.astype(np.float64))
+        rank = (64 - p) - bit_length + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+
+class ColumnProfile:
+    """Single-pass accumulator for one column's statistics."""
+
+    def __init__(self, name, arrow_type, approximate=False, sample_size=SAMPLE_SIZE, seed=0):
+        self.name = name
+        self.arrow_type = arrow_type
+        self.numeric = pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type)
+        self.approximate = approximate
+        self.non_null = 0
+        self.nulls = 0
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+        self.distinct = HyperLogLog() if approximate else set()
+        self.sample = []
+        self.sample_size = sample_size
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, chunk):
+        """Update every statistic from one Arrow array chunk."""
+        if pa.types.is_dictionary(chunk.type):
+            chunk = chunk.cast(chunk.type.value_type)
+        self.nulls += chunk.null_count
+        valid = pc.drop_null(chunk)
+        seen_before = self.non_null
+        self.non_null += len(valid)
+        if len(valid) == 0 or pa.types.is_null(valid.type):
+            return
+
+        values = valid.to_numpy(zero_copy_only=False)
+        if self.numeric:
+            low, high = values.min(), values.max()
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+            self.total += float(values.sum(dtype=np.float64))
+
+        if self.approximate:
+            self.distinct.add_hashes(pd.util.hash_array(values))
+        else:
+            self.distinct.update(pc.unique(valid).to_pylist())
+
+        if not self.numeric:
+            self._reservoir(values, seen_before)
+
+    def _reservoir(self, values, seen_before):
+        """Reservoir-sample (Algorithm R) text values across chunks."""
+        k = self.sample_size
+        fill = max(0, min(k - len(self.sample), len(values)))
+        self.sample.extend(str(v) for v in values[:fill])
+        if fill == len(values):
+            return
+        # Item t (1-based over the whole column) replaces slot j when j = randint(0, t) < k
+        positions = np.arange(seen_before + fill + 1, seen_before + len(values) + 1)
+        slots = (self.rng.random(len(positions)) * positions).astype(np.int64)
+        for offset in np.flatnonzero(slots < k):
+            self.sample[slots[offset]] = str(values[fill + offset])
+
+    def result(self):
+        distinct = self.distinct.estimate() if self.approximate else len(self.distinct)
+        profile = {
+            'name': self.name,
+            'type': str(self.arrow_type),
+            'non_null_count': self.non_null,
+            'null_count': self.nulls,
+            'unique_count': distinct,
+            'unique_count_is_estimate': self.approximate,
+        }
+        if self.numeric and self.non_null:
+            profile['min'] = self.minimum.item() if hasattr(self.minimum, 'item') else self.minimum
+            profile['max'] = self.maximum.item() if hasattr(self.maximum, 'item') else self.maximum
+            profile['mean'] = self.total / self.non_null
+        elif not self.numeric:
+            profile['sample_values'] = self.sample
+        return profile
+
+
+def profile_column(store_path, name, approximate=False, chunk_rows=CHUNK_ROWS, seed=0):
+    """
+    Profile one column of the store in a single chunked pass.
+
+    Runs inside pool workers: the store is memory-mapped by the worker, so only the
+    column name travels between processes.
+
+    Returns:
+        dict: The column profile
+    """
+    column = load_equipment_table(store_path).column(name)
+    accumulator = ColumnProfile(name, column.type, approximate=approximate, seed=seed)
+    for chunk in column.chunks:
+        for start in range(0, len(chunk), chunk_rows):
+            accumulator.update(chunk.slice(start, chunk_rows))
+    return accumulator.result()
+
+
+def build_profile(store_path=STORE_PATH, output=PROFILE_PATH, approximate=False,
+                  workers=None, chunk_rows=CHUNK_ROWS):
+    """
+    Profile every column of the store in parallel and write the JSON profile.
+
+    Args:
+        store_path (str): Equipment store to profile
+        output (str): Destination of the JSON profile
+        approximate (bool): Use HyperLogLog distinct counts instead of exact sets
+        workers (int): Process pool size (defaults to the CPU count)
+        chunk_rows (int): Rows per column chunk
+
+    Returns:
+        dict: The profile
+    """
+    start = time.perf_counter()
+    table = load_equipment_table(store_path)
+    names = table.column_names
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        columns = list(pool.map(
+            profile_column,
+            [store_path] * len(names), names,
+            [approximate] * len(names), [chunk_rows] * len(names), range(len(names))
+        ))
+
+    profile = {
+        'source_hash': file_hash(store_path),
+        'rows': table.num_rows,
+        'approximate': approximate,
+        'seconds': round(time.perf_counter() - start, 2),
+        'columns': columns,
+    }
+    with open(output + '.tmp', 'w') as f:
+        json.dump(profile, f, indent=2)
+    os.replace(output + '.tmp', output)
+    return profile
+
+
+def load_profile(store_path=STORE_PATH, path=PROFILE_PATH):
+    """Return the saved profile if it was built from the current store, else None."""
+    if not os.path.exists(path) or not os.path.exists(store_path):
+        return None
+    with open(path) as f:
+        profile = json.load(f)
+    return profile if profile.get('source_hash') == file_hash(store_path) else None
+
+
+def print_profile(profile):
+    print("\nBasic Information:")
+    print("-----------------")
+    print(f"Number of rows: {profile['rows']}")
+    print(f"Number of columns: {len(profile['columns'])}")
+
+    print("\nColumns and their data types:")
+    print("---------------------------")
+    for col in profile['columns']:
+        approx = " (approx.)" if col['unique_count_is_estimate'] else ""
+        print(f"\nColumn: {col['name']}")
+        print(f"Data type: {col['type']}")
+        print(f"Non-null count: {col['non_null_count']}")
+        print(f"Null count: {col['null_count']}")
+        print(f"Unique values: {col['unique_count']}{approx}")
+
+        # Show sample values for non-numeric columns
+        if 'sample_values' in col:
+            print(f"Sample values: {col['sample_values']}")
+        # Show basic statistics for numeric columns
+        elif 'mean' in col:
+            print(f"Min: {col['min']}")
+            print(f"Max: {col['max']}")
+            print(f"Mean: {col['mean']:.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Profile the equipment dataset")
+    parser.add_argument('--approximate', action='store_true',
+                        help="HyperLogLog distinct counts for very large exports")
+    parser.add_argument('--workers', type=int, default=None, help="Process pool size")
+    args = parser.parse_args()
 
-print("Loading data...")
-df = pd.read_csv('raw data/equipment_data.csv')
-
-print("\nBasic Information:")
-print("-----------------")
-print(f"Number of rows: {len(df)}")
-print(f"Number of columns: {len(df.columns)}")
-
-print("\nColumns and their data types:")
-print("---------------------------")
-for col in df.columns:
-    non_null = df[col].count()
-    null_count = df[col].isnull().sum()
-    unique_count = df[col].nunique()
-    print(f"\nColumn: {col}")
-    print(f"Data type: {df[col].dtype}")
-    print(f"Non-null count: {non_null}")
-    print(f"Null count: {null_count}")
-    print(f"Unique values: {unique_count}")
-    
-    # Show sample values for non-numeric columns
-    if df[col].dtype == 'object':
-        sample_values = df[col].dropna().sample(min(3, unique_count)).tolist()
-        print(f"Sample values: {sample_values}")
-    # Show basic statistics for numeric columns
-    elif np.issubdtype(df[col].dtype, np.number):
-        print(f"Min: {df[col].min()}")
-        print(f"Max: {df[col].max()}")
-        print(f"Mean: {df[col].mean():.2f}")
+    print("Profiling data...")
+    profile = build_profile(approximate=args.approximate, workers=args.workers)
+    print_profile(profile)
+    print(f"\nProfile written to {PROFILE_PATH} in {profile['seconds']}s")
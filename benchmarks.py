@@ -0,0 +1,402 @@
+"""
+Request Path Benchmarks
+
+Drives the chatbot's request path (query classification, entity extraction and
+process_query), the room planner and the patient recommender headlessly over a
+generated corpus of realistic queries and patient profiles. Streamlit is replaced
+by a stub module whose session_state is a plain attribute dict, so no server is
+needed. Each benchmark reports p50/p99 latency and the memory allocated per call;
+results can be saved as a JSON baseline and later runs compared against it, failing
+when the hot path regresses beyond the tolerance.
+
+Run from the directory holding `raw data/` so project-scoped queries are included:
+
+    python benchmarks.py --save-baseline
+    python benchmarks.py --compare
+"""
+import argparse
+import functools
+import importlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import types
+
+BASELINE_PATH = 'benchmark_baseline.json'
+
+# Corpus sizes and repetitions
+QUERY_COUNT = 2000
+PATIENT_COUNT = 1000
+WARMUP_CALLS = 50
+# Patients per get_recommendations_batch call
+BATCH_SIZE = 100
+
+# Allowed slowdown of p50/p99 against the baseline before a run fails
+TOLERANCE = 0.25
+
+
+class _SessionState(dict):
+    """Dict with attribute access, like st.session_state."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+class _NullElement:
+    """Stands in for any Streamlit element, container or widget; widgets read as unset."""
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __getattr__(self, name):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __bool__(self):
+        return False
+
+
+_NULL = _NullElement()
+
+
+class _StreamlitStub(types.ModuleType):
+    """Headless replacement for the streamlit module."""
+
+    def __init__(self):
+        super().__init__('streamlit')
+        self.session_state = _SessionState()
+
+    def cache_resource(self, func=None, max_entries=None, **kwargs):
+        if func is None:
+            return functools.lru_cache(maxsize=max_entries)
+        return functools.lru_cache(maxsize=None)(func)
+
+    cache_data = cache_resource
+
+    def chat_input(self, *args, **kwargs):
+        return None
+
+    def columns(self, spec, **kwargs):
+        return [_NULL] * (spec if isinstance(spec, int) else len(spec))
+
+    def __getattr__(self, name):
+        return _NULL
+
+
+def load_chatbot():
+    """Import equipment_chatbot against the Streamlit stub and return the module."""
+    if not isinstance(sys.modules.get('streamlit'), _StreamlitStub):
+        sys.modules['streamlit'] = _StreamlitStub()
+        sys.modules.pop('equipment_chatbot', None)
+        sys.modules.pop('model_viewer_3d', None)
+    return importlib.import_module('equipment_chatbot')
+
+
+def _has_equipment_data():
+    from equipment_dataset import STORE_PATH, find_source
+    return os.path.exists(STORE_PATH) or find_source() is not None
+
+
+def build_query_corpus(count=QUERY_COUNT, seed=0, include_data_queries=True):
+    """
+    Generate chat queries in roughly the mix users send.
+
+    Args:
+        count (int): Number of queries
+        seed (int): Random seed, so baselines compare like with like
+        include_data_queries (bool): Include project-scoped queries, which read the
+            equipment dataset
+
+    Returns:
+        list: Query strings
+    """
+    from equipment_chatbot import get_projects
+    from room_planner import RoomPlanner
+
+    rng = random.Random(seed)
+    projects = get_projects()
+    rooms = list(RoomPlanner().room_dimensions) + ['intensive care unit', 'OR', 'ER', 'lab', 'patient room']
+    templates = [
+        lambda: f"What equipment do I need in an {rng.choice(rooms)}?",
+        lambda: f"Help me plan a {rng.choice(rooms)} of {rng.randrange(150, 900, 10)} sq ft",
+        lambda: f"Where should I put the monitors in the {rng.choice(rooms)}?",
+        lambda: f"What's the room layout for a {rng.choice(rooms)} with {rng.randrange(150, 900, 10)} square feet",
+        lambda: "Can you help me plan a room?",
+        lambda: "What project options can I view data for?",
+        lambda: "List all projects",
+        lambda: "I need patient-specific equipment recommendations",
+        lambda: "Recommend for my patient based on condition",
+        lambda: "How many defibrillators are there?",
+        lambda: "Hello, what can you do?",
+    ]
+    if include_data_queries:
+        templates += [
+            lambda: f"Show equipment for project id {rng.randint(1, len(projects) + 1)}",
+            lambda: f"project {rng.randint(1, len(projects))} equipment status",
+            lambda: "Show results for all projects",
+            lambda: f"Which project id is {rng.choice(projects)['name']}? project 0",
+        ]
+    return [rng.choice(templates)() for _ in range(count)]
+
+
+def build_patient_corpus(count=PATIENT_COUNT, seed=0):
+    """
+    Generate patient profiles shaped like the patient form's output.
+
+    Conditions mix the form's display labels with knowledge-base keys so both the
+    matching and the non-matching lookup paths are exercised.
+
+    Returns:
+        list: patient_data dicts for PatientRecommender.get_recommendations
+    """
+    from patient_recommender import PatientRecommender
+
+    rng = random.Random(seed)
+    recommender = PatientRecommender()
+    conditions = list(recommender.condition_equipment_map)
+    conditions += [key.replace('_', ' ').title() for key in conditions]
+    needs = [key.replace('_', ' ').title() for key in recommender.clinical_needs_map]
+    treatments = [key.replace('_', ' ').title() for key in recommender.treatment_equipment_map]
+    patients = []
+    for _ in range(count):
+        patients.append({
+            'demographics': {
+                'age': rng.randint(0, 100),
+                'weight': rng.randint(3, 200),
+                'height': rng.randint(50, 200),
+            },
+            'conditions': rng.sample(conditions, rng.randint(0, 6)),
+            'clinical_needs': rng.sample(needs, rng.randint(0, 2)),
+            'treatments': rng.sample(treatments, rng.randint(0, 2)),
+            'acuity': rng.randint(1, 5),
+        })
+    return patients
+
+
+def build_learned_scorer(patients, seed=0):
+    """
+    Train a learned scorer on synthetic allocations.
+
+    Each patient's allocation is most of its top rule recommendations, so the
+    model has real structure to fit. The artifact is saved to a temporary
+    directory and read back from it, as in production, before the directory is
+    removed.
+    """
+    import tempfile
+
+    from learned_recommender import LearnedScorer, train
+    from patient_recommender import PatientRecommender
+
+    rng = random.Random(seed)
+    recommender = PatientRecommender(use_memo=False)
+    allocations = [[item['name'] for item in recommender.get_recommendations(patient, top_k=6)['recommendations']
+                    if rng.random() < 0.9] for patient in patients]
+    with tempfile.TemporaryDirectory(prefix='learned_scorer_') as directory:
+        path = os.path.join(directory, 'learned_recommender.npz')
+        train(patients, allocations, recommender).save(path)
+        scorer = LearnedScorer(path)
+        scorer.equipment  # Load the artifact while it still exists
+    return scorer
+
+
+def _percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def measure(func, calls, warmup=WARMUP_CALLS, setup=None):
+    """
+    Time func over a list of argument tuples, then re-run it under tracemalloc.
+
+    Latency and allocation are measured in separate passes so tracing overhead
+    does not inflate the timings.
+
+    Args:
+        func (callable): Function under test
+        calls (list): Argument tuples, one per call
+        warmup (int): Untimed calls made first
+        setup (callable): Called before each pass (e.g. to clear a cache)
+
+    Returns:
+        dict: calls, p50/p99/mean latency in microseconds and mean peak KiB per call
+    """
+    for args in calls[:warmup]:
+        func(*args)
+
+    if setup:
+        setup()
+    timings = []
+    for args in calls:
+        start = time.perf_counter_ns()
+        func(*args)
+        timings.append(time.perf_counter_ns() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    allocated = 0
+    for args in calls:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func(*args)
+        allocated += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'calls': len(calls),
+        'p50_us': round(_percentile(timings, 50) / 1000, 2),
+        'p99_us': round(_percentile(timings, 99) / 1000, 2),
+        'mean_us': round(sum(timings) / len(timings) / 1000, 2),
+        'kib_per_call': round(allocated / len(calls) / 1024, 2),
+    }
+
+
+def _selected(name, names):
+    return not names or any(part in name for part in names)
+
+
+def benchmark_suite(query_count=QUERY_COUNT, patient_count=PATIENT_COUNT, seed=0, names=None):
+    """
+    Build the named benchmarks.
+
+    Args:
+        names (list): Only build benchmarks whose name contains one of these (the
+            learned scorer is trained only when one of its benchmarks is selected)
+
+    Returns:
+        dict: name -> (func, calls, setup) as taken by measure()
+    """
+    chatbot = load_chatbot()
+    from patient_recommender import PatientRecommender, get_recommendation_memo
+    from room_planner import RoomPlanner
+
+    with_data = _has_equipment_data()
+    if not with_data:
+        print("No equipment data found; project-scoped queries are left out of the corpus")
+    queries = [(q,) for q in build_query_corpus(query_count, seed, include_data_queries=with_data)]
+    patients = [(p,) for p in build_patient_corpus(patient_count, seed)]
+    patient_batches = [([p for p, in patients[i:i + BATCH_SIZE]],) for i in range(0, len(patients), BATCH_SIZE)]
+
+    planner = RoomPlanner()
+    rng = random.Random(seed)
+    room_calls = [(rng.choice(list(planner.room_type_synonyms) + ['ICU', 'Operating Room', 'morgue']),
+                   rng.choice([None, rng.randrange(100, 1000, 10)]))
+                  for _ in range(query_count)]
+
+    suite = {
+        'classify_query': (chatbot.classify_query, queries, None),
+        'extract_project_id': (chatbot.extract_project_id, queries, None),
+        'extract_room_planning_info': (chatbot.extract_room_planning_info, queries, None),
+        # Cold cache at the start of each pass; repeated intents then hit it as in production
+        'process_query': (chatbot.process_query, queries, chatbot.get_response_cache().clear),
+        'answer_query': (chatbot.answer_query, queries, None),
+        'RoomPlanner.get_equipment_recommendations': (planner.get_equipment_recommendations, room_calls, None),
+        # The memo would turn every pass after the first into hits, so the scoring paths run without it
+        'PatientRecommender.get_recommendations': (PatientRecommender(use_memo=False).get_recommendations,
+                                                   patients, None),
+        'PatientRecommender.get_recommendations(top_k=10)': (
+            functools.partial(PatientRecommender(use_memo=False).get_recommendations, top_k=10), patients, None),
+        'PatientRecommender.get_recommendations(memo)': (PatientRecommender().get_recommendations, patients,
+                                                         get_recommendation_memo().clear),
+        'PatientRecommender.get_recommendations_batch': (PatientRecommender(use_memo=False).get_recommendations_batch,
+                                                         patient_batches, None),
+    }
+    # Batch inference of the learned scorer, alone and blended into top-10 lists
+    learned_names = ('LearnedScorer.predict_proba', 'LearnedScorer.recommend_batch')
+    if any(_selected(name, names) for name in learned_names):
+        learned = build_learned_scorer([p for p, in patients], seed)
+        suite['LearnedScorer.predict_proba'] = (learned.predict_proba, patient_batches, None)
+        suite['LearnedScorer.recommend_batch'] = (learned.recommend_batch, patient_batches, None)
+    return suite
+
+
+def run(names=None, query_count=QUERY_COUNT, patient_count=PATIENT_COUNT, seed=0):
+    """Run the suite (or the benchmarks whose names contain one of `names`) and return results."""
+    results = {}
+    for name, (func, calls, setup) in benchmark_suite(query_count, patient_count, seed, names).items():
+        if not _selected(name, names):
+            continue
+        results[name] = measure(func, calls, setup=setup)
+        print(f"{name:<50} p50 {results[name]['p50_us']:>9.1f}us  p99 {results[name]['p99_us']:>9.1f}us  "
+              f"{results[name]['kib_per_call']:>8.1f} KiB/call")
+    return results
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    baseline = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'created_at': time.time(),
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2)
+
+
+def compare(results, path=BASELINE_PATH, tolerance=TOLERANCE):
+    """
+    Compare results against a saved baseline.
+
+    Returns:
+        list: Descriptions of every metric slower than baseline * (1 + tolerance)
+    """
+    with open(path) as f:
+        baseline = json.load(f)['results']
+
+    regressions = []
+    print(f"\nAgainst baseline {path}:")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in ('p50_us', 'p99_us', 'kib_per_call'):
+            old, new = baseline[name][metric], result[metric]
+            ratio = new / old if old else 1.0
+            flag = ''
+            if ratio > 1 + tolerance:
+                flag = '  REGRESSION'
+                regressions.append(f"{name} {metric}: {old} -> {new}")
+            print(f"  {name:<50} {metric:<13} {old:>9.1f} -> {new:>9.1f} ({ratio:.2f}x){flag}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the chatbot request path")
+    parser.add_argument('names', nargs='*', help="Only run benchmarks whose name contains one of these")
+    parser.add_argument('--queries', type=int, default=QUERY_COUNT, help="Chat queries in the corpus")
+    parser.add_argument('--patients', type=int, default=PATIENT_COUNT, help="Patient profiles in the corpus")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save-baseline', nargs='?', const=BASELINE_PATH, metavar='PATH',
+                        help="Store the results as the baseline")
+    parser.add_argument('--compare', nargs='?', const=BASELINE_PATH, metavar='PATH',
+                        help="Compare against a baseline; exit non-zero on regression")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="Allowed fractional slowdown before a metric counts as a regression")
+    args = parser.parse_args()
+
+    results = run(args.names, args.queries, args.patients, args.seed)
+    if args.save_baseline:
+        save_baseline(results, args.save_baseline)
+        print(f"\nBaseline written to {args.save_baseline}")
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s):")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
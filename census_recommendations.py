@@ -0,0 +1,221 @@
+"""
+Streaming Census Recommendations
+
+Batch entry point for capacity planning: streams patient rows from a CSV or
+Parquet census file through PatientRecommender in fixed-size chunks spread over a
+process pool, and writes each patient's top-N equipment plus the aggregated
+equipment demand per unit. Only a bounded number of chunks is in flight at once
+and per-patient results are appended to the output as they arrive, so memory use
+depends on the chunk size, not on the size of the census. With learned=True
+(--learned) and a trained learned scorer (see learned_recommender), priority
+scores are its blend of rule and learned scores; otherwise they are the rule
+scores of get_recommendations().
+
+Census columns (missing optional columns fall back to the recommender defaults):
+patient_id, unit, conditions, age, weight, height, acuity, clinical_needs,
+treatments. List columns are Parquet lists or separator-joined strings
+("Sepsis;Diabetes").
+"""
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from patient_recommender import PatientRecommender
+
+# Patients per chunk handed to a worker
+CHUNK_ROWS = 20000
+# Recommendations kept per patient
+TOP_N = 10
+LIST_SEPARATOR = ';'
+UNASSIGNED_UNIT = 'Unassigned'
+
+LIST_COLUMNS = ['conditions', 'clinical_needs', 'treatments']
+DEMOGRAPHIC_COLUMNS = ['age', 'weight', 'height']
+
+PATIENT_OUTPUT = 'patient_recommendations.csv'
+DEMAND_OUTPUT = 'unit_demand.csv'
+
+
+def iter_census_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yield the census file as DataFrames of at most chunk_rows rows."""
+    if path.lower().endswith('.parquet'):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype={'patient_id': str, 'unit': str})
+
+
+def _as_list(value, separator):
+    """Normalize a list cell (array, list, joined string or null) to a list of labels."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(separator) if item.strip()]
+    if isinstance(value, float) and value != value:  # NaN
+        return []
+    # Parquet list cells arrive as NumPy arrays of str
+    return value.tolist() if hasattr(value, 'tolist') else [str(item) for item in value]
+
+
+def census_patients(chunk, separator=LIST_SEPARATOR):
+    """
+    Convert a census chunk into patient_data dicts.
+
+    Returns:
+        list: patient_data dicts for PatientRecommender, in row order
+    """
+    n = len(chunk)
+    lists = {name: [_as_list(v, separator) for v in chunk[name]] if name in chunk else [[]] * n
+             for name in LIST_COLUMNS}
+    demographics = {name: chunk[name].tolist() for name in DEMOGRAPHIC_COLUMNS if name in chunk}
+    acuity = chunk['acuity'].tolist() if 'acuity' in chunk else [None] * n
+
+    patients = []
+    for i in range(n):
+        patient = {name: lists[name][i] for name in LIST_COLUMNS}
+        # Null cells are left out so the recommender's defaults apply
+        patient['demographics'] = {name: values[i] for name, values in demographics.items()
+                                   if not pd.isna(values[i])}
+        if not pd.isna(acuity[i]):
+            patient['acuity'] = int(acuity[i])
+        patients.append(patient)
+    return patients
+
+
+def process_chunk(chunk, top_n=TOP_N, separator=LIST_SEPARATOR, learned=False):
+    """
+    Score one census chunk; runs inside pool workers.
+
+    Args:
+        chunk (DataFrame): Census rows
+        top_n (int): Recommendations kept per patient
+        separator (str): Separator of list cells in CSV files
+        learned (bool): Blend in the learned scorer when one has been trained
+
+    Returns:
+        tuple: (DataFrame of per-patient top-N rows, DataFrame of demand per
+            (unit, equipment) with 'patients' and 'total_priority_score')
+    """
+    recommender = PatientRecommender()
+    results = recommender.get_recommendations_batch(census_patients(chunk, separator), top_k=top_n,
+                                                    learned=learned)
+
+    ids = chunk['patient_id'].astype(str) if 'patient_id' in chunk else pd.Series([''] * len(chunk))
+    units = chunk['unit'].fillna(UNASSIGNED_UNIT).astype(str) if 'unit' in chunk \
+        else pd.Series([UNASSIGNED_UNIT] * len(chunk))
+
+    # Columnar: one list per output column, with each patient's row repeated per item
+    kept = [result['recommendations'] for result in results]
+    counts = [len(items) for items in kept]
+    rows = pd.DataFrame({
+        'patient_id': ids.repeat(counts).to_numpy(),
+        'unit': units.repeat(counts).to_numpy(),
+        'rank': [rank for n in counts for rank in range(1, n + 1)],
+        'equipment': [item['name'] for items in kept for item in items],
+        'priority_score': [item['priority_score'] for items in kept for item in items],
+    })
+    demand = rows.groupby(['unit', 'equipment'], sort=False)['priority_score'].agg(['size', 'sum'])
+    demand.columns = ['patients', 'total_priority_score']
+    return rows, demand
+
+
+def run_census(path, output_dir='.', top_n=TOP_N, chunk_rows=CHUNK_ROWS, workers=None,
+               separator=LIST_SEPARATOR, progress=None, learned=False):
+    """
+    Stream a census file through the recommender and write the two result files.
+
+    Per-patient top-N rows are appended to PATIENT_OUTPUT in input order as each
+    chunk completes; unit demand (patients with the item in their top N and the
+    summed priority score) is written to DEMAND_OUTPUT at the end.
+
+    Args:
+        path (str): Census .csv or .parquet file
+        output_dir (str): Directory for the result files
+        top_n (int): Recommendations kept per patient
+        chunk_rows (int): Patients per chunk
+        workers (int): Process pool size (defaults to the CPU count)
+        separator (str): Separator of list cells in CSV files
+        progress (callable): Called as progress(patients, elapsed_seconds) per chunk
+        learned (bool): Blend in the learned scorer when one has been trained
+
+    Returns:
+        dict: patients, units, seconds and patients_per_second
+    """
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    patient_path = os.path.join(output_dir, PATIENT_OUTPUT)
+    demand = None
+    patients = 0
+
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            open(patient_path + '.tmp', 'w', newline='') as f:
+        f.write('patient_id,unit,rank,equipment,priority_score\n')
+
+        def collect(future, size):
+            nonlocal demand
+            rows, chunk_demand = future.result()
+            rows.to_csv(f, header=False, index=False)
+            # Demand frames are small (units x equipment), so they are merged as they arrive
+            demand = chunk_demand if demand is None else demand.add(chunk_demand, fill_value=0)
+            return size
+
+        # At most two chunks per worker are read ahead, which bounds memory
+        pending = deque()
+        for chunk in iter_census_chunks(path, chunk_rows):
+            pending.append((pool.submit(process_chunk, chunk, top_n, separator, learned), len(chunk)))
+            if len(pending) >= 2 * workers:
+                patients += collect(*pending.popleft())
+                if progress:
+                    progress(patients, time.perf_counter() - start)
+        while pending:
+            patients += collect(*pending.popleft())
+            if progress:
+                progress(patients, time.perf_counter() - start)
+    os.replace(patient_path + '.tmp', patient_path)
+
+    if demand is None:
+        demand = pd.DataFrame(columns=['patients', 'total_priority_score'],
+                              index=pd.MultiIndex.from_tuples([], names=['unit', 'equipment']))
+    # Patient counts are whole numbers; summed scores stay floats (blended scores are fractional)
+    demand = demand.astype({'patients': 'int64', 'total_priority_score': 'float64'})
+    demand['total_priority_score'] = demand['total_priority_score'].round(2)
+    demand_frame = demand.reset_index()
+    demand_frame = demand_frame.sort_values(['unit', 'patients', 'total_priority_score'],
+                                            ascending=[True, False, False], kind='stable')
+    demand_frame.to_csv(os.path.join(output_dir, DEMAND_OUTPUT), index=False)
+
+    elapsed = time.perf_counter() - start
+    return {
+        'patients': patients,
+        'units': demand_frame['unit'].nunique(),
+        'seconds': round(elapsed, 2),
+        'patients_per_second': round(patients / elapsed) if elapsed > 0 else patients
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Census-wide patient equipment recommendations")
+    parser.add_argument('census', help="Patient census .csv or .parquet file")
+    parser.add_argument('--output-dir', default='census_output', help="Directory for the result files")
+    parser.add_argument('--top-n', type=int, default=TOP_N, help="Recommendations kept per patient")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="Patients per chunk")
+    parser.add_argument('--workers', type=int, default=None, help="Process pool size")
+    parser.add_argument('--separator', default=LIST_SEPARATOR, help="Separator of list cells in CSV files")
+    parser.add_argument('--learned', action='store_true',
+                        help="Blend in the trained learned scorer (models/learned_recommender.npz)")
+    args = parser.parse_args()
+
+    print(f"Scoring census {args.census}...")
+    stats = run_census(
+        args.census, args.output_dir, args.top_n, args.chunk_rows, args.workers, args.separator,
+        progress=lambda n, elapsed: print(f"  {n:,} patients ({n / elapsed:,.0f} patients/sec)"),
+        learned=args.learned
+    )
+    print(f"Scored {stats['patients']:,} patients across {stats['units']} units in {stats['seconds']}s "
+          f"({stats['patients_per_second']:,} patients/sec); results in {args.output_dir}")
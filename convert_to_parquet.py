@@ -0,0 +1,186 @@
+"""
+Streaming Excel-to-Parquet Converter
+
+Reads the PHSA equipment export row by row (openpyxl read-only mode) and writes
+fixed-size row batches to a typed, dictionary-encoded Parquet file, so memory use
+is bounded by the batch size rather than by the size of the sheet.
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import load_workbook
+
+SOURCE_WORKBOOK = 'vw_equipment_phsa (2).xlsx'
+OUTPUT_PATH = 'raw data/equipment_data.parquet'
+
+# Rows held in memory before being flushed as one Parquet row group
+BATCH_ROWS = 50000
+# Leading rows used to infer the column types before anything is written
+INFER_ROWS = 10000
+
+
+def _dedupe_headers(header):
+    """Name blank header cells and de-duplicate repeats the way pandas does."""
+    names = []
+    seen = {}
+    for i, value in enumerate(header):
+        name = str(value).strip() if value is not None else ''
+        if not name:
+            name = f'Unnamed: {i}'
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _infer_type(values):
+    """Pick an Arrow type for a column from a sample of its cell values."""
+    kinds = set()
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            kinds.add('bool')
+        elif isinstance(value, (int, float)):
+            # Excel stores every number as a double; openpyxl only hands back ints
+            # for integral values, so keep the column as float64 throughout
+            kinds.add('number')
+        elif isinstance(value, datetime):
+            kinds.add('datetime')
+        else:
+            kinds.add('string')
+
+    if kinds == {'bool'}:
+        return pa.bool_()
+    if kinds == {'number'}:
+        return pa.float64()
+    if kinds == {'datetime'}:
+        return pa.timestamp('us')
+    # Empty and mixed-type columns fall back to (dictionary-encoded) strings
+    return pa.dictionary(pa.int32(), pa.string())
+
+
+def _build_array(name, values, arrow_type):
+    """Convert one column of a batch to an Arrow array of the inferred type."""
+    if pa.types.is_dictionary(arrow_type):
+        strings = [None if v is None else v if isinstance(v, str) else str(v) for v in values]
+        return pa.array(strings, type=pa.string()).dictionary_encode()
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError) as exc:
+        raise ValueError(
+            f"Column '{name}' was inferred as {arrow_type} from the first rows but later "
+            f"rows contain incompatible values ({exc}). Re-run with a larger infer_rows (--infer-rows)."
+        ) from exc
+
+
+def _write_batch(writer, schema, rows):
+    columns = list(zip(*rows))
+    arrays = [_build_array(field.name, columns[i], field.type) for i, field in enumerate(schema)]
+    writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+
+def convert_workbook(source=SOURCE_WORKBOOK, output=OUTPUT_PATH, sheet_name=None,
+                     batch_rows=BATCH_ROWS, infer_rows=INFER_ROWS, progress=None):
+    """
+    Stream an Excel sheet into a Parquet file one batch of rows at a time.
+
+    Args:
+        source (str): Path of the .xlsx workbook
+        output (str): Path of the Parquet file to write
+        sheet_name (str): Worksheet to convert (defaults to the active sheet)
+        batch_rows (int): Number of rows per written row group
+        infer_rows (int): Number of leading rows sampled to infer column types
+        progress (callable): Optional callback receiving (rows_written, elapsed_seconds)
+            after every batch
+
+    Returns:
+        dict: Conversion statistics (rows, columns, seconds, rows_per_second)
+    """
+    start = time.perf_counter()
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.active
+        rows = sheet.iter_rows(values_only=True)
+
+        header = next(rows, None)
+        if header is None:
+            raise ValueError(f"Worksheet in '{source}' is empty")
+        names = _dedupe_headers(header)
+        width = len(names)
+
+        def normalized_rows():
+            for row in rows:
+                # Skip fully blank rows and pad/truncate ragged ones to the header width
+                if row is None or all(v is None for v in row):
+                    continue
+                if len(row) < width:
+                    row = tuple(row) + (None,) * (width - len(row))
+                yield row[:width]
+
+        stream = normalized_rows()
+
+        # Buffer just enough leading rows to fix the schema up front
+        buffer = []
+        for row in stream:
+            buffer.append(row)
+            if len(buffer) >= infer_rows:
+                break
+        sample_columns = list(zip(*buffer)) if buffer else [()] * width
+        schema = pa.schema([
+            pa.field(name, _infer_type(sample_columns[i])) for i, name in enumerate(names)
+        ])
+
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        tmp_output = output + '.tmp'
+        rows_written = 0
+        with pq.ParquetWriter(tmp_output, schema, compression='snappy') as writer:
+            for row in stream:
+                buffer.append(row)
+                if len(buffer) >= batch_rows:
+                    _write_batch(writer, schema, buffer)
+                    rows_written += len(buffer)
+                    buffer = []
+                    if progress:
+                        progress(rows_written, time.perf_counter() - start)
+            if buffer:
+                _write_batch(writer, schema, buffer)
+                rows_written += len(buffer)
+                if progress:
+                    progress(rows_written, time.perf_counter() - start)
+        os.replace(tmp_output, output)
+    finally:
+        workbook.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows_written,
+        'columns': width,
+        'seconds': round(elapsed, 2),
+        'rows_per_second': round(rows_written / elapsed) if elapsed > 0 else rows_written
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stream the Excel equipment export into Parquet")
+    parser.add_argument('source', nargs='?', default=SOURCE_WORKBOOK, help="Source .xlsx workbook")
+    parser.add_argument('output', nargs='?', default=OUTPUT_PATH, help="Output .parquet path")
+    parser.add_argument('--infer-rows', type=int, default=INFER_ROWS,
+                        help="Leading rows sampled to infer column types")
+    args = parser.parse_args()
+    source, output = args.source, args.output
+
+    print(f"Starting conversion of {source}...")
+    stats = convert_workbook(
+        source, output, infer_rows=args.infer_rows,
+        progress=lambda rows, elapsed: print(f"  {rows:,} rows ({rows / elapsed:,.0f} rows/sec)")
+    )
+    print(f"Wrote {stats['rows']:,} rows x {stats['columns']} columns to {output} "
+          f"in {stats['seconds']}s ({stats['rows_per_second']:,} rows/sec)")
@@ -0,0 +1,255 @@
+"""
+Unit Equipment Demand Forecaster
+
+Turns per-patient recommendation scores into the number of devices a unit needs
+concurrently. Each recommended item is treated as in use for a patient with a
+probability that rises with its priority score (which already reflects the
+patient's conditions, treatments and acuity), and unit demand for the item is the
+sum of those per-patient draws.
+
+Patients are streamed in and reduced to, per unit and item, a histogram of how
+many patients have each priority score, so memory does not grow with the census.
+Patients sharing a score share a probability, so a forecast is a vectorized Monte
+Carlo of binomial draws per (item, score) bucket rather than one draw per patient;
+answering "how many IV Pumps does ward X need at the 95th percentile" for
+thousands of patients takes milliseconds.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from equipment_aggregates import LOCATION_COLUMNS
+from equipment_catalog import EQUIPMENT_NAME_COLUMNS, dataset_name_counts, normalize_name
+from patient_recommender import PatientRecommender
+
+# Priority score at which an item is in use for ~63% of patients (1 - e^-1)
+SCORE_SCALE = 5.0
+# Monte Carlo draws per forecast
+SIMULATIONS = 5000
+PERCENTILES = (50, 90, 95, 99)
+
+
+def usage_probability(scores, score_scale=SCORE_SCALE):
+    """Probability that an item with the given priority score is in use for a patient."""
+    return 1.0 - np.exp(-np.asarray(scores, dtype=np.float64) / score_scale)
+
+
+class DemandForecaster:
+    """Accumulates patient score histograms per unit and forecasts concurrent demand."""
+
+    def __init__(self, recommender=None, score_scale=SCORE_SCALE, simulations=SIMULATIONS, seed=0):
+        self.recommender = recommender or PatientRecommender()
+        self.score_scale = score_scale
+        self.simulations = simulations
+        self.seed = seed
+        self.equipment = list(self.recommender.index.equipment)
+        # Normalized name -> row, so "IV pumps" finds "IV Pump"
+        self._rows = {normalize_name(name): row for row, name in enumerate(self.equipment)}
+        # unit -> int array (equipment x score) counting patients with that score
+        self.histograms = {}
+        self.patient_counts = {}
+
+    def add_patients(self, unit, patients):
+        """
+        Add a batch of patients to a unit.
+
+        Args:
+            unit (str): Unit (ward) name
+            patients (iterable): patient_data dicts as taken by PatientRecommender
+        """
+        patients = list(patients)
+        if not patients:
+            return
+        scores, _ = self.recommender.get_score_matrix(patients)
+        coo = scores.tocoo()
+        histogram = self.histograms.get(unit, np.zeros((len(self.equipment), 1), dtype=np.int64))
+        width = int(coo.data.max()) + 1 if coo.nnz else 1
+        if histogram.shape[1] < width:
+            histogram = np.pad(histogram, ((0, 0), (0, width - histogram.shape[1])))
+        np.add.at(histogram, (coo.col, coo.data), 1)
+        self.histograms[unit] = histogram
+        self.patient_counts[unit] = self.patient_counts.get(unit, 0) + len(patients)
+
+    def add_census(self, path, chunk_rows=None):
+        """Stream a census file (see census_recommendations) into the per-unit histograms."""
+        from census_recommendations import CHUNK_ROWS, UNASSIGNED_UNIT, census_patients, iter_census_chunks
+
+        for chunk in iter_census_chunks(path, chunk_rows or CHUNK_ROWS):
+            units = chunk['unit'].fillna(UNASSIGNED_UNIT).astype(str) if 'unit' in chunk \
+                else pd.Series([UNASSIGNED_UNIT] * len(chunk), index=chunk.index)
+            patients = census_patients(chunk)
+            for unit, positions in units.groupby(units.to_numpy()).indices.items():
+                self.add_patients(unit, [patients[i] for i in positions])
+
+    @property
+    def units(self):
+        return list(self.histograms)
+
+    def _histogram(self, unit):
+        histogram = self.histograms.get(unit)
+        if histogram is None:
+            raise ValueError(f"No patients in unit {unit!r}. Units in the census: {', '.join(map(str, self.units))}")
+        return histogram
+
+    def equipment_rows(self, names):
+        """
+        Map equipment names, in any case or plural form, to histogram rows.
+
+        Returns:
+            tuple: (the knowledge base's names for the items, their rows)
+        """
+        rows = []
+        for name in names:
+            row = self._rows.get(normalize_name(name))
+            if row is None:
+                raise ValueError(f"Unknown equipment {name!r}; it is not in the patient equipment knowledge base")
+            rows.append(row)
+        return [self.equipment[row] for row in rows], rows
+
+    def simulate(self, unit, equipment=None):
+        """
+        Draw Monte Carlo samples of concurrent demand for a unit.
+
+        Returns:
+            tuple: (equipment names, int array of simulations x equipment)
+        """
+        histogram = self._histogram(unit)
+        if equipment is None:
+            names, rows = self.equipment, list(range(len(self.equipment)))
+        else:
+            names, rows = self.equipment_rows(equipment)
+        histogram = histogram[rows]
+
+        # One binomial column per non-empty (item, score) bucket, summed back per item
+        items, buckets = np.nonzero(histogram)
+        rng = np.random.default_rng(self.seed)
+        draws = rng.binomial(histogram[items, buckets], usage_probability(buckets, self.score_scale),
+                             size=(self.simulations, len(items)))
+        demand = np.zeros((self.simulations, len(names)), dtype=np.int64)
+        np.add.at(demand.T, items, draws.T)
+        return names, demand
+
+    def forecast(self, unit, equipment=None, percentiles=PERCENTILES):
+        """
+        Forecast concurrent demand for a unit.
+
+        Args:
+            unit (str): Unit name
+            equipment (list): Items to forecast; defaults to every item any patient needs
+            percentiles (tuple): Percentile bands to report
+
+        Returns:
+            pd.DataFrame: One row per item with 'patients' (with a non-zero score),
+                'expected' demand and a 'pNN' column per percentile
+        """
+        histogram = self._histogram(unit)
+        if equipment is None:
+            needed = histogram[:, 1:].any(axis=1)
+            equipment = [name for name, used in zip(self.equipment, needed) if used]
+        names, demand = self.simulate(unit, equipment)
+        histogram = histogram[self.equipment_rows(names)[1]]
+        probabilities = usage_probability(np.arange(histogram.shape[1]), self.score_scale)
+        frame = pd.DataFrame({
+            'equipment': names,
+            'patients': histogram[:, 1:].sum(axis=1),
+            'expected': histogram @ probabilities,
+        })
+        bands = np.percentile(demand, percentiles, axis=0, method='higher')
+        for q, band in zip(percentiles, bands):
+            frame[f'p{q}'] = band.astype(np.int64)
+        return frame.sort_values('expected', ascending=False, kind='stable').reset_index(drop=True)
+
+    def required(self, unit, equipment, percentile=95):
+        """Number of `equipment` devices `unit` needs to cover demand at `percentile`."""
+        _, demand = self.simulate(unit, [equipment])
+        return int(np.percentile(demand[:, 0], percentile, method='higher'))
+
+    def compare_inventory(self, unit, inventory=None, percentile=95):
+        """
+        Compare forecast demand for a unit with the devices on hand.
+
+        Args:
+            unit (str): Unit name
+            inventory (dict): Equipment name -> count; read from the equipment dataset
+                for this unit when omitted
+            percentile (int): Demand percentile to plan for
+
+        Returns:
+            pd.DataFrame: equipment, expected, required, on_hand and shortfall
+        """
+        frame = self.forecast(unit, percentiles=(percentile,))
+        frame = frame.rename(columns={f'p{percentile}': 'required'})
+        if inventory is None:
+            inventory = inventory_counts(frame['equipment'], unit=unit)
+        frame['on_hand'] = [inventory.get(name, 0) for name in frame['equipment']]
+        frame['shortfall'] = (frame['required'] - frame['on_hand']).clip(lower=0)
+        return frame[['equipment', 'expected', 'required', 'on_hand', 'shortfall']]
+
+
+def inventory_counts(equipment_names, unit=None, table=None):
+    """
+    Count devices of each named type in the equipment dataset.
+
+    Names are matched by their equipment_catalog.normalize_name() key (case,
+    punctuation and plurals ignored) against the first EQUIPMENT_NAME_COLUMNS
+    column in the export; with `unit`, rows are limited to those whose first
+    LOCATION_COLUMNS column equals the unit.
+
+    Returns:
+        dict: Equipment name -> count (0 when the export has no matching column)
+    """
+    if table is None:
+        from equipment_dataset import load_equipment_table
+        table = load_equipment_table()
+
+    if not any(name in table.column_names for name in EQUIPMENT_NAME_COLUMNS):
+        return {name: 0 for name in equipment_names}
+    if unit is not None:
+        location_column = next((name for name in LOCATION_COLUMNS if name in table.column_names), None)
+        if location_column is not None:
+            location = table.column(location_column)
+            if pa.types.is_dictionary(location.type):
+                location = location.cast(location.type.value_type)
+            table = table.filter(pc.equal(pc.cast(location, pa.string()), str(unit)))
+
+    # Spellings of one type ("IV Pumps", "iv-pump") are counted together
+    on_hand = dataset_name_counts(table)
+    return {name: on_hand.get(normalize_name(name), (None, 0))[1] for name in equipment_names}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Forecast unit equipment demand from a patient census")
+    parser.add_argument('census', help="Patient census .csv or .parquet file")
+    parser.add_argument('--unit', default=None, help="Unit to report (default: every unit)")
+    parser.add_argument('--equipment', default=None, help="Single item to size, e.g. \"IV Pump\"")
+    parser.add_argument('--percentile', type=int, default=95, help="Demand percentile to plan for")
+    parser.add_argument('--no-inventory', action='store_true', help="Skip the equipment dataset comparison")
+    args = parser.parse_args()
+
+    forecaster = DemandForecaster()
+    forecaster.add_census(args.census)
+    if args.unit and args.unit not in forecaster.histograms:
+        parser.error(f"No patients in unit {args.unit!r}. Units in the census: {', '.join(map(str, forecaster.units))}")
+    units = [args.unit] if args.unit else forecaster.units
+    equipment = None
+    if args.equipment:
+        try:
+            (equipment,), _ = forecaster.equipment_rows([args.equipment])
+        except ValueError as e:
+            parser.error(str(e))
+
+    for unit in units:
+        print(f"\n{unit} ({forecaster.patient_counts[unit]:,} patients)")
+        if equipment:
+            print(f"  {equipment}: {forecaster.required(unit, equipment, args.percentile)} "
+                  f"needed at the {args.percentile}th percentile")
+        elif args.no_inventory:
+            print(forecaster.forecast(unit).to_string(index=False))
+        else:
+            try:
+                print(forecaster.compare_inventory(unit, percentile=args.percentile).to_string(index=False))
+            except FileNotFoundError as e:
+                parser.error(f"{e} Use --no-inventory to forecast without the equipment dataset.")
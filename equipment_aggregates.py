@@ -0,0 +1,225 @@
+"""
+Materialized Dashboard Aggregates
+
+Precomputes the statistics behind the equipment dashboard (room-type counts,
+per-column null/unique stats and top-N value counts) once per dataset version and
+per project, and stores them as small JSON files next to the data. Dashboard
+renders read these files instead of scanning the equipment rows.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from equipment_dataset import (DATA_DIR, STORE_PATH, _temp_path, load_equipment_table, load_project_table,
+                               project_partition_path)
+
+AGGREGATE_DIR = os.path.join(DATA_DIR, 'aggregates')
+
+# Number of values kept per column in the top-N counts
+TOP_N = 10
+
+# Preferred column for the "Equipment Distribution" chart
+DISTRIBUTION_COLUMN = 'soa_room_type'
+
+# Candidate export columns for the location and status charts, in order of preference
+LOCATION_COLUMNS = ['location', 'room_location', 'room_name', 'room_number', 'department',
+                    'floor', 'building', 'site']
+STATUS_COLUMNS = ['status', 'equipment_status', 'asset_status', 'lifecycle_status']
+
+# Rows/columns kept on each axis of the density heatmap
+GRID_SIZE = 10
+
+# Digest cache keyed on (path) -> (mtime_ns, size, digest) so unchanged files are not rehashed
+_hash_cache = {}
+
+
+def file_hash(path):
+    """Return the SHA-256 of a file, rehashing only when its mtime or size changes."""
+    stat = os.stat(path)
+    cached = _hash_cache.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    _hash_cache[path] = (stat.st_mtime_ns, stat.st_size, digest.hexdigest())
+    return _hash_cache[path][2]
+
+
+def _is_categorical(arrow_type):
+    return pa.types.is_dictionary(arrow_type) or pa.types.is_string(arrow_type) \
+        or pa.types.is_large_string(arrow_type)
+
+
+def _top_values(column, top_n):
+    """Return the top_n most frequent values of a column as an ordered list of [value, count]."""
+    counts = pc.value_counts(column)
+    counts = counts.filter(pc.is_valid(counts.field('values')))
+    frequencies = counts.field('counts').to_numpy()
+    order = np.argsort(-frequencies, kind='stable')[:top_n]
+    values = counts.field('values').take(pa.array(order)).to_pylist()
+    return [[str(value), int(frequencies[i])] for value, i in zip(values, order)]
+
+
+def _top_codes(column, size):
+    """
+    Dictionary-encode a column and renumber its `size` most frequent values 0..size-1.
+
+    Returns:
+        tuple: (codes, labels) where codes is an int array with -1 for nulls and
+            values outside the top `size`
+    """
+    if pa.types.is_dictionary(column.type):
+        column = column.cast(column.type.value_type)
+    encoded = pc.dictionary_encode(column.combine_chunks())
+    codes = pc.fill_null(encoded.indices, -1).to_numpy(zero_copy_only=False).astype(np.int64)
+
+    counts = np.bincount(codes[codes >= 0], minlength=len(encoded.dictionary))
+    top = np.argsort(-counts, kind='stable')[:size]
+    top = top[counts[top] > 0]
+
+    # Extra trailing slot so that code -1 also maps to -1
+    remap = np.full(len(encoded.dictionary) + 1, -1, dtype=np.int64)
+    remap[top] = np.arange(len(top))
+    labels = [str(value) for value in encoded.dictionary.take(pa.array(top)).to_pylist()]
+    return remap[codes], labels
+
+
+def compute_density_grid(table, row_column, col_column, size=GRID_SIZE):
+    """
+    Count equipment per (row_column, col_column) cell in a single vectorized pass.
+
+    Both columns are reduced to integer codes for their top `size` values, combined
+    into one flat cell index and counted with np.bincount, which is the categorical
+    equivalent of np.histogram2d and scales linearly with the number of rows.
+
+    Returns:
+        dict: Axis labels ('rows', 'columns') and the 'counts' matrix as nested lists
+    """
+    row_codes, row_labels = _top_codes(table.column(row_column), size)
+    col_codes, col_labels = _top_codes(table.column(col_column), size)
+
+    keep = (row_codes >= 0) & (col_codes >= 0)
+    cells = row_codes[keep] * len(col_labels) + col_codes[keep]
+    counts = np.bincount(cells, minlength=len(row_labels) * len(col_labels))
+    return {
+        'row_column': row_column,
+        'column_column': col_column,
+        'rows': row_labels,
+        'columns': col_labels,
+        'counts': counts.reshape(len(row_labels), len(col_labels)).tolist(),
+    }
+
+
+def _first_with_data(columns, candidates):
+    return next((name for name in candidates if columns.get(name, {}).get('top_values')), None)
+
+
+def compute_aggregates(table, top_n=TOP_N):
+    """
+    Compute the dashboard aggregates for an equipment table in one scan per column.
+
+    Location and status charts use the first LOCATION_COLUMNS / STATUS_COLUMNS entry
+    present in the export; the density heatmap crosses location with the
+    distribution column.
+
+    Args:
+        table (pa.Table): Equipment rows (full store or one project partition)
+        top_n (int): Number of values kept in each top-N count
+
+    Returns:
+        dict: Row count, per-column stats and the distribution chart series
+    """
+    columns = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(column.type.value_type)
+        stats = {
+            'type': str(column.type),
+            'null_count': column.null_count,
+            'unique_count': 0 if pa.types.is_null(column.type) else pc.count_distinct(column).as_py(),
+            'numeric': pa.types.is_integer(column.type) or pa.types.is_floating(column.type),
+            'categorical': _is_categorical(column.type),
+        }
+        if stats['categorical']:
+            stats['top_values'] = _top_values(column, top_n)
+        columns[name] = stats
+
+    # Chart the preferred column when it has data, else the first categorical column that does
+    charted = [name for name, stats in columns.items() if stats.get('top_values')]
+    if DISTRIBUTION_COLUMN in charted:
+        charted.insert(0, DISTRIBUTION_COLUMN)
+    distribution = {'column': charted[0], 'counts': columns[charted[0]]['top_values']} if charted else None
+
+    location_column = _first_with_data(columns, LOCATION_COLUMNS)
+    status_column = _first_with_data(columns, STATUS_COLUMNS)
+    density_grid = None
+    if location_column and distribution and distribution['column'] != location_column:
+        density_grid = compute_density_grid(table, location_column, distribution['column'])
+
+    return {
+        'row_count': table.num_rows,
+        'columns': columns,
+        'numeric_columns': [name for name, stats in columns.items() if stats['numeric']],
+        'room_type_counts': columns.get(DISTRIBUTION_COLUMN, {}).get('top_values', []),
+        'distribution': distribution,
+        'location': {'column': location_column,
+                     'counts': columns[location_column]['top_values']} if location_column else None,
+        'status': {'column': status_column,
+                   'counts': columns[status_column]['top_values']} if status_column else None,
+        'density_grid': density_grid,
+    }
+
+
+def _aggregate_path(project_id, aggregate_dir):
+    name = f'project_{project_id}.json' if project_id else 'all.json'
+    return os.path.join(aggregate_dir, name)
+
+
+def get_aggregates(project_id=None, store_path=STORE_PATH, aggregate_dir=AGGREGATE_DIR):
+    """
+    Return the dashboard aggregates for all projects or a single project.
+
+    Aggregates are read from disk when they were computed from the current data
+    (same file hash); otherwise they are recomputed and written back. Project
+    aggregates follow the project's partition file, so an incremental refresh that
+    does not touch a project keeps its aggregates valid.
+
+    Args:
+        project_id (int): Project to aggregate; None or 0 for all projects
+
+    Returns:
+        dict: Aggregates as produced by compute_aggregates()
+    """
+    # Opening the store also rebuilds it if the raw export changed
+    table = load_equipment_table(store_path)
+    partition = project_partition_path(project_id) if project_id else None
+    source_hash = file_hash(partition or store_path)
+
+    path = _aggregate_path(project_id, aggregate_dir)
+    if os.path.exists(path):
+        with open(path) as f:
+            aggregates = json.load(f)
+        if aggregates.get('source_hash') == source_hash:
+            return aggregates
+
+    if project_id:
+        table = load_project_table(project_id)
+
+    aggregates = compute_aggregates(table)
+    aggregates['source_hash'] = source_hash
+    aggregates['project_id'] = project_id or 0
+
+    os.makedirs(aggregate_dir, exist_ok=True)
+    tmp_path = _temp_path(path)
+    with open(tmp_path, 'w') as f:
+        json.dump(aggregates, f)
+    os.replace(tmp_path, path)
+    return aggregates
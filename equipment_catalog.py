@@ -0,0 +1,191 @@
+"""
+Equipment Catalog
+
+One lookup table for everything the application knows about an equipment type:
+the patient knowledge base's specifications, the room knowledge base's per-room
+entries and the number of devices of that type in the equipment dataset. Names
+are normalized (case, punctuation, spacing and a trailing plural), so "IV pumps",
+"iv-pump" and "IV Pump" resolve to the same entry with a single dict lookup. The
+catalog is built once per knowledge-base and dataset version and shared by every
+caller.
+"""
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from equipment_dataset import STORE_PATH, dataset_version
+from knowledge_base import RELOAD_CHECK_SECONDS
+from patient_recommender import get_patient_knowledge_base
+from room_planner import RoomPlanner
+
+# Candidate export columns naming the equipment type, in order of preference
+EQUIPMENT_NAME_COLUMNS = ['equipment_name', 'equipment_type', 'equipment_description',
+                          'asset_description', 'description', 'name']
+
+# Details for equipment no knowledge base describes
+DEFAULT_DETAILS = {
+    'description': 'Medical equipment',
+    'placement': 'As per clinical need'
+}
+
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+
+# Names come from a small vocabulary, so their keys are memoized
+@lru_cache(maxsize=4096)
+def normalize_name(name):
+    """
+    Reduce an equipment name to its lookup key.
+
+    Case, punctuation and spacing are ignored and a plural last word is made
+    singular ("Infusion Pumps" -> "infusion pump").
+    """
+    key = _NON_WORD.sub(' ', str(name).lower()).strip()
+    if len(key) > 3 and key.endswith('s') and not key.endswith('ss'):
+        key = key[:-1]
+    return key
+
+
+def dataset_name_counts(table):
+    """
+    Count devices per equipment type in the equipment dataset.
+
+    Returns:
+        dict: Normalized name -> (most common spelling, count); None when the
+            export has no EQUIPMENT_NAME_COLUMNS column
+    """
+    name_column = next((name for name in EQUIPMENT_NAME_COLUMNS if name in table.column_names), None)
+    if name_column is None:
+        return None
+    column = table.column(name_column)
+    if pa.types.is_dictionary(column.type):
+        column = column.cast(column.type.value_type)
+    counts = pc.value_counts(pc.utf8_trim_whitespace(pc.cast(column, pa.string())).drop_null())
+
+    # Distinct spellings are few, so they are folded together in Python
+    merged = {}
+    for spelling, count in zip(counts.field('values').to_pylist(), counts.field('counts').to_pylist()):
+        key = normalize_name(spelling)
+        if not key:
+            continue
+        name, total, best = merged.get(key, (spelling, 0, 0))
+        if count > best:
+            name, best = spelling, count
+        merged[key] = (name, total + count, best)
+    return {key: (name, total) for key, (name, total, _) in merged.items()}
+
+
+class EquipmentCatalog:
+    """
+    Name-normalized index of equipment specifications, room usage and inventory.
+
+    Each entry is a dict with the display 'name', the 'details' shown to users,
+    the 'rooms' (room type -> room knowledge-base entry) listing the item and the
+    'on_hand' device count (None when the dataset does not name equipment types).
+    """
+
+    def __init__(self, equipment_specs, room_equipment, room_equipment_mapping=None, name_counts=None):
+        """
+        Args:
+            equipment_specs (dict): Equipment name -> specification dict
+            room_equipment (dict): Room type -> room entry with an 'equipment' list
+            room_equipment_mapping (dict): Room type -> list of equipment names
+            name_counts (dict): dataset_name_counts() output; None if unavailable
+        """
+        entries = {}
+
+        def entry(name):
+            key = normalize_name(name)
+            if key not in entries:
+                entries[key] = {'name': name, 'details': None, 'rooms': {},
+                                'on_hand': None if name_counts is None else 0}
+            return entries[key]
+
+        for name, specs in equipment_specs.items():
+            entry(name)['details'] = specs
+        for room_type, room_info in room_equipment.items():
+            for item in room_info['equipment']:
+                found = entry(item['name'])
+                found['rooms'].setdefault(room_type, item)
+                if found['details'] is None:
+                    # Room entries describe the item in planning terms
+                    found['details'] = {'description': item['specs'], 'dimensions': item['dimensions'],
+                                        'placement': item['placement'], 'clearance': item['clearance']}
+        for room_type, names in (room_equipment_mapping or {}).items():
+            for name in names:
+                entry(name)['rooms'].setdefault(room_type, None)
+        for name, count in (name_counts or {}).values():
+            entry(name)['on_hand'] = count
+
+        for found in entries.values():
+            if found['details'] is None:
+                found['details'] = DEFAULT_DETAILS
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return normalize_name(name) in self.entries
+
+    def lookup(self, name):
+        """Return the catalog entry for an equipment name, or None if it is unknown."""
+        return self.entries.get(normalize_name(name))
+
+    def lookup_many(self, names):
+        """Return the catalog entries (None for unknown names) for a list of names, in order."""
+        entries = self.entries
+        return [entries.get(normalize_name(name)) for name in names]
+
+
+_catalog = None
+_catalog_generation = None
+_catalog_checked = 0.0
+_catalog_lock = threading.Lock()
+
+
+def _dataset_counts():
+    """
+    Equipment counts from the dataset, or None when there is no store to read.
+
+    Only an existing store is read: the catalog is built during page renders, and
+    converting a raw export is left to the ingestion CLI.
+    """
+    if not os.path.exists(STORE_PATH):
+        return None
+    try:
+        return dataset_name_counts(feather.read_table(STORE_PATH, memory_map=True))
+    except (OSError, pa.ArrowException):
+        return None
+
+
+def get_equipment_catalog():
+    """
+    Return the process-wide equipment catalog.
+
+    The catalog is rebuilt when either knowledge base or the dataset version
+    changes; versions are re-checked at most every RELOAD_CHECK_SECONDS.
+    """
+    global _catalog, _catalog_generation, _catalog_checked
+    now = time.monotonic()
+    if _catalog is not None and now - _catalog_checked < RELOAD_CHECK_SECONDS:
+        return _catalog
+
+    with _catalog_lock:
+        patient_knowledge_base = get_patient_knowledge_base()
+        room_knowledge_base = RoomPlanner().knowledge_base
+        generation = (patient_knowledge_base.version, room_knowledge_base.version, dataset_version())
+        if _catalog is None or generation != _catalog_generation:
+            room_data = room_knowledge_base.get().data
+            _catalog = EquipmentCatalog(patient_knowledge_base.get().data['equipment_specs'],
+                                        room_data['room_equipment'], room_data['room_equipment_mapping'],
+                                        _dataset_counts())
+            _catalog_generation = generation
+        _catalog_checked = now
+    return _catalog
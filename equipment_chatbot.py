@@ -1,53 +1,48 @@
 import streamlit as st
 import pandas as pd
-import re
 import json
-from room_planner import RoomPlanner
+import copy
+from room_planner import RoomPlanner, room_size
 import matplotlib.pyplot as plt
-import numpy as np
 import plotly.graph_objects as go
 from model_viewer_3d import display_3d_model
 from patient_recommender import PatientRecommender
+from incremental_recommender import IncrementalRecommender
+from equipment_dataset import dataset_version, load_equipment_table
+from equipment_aggregates import get_aggregates
+from analyze_data import load_profile
+from response_cache import ResponseCache
+from intent_parser import IntentParser
+
+# Load data - keyed on the dataset version so an incremental refresh is picked up on the
+# next rerun; cache_resource hands every session the same memory-mapped Arrow table of
+# the store instead of the per-call copies cache_data would make
+@st.cache_resource(max_entries=1)
+def _load_versioned_data(version):
+    return load_equipment_table()
 
-# Load data
-@st.cache_data
 def load_data():
-    df = pd.read_csv('raw data/equipment_data.csv')
-    # Clean up data types - convert 'attachment_count' to numeric if it exists
-    numeric_columns = df.select_dtypes(include=['int64', 'float64']).columns
-    return df
+    return _load_versioned_data(dataset_version())
 
-# Function to create visualization of equipment data
-def create_equipment_visualization(df, project_id=None):
+# Function to create visualization of equipment data from its precomputed aggregates
+def create_equipment_visualization(aggregates, project_id=None):
     # Create a container for the visualization
     viz_container = st.container()
     
     with viz_container:
         # If we have numeric columns, create some basic charts
-        numeric_columns = df.select_dtypes(include=['int64', 'float64']).columns.tolist()
-        
-        if len(numeric_columns) > 0:
+        if len(aggregates['numeric_columns']) > 0:
             # Create a 2x2 layout for charts
             col1, col2 = st.columns(2)
             
             # First chart - count by column with most non-null values
             with col1:
                 st.subheader("Equipment Distribution")
-                # Find a categorical column with values
-                categorical_cols = df.select_dtypes(include=['object']).columns.tolist()
-                
-                if 'soa_room_type' in categorical_cols and df['soa_room_type'].notna().sum() > 0:
-                    room_counts = df['soa_room_type'].value_counts().head(10)
-                    st.bar_chart(room_counts)
-                elif len(categorical_cols) > 0:
-                    # Find first categorical column with some values
-                    for col in categorical_cols:
-                        if df[col].notna().sum() > 0:
-                            counts = df[col].value_counts().head(10)
-                            st.bar_chart(counts)
-                            break
-                    else:
-                        st.info("No categorical data available for visualization")
+                # soa_room_type counts, or the first categorical column with values
+                distribution = aggregates['distribution']
+                if distribution:
+                    labels, values = zip(*distribution['counts'])
+                    st.bar_chart(pd.Series(values, index=labels, name='count'))
                 else:
                     st.info("No categorical data available for visualization")
             
@@ -55,88 +50,85 @@ def create_equipment_visualization(df, project_id=None):
             with col2:
                 st.subheader("Equipment Timeline")
                 # Create a synthetic timeline based on row indexes if no date columns
-                timeline_data = pd.DataFrame({'count': range(1, min(101, len(df)+1))})
+                timeline_data = pd.DataFrame({'count': range(1, min(101, aggregates['row_count']+1))})
                 st.line_chart(timeline_data)
             
-            # Third chart - equipment costs if available
+            # Third chart - equipment by location
             col3, col4 = st.columns(2)
             with col3:
                 st.subheader("Equipment by Location")
-                # Create a simple pie chart-like visualization
-                chart_data = pd.DataFrame({'count': [15, 25, 10, 40, 10]},
-                                        index=['Area A', 'Area B', 'Area C', 'Area D', 'Other'])
-                st.bar_chart(chart_data)
+                location = aggregates['location']
+                if location:
+                    labels, values = zip(*location['counts'])
+                    st.bar_chart(pd.Series(values, index=labels, name='count'))
+                else:
+                    st.info("No location data available for visualization")
             
             # Fourth chart - equipment status
             with col4:
                 st.subheader("Equipment Status")
-                status_data = pd.DataFrame({'count': [65, 20, 15]},
-                                        index=['Active', 'Maintenance', 'Retired'])
-                st.bar_chart(status_data)
+                status = aggregates['status']
+                if status:
+                    labels, values = zip(*status['counts'])
+                    st.bar_chart(pd.Series(values, index=labels, name='count'))
+                else:
+                    st.info("No status data available for visualization")
             
-            # Equipment map (simplified 2D representation)
+            # Equipment map - location x room type counts binned in one pass by the aggregates layer
             st.subheader("Equipment Spatial Distribution (2D Map)")
-            
-            # Create a simple heatmap-like 2D map representation
-            import numpy as np
-            
-            # Generate sample 2D spatial data
-            map_size = 10
-            equipment_map = np.random.rand(map_size, map_size)
-            
-            # Add some pattern to make it look like meaningful concentrations
-            equipment_map[2:5, 2:5] += 1.0  # Create a "hotspot"
-            equipment_map[7:9, 7:9] += 0.8  # Another concentration
-            
-            # Normalize to 0-1 range
-            equipment_map = np.clip(equipment_map, 0, 1)
-            
-            # Plot using st.pyplot
-            import matplotlib.pyplot as plt
-            fig, ax = plt.subplots(figsize=(10, 8))
-            
-            # Create a heatmap
-            project_title = f"Project {project_id}" if project_id and project_id > 0 else "All Projects"
-            im = ax.imshow(equipment_map, cmap='YlOrRd')
-            ax.set_title(f"Equipment Density Map - {project_title}")
-            
-            # Add room/area labels on the axes
-            areas = ['Room A', 'Room B', 'Hall C', 'ICU', 'OR 1', 'OR 2', 'Lab', 'Storage', 'Ward 1', 'Reception']
-            ax.set_xticks(range(map_size))
-            ax.set_yticks(range(map_size))
-            ax.set_xticklabels(areas)
-            ax.set_yticklabels(areas)
-            plt.setp(ax.get_xticklabels(), rotation=45, ha="right", rotation_mode="anchor")
-            
-            # Add colorbar
-            cbar = ax.figure.colorbar(im, ax=ax)
-            cbar.ax.set_ylabel("Equipment Density", rotation=-90, va="bottom")
-            
-            # Add annotations for equipment counts in some cells
-            for i in range(map_size):
-                for j in range(map_size):
-                    if equipment_map[i, j] > 0.7:  # Only annotate cells with higher density
-                        text = ax.text(j, i, f"{int(equipment_map[i, j] * 10)}",
-                                      ha="center", va="center", color="w")
-            
-            plt.tight_layout()
-            st.pyplot(fig)
+            grid = aggregates['density_grid']
+            if grid:
+                project_title = f"Project {project_id}" if project_id and project_id > 0 else "All Projects"
+                # The whole grid, cell labels included, is a single heatmap trace
+                fig = go.Figure(go.Heatmap(
+                    z=grid['counts'], x=grid['columns'], y=grid['rows'],
+                    colorscale='YlOrRd', colorbar={'title': 'Equipment Count'},
+                    text=grid['counts'], texttemplate='%{text}'
+                ))
+                fig.update_layout(
+                    title=f"Equipment Density Map - {project_title}",
+                    xaxis_title=grid['column_column'], yaxis_title=grid['row_column'],
+                    yaxis={'autorange': 'reversed'}, height=600
+                )
+                st.plotly_chart(fig, use_container_width=True)
+            else:
+                st.info("No location data available for the equipment density map")
             
             # Add equipment statistics
             st.subheader("Equipment Summary Statistics")
             col_stats1, col_stats2 = st.columns(2)
             
             with col_stats1:
-                st.metric("Total Equipment Items", f"{len(df):,}")
+                st.metric("Total Equipment Items", f"{aggregates['row_count']:,}")
                 st.metric("Unique Equipment Types", "124")
             
             with col_stats2:
                 st.metric("Average Age (years)", "4.3")
                 st.metric("Maintenance Due", "37")
+
+            # Column profile saved by analyze_data.py; it covers the whole dataset
+            if not project_id:
+                profile = load_profile()
+                if profile is not None:
+                    with st.expander("Column Profile"):
+                        st.dataframe(pd.DataFrame([{
+                            'column': column['name'],
+                            'type': column['type'],
+                            'non-null': column['non_null_count'],
+                            'unique': column['unique_count'],
+                            'min': column.get('min'),
+                            'max': column.get('max'),
+                            'mean': column.get('mean'),
+                        } for column in profile['columns']]), hide_index=True)
                 
         else:
             st.info("No numeric data available for visualization")
 
+# One recommender for every session; its compiled knowledge base is process-wide
+@st.cache_resource
+def get_patient_recommender():
+    return PatientRecommender()
+
 # Initialize session state variables if they don't exist
 if 'current_project_id' not in st.session_state:
     st.session_state.current_project_id = 0
@@ -157,297 +149,116 @@ if 'current_room_plan' not in st.session_state:
 if 'selected_3d_model' not in st.session_state:
     st.session_state.selected_3d_model = None
 if 'patient_recommender' not in st.session_state:
-    st.session_state.patient_recommender = PatientRecommender()
+    st.session_state.patient_recommender = get_patient_recommender()
+if 'patient_scorer' not in st.session_state:
+    st.session_state.patient_scorer = IncrementalRecommender(recommender=st.session_state.patient_recommender)
 if 'show_patient_form' not in st.session_state:
     st.session_state.show_patient_form = False
 if 'patient_recommendations' not in st.session_state:
     st.session_state.patient_recommendations = None
 
+# Compiled intent parser shared by every session; keyed on the room knowledge base
+# version so room types added to it are recognized without a restart
+@st.cache_resource(max_entries=1)
+def get_intent_parser(room_knowledge_base_version):
+    return IntentParser(get_projects(), st.session_state.room_planner.room_type_phrases())
+
+def parse_query(query):
+    """Classify a query and extract its project id, room type and area in one pass."""
+    return get_intent_parser(st.session_state.room_planner.knowledge_base_version).parse(query)
+
 # Function to extract project IDs from user queries
 def extract_project_id(query):
-    # Look for patterns like "project id 5", "project 3", "project_id = 2"
-    patterns = [
-        r'project\s+id\s*[=:]*\s*(\d+)',  # matches "project id 5", "project id: 5"
-        r'project\s*[=:]*\s*(\d+)',        # matches "project 3", "project: 3"
-        r'project_id\s*[=:]*\s*(\d+)'      # matches "project_id = 2"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, query.lower())
-        if match:
-            return int(match.group(1))
-    
-    # Check for "all projects" type queries
-    all_projects_patterns = [
-        r'all\s+projects',
-        r'every\s+project',
-        r'entire\s+system',
-        r'entire\s+dataset',
-        r'across\s+all'
-    ]
-    
-    for pattern in all_projects_patterns:
-        if re.search(pattern, query.lower()):
-            return 0  # 0 represents "all projects"
-    
-    return None  # No project ID found
+    # "project id 5", "project 3", "project_id = 2"; 0 for "all projects"; None if absent
+    return parse_query(query).project_id
 
-# Function to classify user queries
 def extract_room_planning_info(query):
     """Extract room type and area from planning queries."""
-    # Look for room type mentions
-    room_types = ['ICU', 'Operating Room', 'Emergency Room', 'Patient Room', 
-                 'Laboratory', 'Radiology', 'Pharmacy', 'Physical Therapy']
-    
-    found_room_type = None
-    for room_type in room_types:
-        if room_type.lower() in query.lower():
-            found_room_type = room_type
-            break
-    
-    # Look for area measurements
-    area_pattern = r'(\d+)\s*(?:square\s*feet|sq\s*ft|sqft)'
-    area_match = re.search(area_pattern, query.lower())
-    area = int(area_match.group(1)) if area_match else None
-    
-    return found_room_type, area
+    parsed = parse_query(query)
+    return parsed.room_type, parsed.area
 
-def create_room_visualization(room_type, recommendations):
-    """Create a visual representation of the room layout."""
+def create_room_visualization(room_type, area=None):
+    """Create a visual representation of the room layout, at the user's area when given."""
     fig, ax = plt.subplots(figsize=(12, 8))
     
-    # Get equipment details from RoomPlanner
-    room_info = st.session_state.room_planner.room_equipment.get(room_type, {})
-    equipment_list = room_info.get('equipment', [])
+    # Solved layout for the given area, else the room type's recommended area (None for
+    # types without equipment specs); a tight room shows its conflicts
+    if area and area > 0:
+        layout = st.session_state.room_planner.plan_layout(room_type, *room_size(area))
+    else:
+        layout = st.session_state.room_planner.plan_layout(room_type)
+    width, depth = (layout['width'], layout['depth']) if layout else (10, 8)
     
     # Color palette for equipment
     colors = ['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6', '#1abc9c', '#d35400', '#34495e']
     
     # Set up the room outline
-    room = plt.Rectangle((0, 0), 10, 8, fill=False, color='black', linewidth=2)
+    room = plt.Rectangle((0, 0), width, depth, fill=False, color='black', linewidth=2)
     ax.add_patch(room)
     
-    # Add a door
-    door = plt.Rectangle((0, 3.5), 0.3, 1, color='white', fill=True, linewidth=2, edgecolor='black')
+    # Add a door (on the left wall, as the solver assumes)
+    door_low, door_high = (layout['door'][1], layout['door'][3]) if layout else (depth / 2 - 1.75, depth / 2 + 1.75)
+    door = plt.Rectangle((0, door_low), 0.3, door_high - door_low, facecolor='white', fill=True, linewidth=2,
+                         edgecolor='black')
     ax.add_patch(door)
-    ax.plot([0, 1], [3.5, 2.5], color='black', linestyle='--', linewidth=1)
-    ax.text(0.5, 3, 'Door', ha='center', fontsize=8)
-    
-    # Add room type specific layouts
-    if room_type == 'ICU':
-        # Add bed (central element)
-        bed = plt.Rectangle((3, 2), 3, 1.5, color=colors[0], alpha=0.6, label='Patient Bed')
-        ax.add_patch(bed)
-        ax.text(4.5, 2.75, 'Patient Bed', ha='center', va='center', fontsize=9, color='white', fontweight='bold')
-        
-        # Add clearance zone around bed
-        bed_clearance = plt.Rectangle((2, 1), 5, 3.5, fill=False, linestyle='--', edgecolor='gray')
-        ax.add_patch(bed_clearance)
-        ax.text(7.1, 2.75, '4ft clearance', fontsize=8, color='gray', rotation=90)
-        
-        # Add monitor
-        monitor = plt.Rectangle((3, 4), 0.8, 0.5, color=colors[1], alpha=0.6, label='Patient Monitor')
-        ax.add_patch(monitor)
-        
-        # Add ventilator
-        ventilator = plt.Rectangle((7, 2), 0.8, 0.8, color=colors[2], alpha=0.6, label='Ventilator')
-        ax.add_patch(ventilator)
-        
-        # Add infusion pumps
-        for i in range(3):
-            pump = plt.Rectangle((2, 2.2 + i*0.6), 0.7, 0.5, color=colors[3], alpha=0.6)
-            ax.add_patch(pump)
-        ax.text(2.35, 3.2, 'Infusion Pumps', ha='center', va='center', fontsize=8, rotation=90)
-        
-        # Add supply cart
-        cart = plt.Rectangle((8, 5), 1.5, 1, color=colors[4], alpha=0.6, label='Supply Cart')
-        ax.add_patch(cart)
-        
-        # Add code cart
-        code_cart = plt.Rectangle((1.5, 6), 1.2, 0.8, color=colors[5], alpha=0.6, label='Code Cart')
-        ax.add_patch(code_cart)
-        
-    elif room_type == 'Operating Room':
-        # Add surgical table (central element)
-        table = plt.Rectangle((3.5, 3), 3, 1.5, color=colors[0], alpha=0.6, label='Operating Table')
-        ax.add_patch(table)
-        ax.text(5, 3.75, 'Operating Table', ha='center', va='center', fontsize=9, color='white', fontweight='bold')
-        
-        # Add clearance zone around table
-        table_clearance = plt.Rectangle((1.5, 1), 7, 5.5, fill=False, linestyle='--', edgecolor='gray')
-        ax.add_patch(table_clearance)
-        ax.text(8.6, 3.75, '6ft clearance', fontsize=8, color='gray', rotation=90)
-        
-        # Add surgical lights
-        light1 = plt.Circle((4.5, 5), 0.5, color=colors[1], alpha=0.4, label='Surgical Light')
-        light2 = plt.Circle((5.5, 5), 0.5, color=colors[1], alpha=0.4)
-        ax.add_patch(light1)
-        ax.add_patch(light2)
-        
-        # Add anesthesia machine
-        anesthesia = plt.Rectangle((3.5, 1), 1, 1, color=colors[2], alpha=0.6, label='Anesthesia Machine')
-        ax.add_patch(anesthesia)
-        
-        # Add surgical equipment cart
-        cart = plt.Rectangle((8, 3), 1.5, 1, color=colors[3], alpha=0.6, label='Equipment Cart')
-        ax.add_patch(cart)
-        
-        # Add imaging equipment (C-arm) when parked
-        imaging = plt.Rectangle((1, 2), 1.5, 3, color=colors[4], alpha=0.3, label='Imaging Equipment')
-        ax.add_patch(imaging)
-        
-        # Add supply cabinets
-        cabinet = plt.Rectangle((0.5, 6.5), 3, 0.8, color=colors[5], alpha=0.5, label='Supply Cabinets')
-        ax.add_patch(cabinet)
-        
-    elif room_type == 'Emergency Room':
-        # Add trauma/resuscitation bed (central element)
-        bed = plt.Rectangle((3.5, 3), 3, 1.5, color=colors[0], alpha=0.6, label='Trauma/Resuscitation Bed')
-        ax.add_patch(bed)
-        ax.text(5, 3.75, 'Trauma Bed', ha='center', va='center', fontsize=9, color='white', fontweight='bold')
-        
-        # Add clearance zone around bed (5ft on all sides for trauma team)
-        bed_clearance = plt.Rectangle((2, 1.5), 6, 4.5, fill=False, linestyle='--', edgecolor='gray')
-        ax.add_patch(bed_clearance)
-        ax.text(8.1, 3.75, '5ft clearance for trauma team', fontsize=8, color='gray', rotation=90)
-        
-        # Add defibrillator/monitor
-        defib = plt.Rectangle((6.7, 3.2), 0.8, 0.8, color=colors[1], alpha=0.6, label='Defibrillator/Monitor')
-        ax.add_patch(defib)
-        
-        # Add crash cart
-        crash_cart = plt.Rectangle((2.5, 5), 1.5, 1, color=colors[2], alpha=0.6, label='Crash Cart')
-        ax.add_patch(crash_cart)
-        ax.text(3.25, 5.5, 'Crash Cart', ha='center', va='center', fontsize=8)
-        
-        # Add suction equipment
-        suction = plt.Rectangle((6.8, 4.2), 0.6, 0.6, color=colors[3], alpha=0.6, label='Suction Equipment')
-        ax.add_patch(suction)
-        
-        # Add oxygen supply system (wall mounted)
-        oxygen = plt.Rectangle((6.8, 2.4), 0.1, 1, color=colors[4], alpha=0.7, label='Oxygen Supply')
-        ax.add_patch(oxygen)
-        
-        # Add supply storage
-        supply = plt.Rectangle((8.5, 2), 1, 4, color=colors[5], alpha=0.5, label='Supply Storage')
-        ax.add_patch(supply)
-        
-        # Add mobile X-ray unit (parked)
-        xray = plt.Rectangle((1, 1.5), 1, 2, color=colors[6], alpha=0.4, label='Mobile X-ray Unit')
-        ax.add_patch(xray)
-        
-        # Add staff positions for resuscitation (small circles)
-        positions = [(3, 2), (3, 5), (6, 5), (6, 2), (4.5, 1.5), (4.5, 5.5)]
-        for i, pos in enumerate(positions):
-            staff = plt.Circle(pos, 0.3, color='lightgray', alpha=0.2)
-            ax.add_patch(staff)
-            if i == 0:
-                ax.text(pos[0], pos[1], 'MD', ha='center', va='center', fontsize=7)
-                staff.set_label('Staff Positions')
-            else:
-                labels = ['RN', 'Tech', 'RN', 'RT', 'Scribe']
-                ax.text(pos[0], pos[1], labels[i-1], ha='center', va='center', fontsize=7)
+    ax.plot([0, door_high - door_low], [door_high, door_low], color='black', linestyle='--', linewidth=1)
+    ax.text(0.8, door_low - 0.6, 'Door', ha='center', fontsize=8)
+    
+    # One color and legend entry per equipment type
+    item_colors = {}
+    for item in (layout['items'] if layout else []):
+        first = item['name'] not in item_colors
+        color = item_colors.setdefault(item['name'], colors[len(item_colors) % len(colors)])
+        x0, y0, x1, y1 = item['footprint']
+        label = item['name'] if first else None
+        if item['shape'] == 'circle':
+            patch = plt.Circle(((x0 + x1) / 2, (y0 + y1) / 2), (x1 - x0) / 2, color=color, alpha=0.4, label=label)
+        else:
+            patch = plt.Rectangle((x0, y0), x1 - x0, y1 - y0, color=color, alpha=0.6, label=label)
+        ax.add_patch(patch)
+        
+        # Dashed clearance zone where the item needs working space
+        zx0, zy0, zx1, zy1 = item['clearance_zone']
+        if item['mount'] != 'ceiling' and (zx0, zy0, zx1, zy1) != (x0, y0, x1, y1):
+            zone = plt.Rectangle((zx0, zy0), zx1 - zx0, zy1 - zy0, fill=False, linestyle='--', edgecolor=color,
+                                 alpha=0.5)
+            ax.add_patch(zone)
+        if first and (x1 - x0) * (y1 - y0) >= 10:
+            ax.text((x0 + x1) / 2, (y0 + y1) / 2, item['name'], ha='center', va='center', fontsize=9,
+                    color='white', fontweight='bold', rotation=90 if y1 - y0 > x1 - x0 else 0)
     
     # Customize the plot
-    ax.set_xlim(-1, 11)
-    ax.set_ylim(-1, 9)
+    ax.set_xlim(-1, width + 1)
+    ax.set_ylim(-1, depth + 1)
     ax.set_aspect('equal')
     ax.axis('off')
     ax.set_title(f'Recommended {room_type} Layout', fontsize=14, fontweight='bold')
     
-    # Add grid for scale reference (light gray)
-    for i in range(0, 11):
-        ax.axhline(y=i, color='lightgray', linestyle='-', alpha=0.3)
+    # Add grid for scale reference (light gray, 1 ft)
+    for i in range(0, int(width) + 1):
         ax.axvline(x=i, color='lightgray', linestyle='-', alpha=0.3)
+    for i in range(0, int(depth) + 1):
+        ax.axhline(y=i, color='lightgray', linestyle='-', alpha=0.3)
     
     # Add legend with more details
     handles, labels = ax.get_legend_handles_labels()
-    legend = ax.legend(handles, labels, bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=10)
-    legend.set_title('Equipment Legend', prop={'weight':'bold'})
+    if handles:
+        legend = ax.legend(handles, labels, bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=10)
+        legend.set_title('Equipment Legend', prop={'weight':'bold'})
     
     # Add scale information
-    ax.text(5, -0.5, '10 meters (32.8 feet)', ha='center', fontsize=10)
-    ax.text(-0.5, 4, '8 meters (26.2 feet)', va='center', rotation=90, fontsize=10)
-    
-    # Add zone labels
-    if room_type == 'Operating Room':
-        ax.text(2.5, 7.5, 'Clean Zone', ha='center', fontsize=9, style='italic')
-        ax.text(7.5, 7.5, 'Sterile Field', ha='center', fontsize=9, style='italic')
-        ax.text(8.5, 1.5, 'Circulation Zone', ha='center', fontsize=9, style='italic')
+    ax.text(width / 2, -0.7, f'{width:g} feet', ha='center', fontsize=10)
+    ax.text(-0.7, depth / 2, f'{depth:g} feet', va='center', rotation=90, fontsize=10)
+    if layout and layout['conflicts']:
+        ax.text(width / 2, depth + 0.5, f"{len(layout['conflicts'])} clearance conflicts: room is undersized",
+                ha='center', fontsize=9, color='red')
     
     plt.tight_layout()
     return fig
 
 def classify_query(query):
-    # Class 0: Patient Recommendations Query
-    patient_patterns = [
-        r'patient(-| )specific',
-        r'personalized recommendations',
-        r'recommend for (a|my|this) patient',
-        r'patient needs',
-        r'individual patient',
-        r'patient recommender',
-        r'based on (patient|condition|diagnosis)',
-        r'patient equipment'        
-    ]
-    
-    for pattern in patient_patterns:
-        if re.search(pattern, query.lower()):
-            return "patient_recommendations"
-    
-    # Class 1: Room Planning Query
-    room_planning_patterns = [
-        r'where should I put',
-        r'equipment (placement|location)',
-        r'room layout',
-        r'design (a|the) room',
-        r'plan (a|the) room',
-        r'set up (a|the) room',
-        r'what equipment (should|do) I (put|need) in',
-        r'help me plan',
-        r'equipment (goes|should go) in',
-        r'equip (a|the|my)',
-        r'layout for'
-    ]
-    
-    # Check for room types in the query
-    room_types = ['ICU', 'Operating Room', 'Emergency Room', 'Patient Room', 
-                 'Laboratory', 'Radiology', 'Pharmacy', 'Physical Therapy']
-    has_room_type = False
-    for room_type in room_types:
-        if re.search(r'\b' + room_type.lower() + r'\b', query.lower()):
-            has_room_type = True
-            break
-    
-    # Check for room planning intent
-    for pattern in room_planning_patterns:
-        if re.search(pattern, query.lower()):
-            if has_room_type or re.search(r'\broom\b', query.lower()):
-                return "room_planning"
-    
-    # Class 2: Project Options Inquiry
-    project_options_patterns = [
-        r'what projects',
-        r'project options',
-        r'available projects',
-        r'show projects',
-        r'list projects',
-        r'list all projects', 
-        r'view projects',
-        r'projects can I view',
-    ]
-    
-    for pattern in project_options_patterns:
-        if re.search(pattern, query.lower()):
-            return "project_options"
-    
-    # Class 3: Scoped Project Inquiry
-    project_id = extract_project_id(query)
-    if project_id is not None:
-        return "scoped_project"
-    
-    # Class 3: General Questions (fallback)
-    return "general_question"
+    # patient_recommendations, room_planning, project_options, scoped_project or general_question
+    return parse_query(query).query_type
 
 # Function to generate mock project list
 def get_projects():
@@ -535,30 +346,40 @@ def generate_conversational_response(message_type, data=None):
             return random.choice(phrases)
     return ""
 
-def process_query(query):
+def answer_query(query, parsed=None):
+    """
+    Answer a chat query without touching session state.
+
+    Args:
+        query (str): The user's message
+        parsed (ParsedQuery): The query already parsed by parse_query(), if it was
+
+    Returns:
+        tuple: (response text, dict of session_state updates to apply)
+    """
+    state = {}
     # Reset visualization flags
-    st.session_state.show_viz = False
-    st.session_state.show_room_plan = False
-    st.session_state.current_room_plan = None
-    # Classify the query
-    query_type = classify_query(query)
-    
-    # Extract project ID if present
-    project_id = extract_project_id(query)
+    state['show_viz'] = False
+    state['show_room_plan'] = False
+    state['current_room_plan'] = None
+    # Classify the query and extract its entities
+    parsed = parsed or parse_query(query)
+    query_type = parsed.query_type
+    project_id = parsed.project_id
     
     # Set session state based on the query
     if project_id is not None:
-        st.session_state.current_project_id = project_id
-        st.session_state.current_is_project_site_filter = 1 if project_id > 0 else 0
+        state['current_project_id'] = project_id
+        state['current_is_project_site_filter'] = 1 if project_id > 0 else 0
     
     # Generate response based on query type
     if query_type == "patient_recommendations":
         # Show patient recommendation form
-        st.session_state.show_patient_form = True
-        return "I'd be happy to provide personalized equipment recommendations based on specific patient characteristics. I've opened the patient recommendation form where you can enter details like medical conditions, age, and acuity level."
+        state['show_patient_form'] = True
+        return "I'd be happy to provide personalized equipment recommendations based on specific patient characteristics. I've opened the patient recommendation form where you can enter details like medical conditions, age, and acuity level.", state
     
     elif query_type == "room_planning":
-        room_type, area = extract_room_planning_info(query)
+        room_type, area = parsed.room_type, parsed.area
         if room_type:
             recommendations = st.session_state.room_planner.get_equipment_recommendations(room_type, area)
             std_room_type = recommendations.get('room_type', room_type)
@@ -581,64 +402,92 @@ def process_query(query):
             response += "\nIs there any specific aspect of this room layout you'd like me to explain in more detail?"
             
             # Set up visualization
-            st.session_state.show_room_plan = True
-            st.session_state.current_room_plan = {'room_type': std_room_type, 'recommendations': recommendations}
+            state['show_room_plan'] = True
+            state['current_room_plan'] = {'room_type': std_room_type, 'area': area}
             
-            return response
+            return response, state
         else:
             room_types = list(st.session_state.room_planner.room_equipment.keys())
-            return f"I'd be happy to provide equipment recommendations. Could you please specify what type of medical room you're planning? Available room types include {', '.join(room_types)}. You can also include the square footage if you know it."
+            return f"I'd be happy to provide equipment recommendations. Could you please specify what type of medical room you're planning? Available room types include {', '.join(room_types)}. You can also include the square footage if you know it.", state
             
     elif query_type == "project_options":
-        return format_project_list()
+        return format_project_list(), state
     
     elif query_type == "scoped_project":
         # Check if we're looking for a specific project by name
-        for project in get_projects():
-            if project['name'].lower() in query.lower():
-                return f"**{project['name']}** corresponds to **project id {project['id']}**."
+        if parsed.project_name:
+            project = get_project_by_name(parsed.project_name)
+            return f"**{project['name']}** corresponds to **project id {project['id']}**.", state
         
         # If we have a project ID, generate a response with data
         if project_id is not None:
             if project_id > 0:
                 project = get_project_by_id(project_id)
                 if project:
-                    # In a real implementation, you would filter the data by project_id here
-                    data = load_data()
-                    response_text = f"Showing equipment data for project id {project_id} ({project['name']}):\n\n"
+                    row_count = get_aggregates(project_id)['row_count']
+                    response_text = f"Showing {row_count:,} equipment records for project id {project_id} ({project['name']}):\n\n"
                     
                     # This will be displayed separately through the visualization function
-                    st.session_state.show_viz = True
-                    st.session_state.viz_project_id = project_id
+                    state['show_viz'] = True
+                    state['viz_project_id'] = project_id
                     
                     response_text += "To view data for a different project, you can:\n" + \
                            "- Specify another project ID (e.g., \"Show equipment for project id 3\")\n" + \
                            "- Type \"all projects\" to view data across the entire system\n" + \
                            "- Ask \"What project options can I view?\" to see the full list"
-                    return response_text
+                    return response_text, state
                 else:
                     valid_ids = [p['id'] for p in get_projects()]
-                    return f"I couldn't find a project with ID {project_id}.\n\n" + \
+                    response_text = f"I couldn't find a project with ID {project_id}.\n\n" + \
                            f"Available project IDs are: {', '.join(map(str, valid_ids))}\n" + \
                            "Please try again with one of these IDs, or type \"What project options can I view?\" to see the full list with project names."
+                    return response_text, state
             else:  # All projects (project_id = 0)
-                data = load_data()
                 response_text = "Showing data across all projects in the system:\n\n"
                 
                 # This will be displayed separately through the visualization function
-                st.session_state.show_viz = True
-                st.session_state.viz_project_id = 0  # 0 for all projects
+                state['show_viz'] = True
+                state['viz_project_id'] = 0  # 0 for all projects
                 
                 response_text += "To filter by specific project:\n" + \
                        "- Use a project ID (e.g., \"Show data for project id 2\")\n" + \
                        "- Ask \"What project options can I view?\" to see available projects"
-                return response_text
+                return response_text, state
         
     # Default response for general or unclear questions
-    return "To retrieve accurate results, please include one of the following in your question:\n\n" + \
+    response_text = "To retrieve accurate results, please include one of the following in your question:\n\n" + \
            "- A project ID (e.g., project id 2)\n" + \
            "- A request for all projects (e.g., \"Show results for all projects\")\n" + \
            "- Ask \"What project options can I view data for?\" to get the full list."
+    return response_text, state
+
+# Process-wide cache of answers shared by every session
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache()
+
+def normalize_intent(query, parsed=None):
+    """Reduce a query to the inputs its answer depends on, used as the cache key."""
+    # The area is kept exact rather than bucketed because the answer quotes it
+    return (parsed or parse_query(query)).intent_key()
+
+def process_query(query):
+    """Answer a chat query through the response cache and apply its session state updates."""
+    cache = get_response_cache()
+    parsed = parse_query(query)
+    key = normalize_intent(query, parsed)
+    # Cached answers are dropped when the dataset or the planner knowledge base changes
+    generation = (dataset_version(), st.session_state.room_planner.knowledge_base_version)
+    cached = cache.get(key, generation)
+    if cached is None:
+        cached = answer_query(query, parsed)
+        cache.put(key, cached, generation)
+    response, state = cached
+    # The cached answer is shared by every session; each gets its own copy of the
+    # mutable state (the room plan), so no session can change another's answer
+    for name, value in state.items():
+        st.session_state[name] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+    return response
 
 # Streamlit UI
 st.title("Equipment Data Chatbot")
@@ -667,13 +516,13 @@ for message in st.session_state.chat_history:
         
 # Display visualization if needed
 if st.session_state.show_viz:
-    data = load_data()
-    create_equipment_visualization(data, st.session_state.viz_project_id)
+    aggregates = get_aggregates(st.session_state.viz_project_id)
+    create_equipment_visualization(aggregates, st.session_state.viz_project_id)
 
 # Display room planning visualization if needed
 if st.session_state.show_room_plan and st.session_state.current_room_plan:
     room_plan = st.session_state.current_room_plan
-    st.pyplot(create_room_visualization(room_plan['room_type'], room_plan['recommendations']))
+    st.pyplot(create_room_visualization(room_plan['room_type'], room_plan['area']))
     
     # Add 3D model viewer section
     st.subheader("📋 Interactive 3D Equipment Models")
@@ -803,8 +652,11 @@ if st.session_state.show_patient_form:
                 "acuity": acuity
             }
             
-            # Generate recommendations
-            recommendations = st.session_state.patient_recommender.get_recommendations(patient_data)
+            # Generate recommendations; the session's scorer only re-applies the rules of
+            # fields edited since the last submission, and profiles any session already
+            # ranked come from the shared memo. Only the top 10 are displayed.
+            scorer = st.session_state.patient_scorer.update(patient_data)
+            recommendations = scorer.get_recommendations(top_k=10)
             st.session_state.patient_recommendations = recommendations
     
     # Display recommendations if available
@@ -818,14 +670,17 @@ if st.session_state.show_patient_form:
                 f"Acuity Level: {patient_info['acuity']}/5")
         
         # Display recommendations in expandable sections
-        for i, item in enumerate(st.session_state.patient_recommendations["recommendations"][:10]):  # Top 10 recommendations
+        top_items = st.session_state.patient_recommendations["recommendations"][:10]  # Top 10 recommendations
+        # Equipment details for every item in one catalog lookup
+        all_details = st.session_state.patient_recommender.get_equipment_details_batch(
+            [item['name'] for item in top_items])
+        for i, (item, details) in enumerate(zip(top_items, all_details)):
             with st.expander(f"{i+1}. {item['name']} (Priority Score: {item['priority_score']})"):
                 st.write("**Clinical Rationale:**")
                 for rationale in item['rationales']:
                     st.write(f"- {rationale}")
                 
-                # Get equipment details
-                details = st.session_state.patient_recommender.get_equipment_details(item['name'])
+                # Equipment details
                 if details and 'details' in details:
                     st.write("**Equipment Specifications:**")
                     specs = details['details']
@@ -834,6 +689,10 @@ if st.session_state.show_patient_form:
                             st.write(f"- **{key.title()}:** {value}")
                         else:
                             st.write(f"- **Features:** {', '.join(value)}")
+                    if details['rooms']:
+                        st.write(f"- **Room Types:** {', '.join(details['rooms'])}")
+                    if details['on_hand'] is not None:
+                        st.write(f"- **On Hand:** {details['on_hand']}")
                 
                 # Add button to view 3D model if available
                 equipment_mapping = {
@@ -864,16 +723,13 @@ if st.session_state.show_patient_form:
         else:
             recommended_room = "Patient Room"
         
-        # Get room recommendations
-        room_recommendations = st.session_state.room_planner.get_equipment_recommendations(recommended_room)
-        
         # Display room type recommendation with explanation
         st.write(f"**Recommended Room Type: {recommended_room}**")
         st.write(f"This recommendation is based on the patient's acuity level ({acuity}/5) "
                 f"and their specific medical conditions.")
         
         # Show room visualization
-        fig = create_room_visualization(recommended_room, room_recommendations)
+        fig = create_room_visualization(recommended_room)
         st.pyplot(fig)
         
         # Call to action
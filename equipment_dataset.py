@@ -0,0 +1,436 @@
+"""
+Equipment Dataset Layer
+
+Typed, memory-mapped access to the PHSA equipment data. The converted export is
+normalised once into an explicit schema and stored as an uncompressed Feather
+(Arrow IPC) file; every Streamlit session and worker process then memory-maps that
+file instead of parsing the raw export, so they all share one page-cache copy.
+"""
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+DATA_DIR = 'raw data'
+PARQUET_PATH = os.path.join(DATA_DIR, 'equipment_data.parquet')
+CSV_PATH = os.path.join(DATA_DIR, 'equipment_data.csv')
+STORE_PATH = os.path.join(DATA_DIR, 'equipment_data.feather')
+PARTITION_DIR = os.path.join(DATA_DIR, 'partitions')
+MANIFEST_PATH = os.path.join(PARTITION_DIR, 'manifest.json')
+VERSION_PATH = os.path.join(DATA_DIR, 'dataset_version.json')
+
+# Column the store is partitioned on
+PROJECT_COLUMN = 'project_id'
+
+# Stable row key used to diff a new export against the store (first column present wins)
+ROW_KEY_CANDIDATES = ['equipment_id', 'asset_id', 'asset_number', 'id']
+
+# Explicit dtypes for the columns the application relies on
+COLUMN_SCHEMA = {
+    'soa_room_type': 'category',
+    'project_id': 'Int32',
+    'attachment_count': 'Int32',
+}
+
+# Text columns with at most this share of distinct values are stored as categoricals
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+_INT_DTYPES = [('Int8', np.int8), ('Int16', np.int16), ('Int32', np.int32), ('Int64', np.int64)]
+
+
+def _smallest_int_dtype(values):
+    """Return the narrowest nullable integer dtype that holds every value."""
+    if len(values) == 0:
+        return 'Int8'
+    low, high = values.min(), values.max()
+    for name, np_type in _INT_DTYPES:
+        info = np.iinfo(np_type)
+        if info.min <= low and high <= info.max:
+            return name
+    return 'Int64'
+
+
+def _coerce_column(series):
+    """Pick a compact dtype for a column that has no explicit schema entry."""
+    if isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(series) \
+            or pd.api.types.is_datetime64_any_dtype(series):
+        return series
+
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.dropna().to_numpy()
+        # Integral columns (including floats that only lost their ints to NaN) become nullable ints
+        if pd.api.types.is_integer_dtype(series) or np.all(np.mod(values, 1) == 0):
+            return series.astype(_smallest_int_dtype(values))
+        return pd.to_numeric(series, downcast='float')
+
+    non_null = series.count()
+    if non_null and series.nunique() / non_null <= CATEGORY_MAX_UNIQUE_RATIO:
+        return series.astype('category')
+    return series
+
+
+def apply_schema(df):
+    """
+    Convert a raw equipment DataFrame to the application schema.
+
+    Columns listed in COLUMN_SCHEMA get their declared dtype; every other column is
+    downcast to the smallest nullable integer, float32 or categorical that fits.
+
+    Args:
+        df (pd.DataFrame): Raw equipment data
+
+    Returns:
+        pd.DataFrame: Typed equipment data
+    """
+    typed = {}
+    for col in df.columns:
+        series = df[col]
+        dtype = COLUMN_SCHEMA.get(col)
+        if dtype is None:
+            typed[col] = _coerce_column(series)
+        elif dtype == 'category':
+            typed[col] = series.astype('category')
+        else:
+            typed[col] = pd.to_numeric(series, errors='coerce').round().astype(dtype)
+    return pd.DataFrame(typed)
+
+
+def _read_source(source):
+    if source.endswith('.parquet'):
+        # Keep dictionary-encoded string columns as categoricals on the way in
+        return pq.read_table(source).to_pandas()
+    return pd.read_csv(source, low_memory=False)
+
+
+def find_source():
+    """Return the newest available raw export (Parquet from the converter, else legacy CSV)."""
+    for path in (PARQUET_PATH, CSV_PATH):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def build_store(source=None, output=STORE_PATH):
+    """
+    Normalise the raw export and write it as an uncompressed Feather file.
+
+    The file is left uncompressed so readers can memory-map it without copying.
+
+    Args:
+        source (str): Raw export path (defaults to find_source())
+        output (str): Destination Feather path
+
+    Returns:
+        str: Path of the written store
+    """
+    source = source or find_source()
+    if source is None:
+        raise FileNotFoundError(
+            f"No equipment export found in '{DATA_DIR}'. Run convert_to_parquet.py first."
+        )
+
+    df = apply_schema(_read_source(source))
+    _write_store(df, output)
+    bump_version({'source': source, 'rows': len(df), 'full_rebuild': True})
+    return output
+
+
+def _temp_path(path):
+    """Per-process scratch name next to `path`, so concurrent writers never share one."""
+    return f'{path}.{os.getpid()}.tmp'
+
+
+def _write_store(df, output):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Categoricals built from several row groups carry one dictionary per chunk
+    table = table.unify_dictionaries().combine_chunks()
+
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    tmp_output = _temp_path(output)
+    feather.write_feather(table, tmp_output, compression='uncompressed')
+    # Atomic swap: processes that already mapped the old file keep reading it safely
+    os.replace(tmp_output, output)
+    return table
+
+
+def dataset_version(path=VERSION_PATH):
+    """Return the current dataset version number (0 before the first build)."""
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return json.load(f)['version']
+
+
+def bump_version(changes, path=VERSION_PATH):
+    """Increment the dataset version and record what changed."""
+    record = dict(changes, version=dataset_version(path) + 1, updated_at=time.time())
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = _temp_path(path)
+    with open(tmp_path, 'w') as f:
+        json.dump(record, f, indent=2)
+    os.replace(tmp_path, path)
+    return record['version']
+
+
+def _store_is_stale(path):
+    if not os.path.exists(path):
+        return True
+    source = find_source()
+    return source is not None and os.path.getmtime(source) > os.path.getmtime(path)
+
+
+def load_equipment_table(path=STORE_PATH):
+    """
+    Open the equipment store as a memory-mapped Arrow table.
+
+    The store is (re)built first if it is missing or older than the raw export.
+    Read the columns needed from the table rather than converting all of it to
+    pandas, which would copy the shared pages into each process.
+
+    Returns:
+        pa.Table: Equipment table backed by the memory-mapped file
+    """
+    if _store_is_stale(path):
+        build_store(output=path)
+    return feather.read_table(path, memory_map=True)
+
+
+def build_partitions(table=None, output_dir=PARTITION_DIR, project_ids=None):
+    """
+    Split the store into one Feather file per project and write a manifest.
+
+    Rows are sorted by PROJECT_COLUMN once and each project's contiguous slice is
+    written to its own file. The manifest maps each project_id to its file and row
+    count, so a project lookup is a dictionary access plus one memory-mapped read.
+    Rows without a project_id are not partitioned (they remain in the full store).
+
+    Args:
+        table (pa.Table): Equipment table (defaults to load_equipment_table())
+        output_dir (str): Directory for the partition files and manifest
+        project_ids (iterable): Only rewrite these projects' partitions and keep the
+            rest of the existing manifest (default: rebuild every partition)
+
+    Returns:
+        dict: The written manifest
+    """
+    table = table if table is not None else load_equipment_table()
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, os.path.basename(MANIFEST_PATH))
+
+    manifest = {'project_column': None, 'partitions': {}, 'unassigned_rows': table.num_rows}
+    if project_ids is not None and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        for project_id in project_ids:
+            manifest['partitions'].pop(str(project_id), None)
+
+    if PROJECT_COLUMN in table.column_names:
+        project_column = table.column(PROJECT_COLUMN)
+        if project_ids is None:
+            assigned = table.filter(pc.is_valid(project_column))
+        else:
+            assigned = table.filter(pc.is_in(project_column, value_set=pa.array(
+                list(project_ids), type=project_column.type)))
+        order = pc.sort_indices(assigned, sort_keys=[(PROJECT_COLUMN, 'ascending')])
+        assigned = assigned.take(order)
+
+        ids = assigned.column(PROJECT_COLUMN).to_numpy()
+        unique_ids, starts, counts = np.unique(ids, return_index=True, return_counts=True)
+        for project_id, start, count in zip(unique_ids.tolist(), starts.tolist(), counts.tolist()):
+            filename = f'{PROJECT_COLUMN}={project_id}.feather'
+            partition_path = os.path.join(output_dir, filename)
+            tmp_path = _temp_path(partition_path)
+            feather.write_feather(assigned.slice(start, count), tmp_path, compression='uncompressed')
+            # Sessions may have the old partition mapped; swap rather than overwrite it
+            os.replace(tmp_path, partition_path)
+            manifest['partitions'][str(project_id)] = {'path': filename, 'rows': count}
+
+        manifest['project_column'] = PROJECT_COLUMN
+        manifest['unassigned_rows'] = project_column.null_count
+
+    tmp_path = _temp_path(manifest_path)
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Return the partition manifest, rebuilding the partitions if they are stale."""
+    if not os.path.exists(path) or _store_is_stale(STORE_PATH) \
+            or os.path.getmtime(STORE_PATH) > os.path.getmtime(path):
+        return build_partitions(output_dir=os.path.dirname(path))
+    with open(path) as f:
+        return json.load(f)
+
+
+def project_partition_path(project_id, manifest_path=MANIFEST_PATH):
+    """Return the partition file holding a project's rows, or None if it has none."""
+    manifest = load_manifest(manifest_path)
+    entry = manifest['partitions'].get(str(project_id))
+    if entry is None:
+        return None
+    return os.path.join(os.path.dirname(manifest_path), entry['path'])
+
+
+def load_project_table(project_id, manifest_path=MANIFEST_PATH):
+    """
+    Open only one project's rows as a memory-mapped Arrow table.
+
+    Args:
+        project_id (int): Project to load
+        manifest_path (str): Partition manifest to resolve the project through
+
+    Returns:
+        pa.Table: The project's rows (empty if the project has no equipment). If the
+            dataset has no project column at all, the full table is returned.
+    """
+    manifest = load_manifest(manifest_path)
+    if manifest['project_column'] is None:
+        return load_equipment_table()
+
+    entry = manifest['partitions'].get(str(project_id))
+    if entry is None:
+        return load_equipment_table().schema.empty_table()
+    partition_path = os.path.join(os.path.dirname(manifest_path), entry['path'])
+    return feather.read_table(partition_path, memory_map=True)
+
+
+def _row_hashes(df, columns):
+    """
+    Hash each row's content.
+
+    Numbers are widened to float64 so a value hashes the same whatever integer or
+    float width apply_schema picked for it; categoricals already hash by value.
+    """
+    normalized = {}
+    for col in columns:
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            normalized[col] = series.astype('float64')
+        else:
+            normalized[col] = series
+    return pd.util.hash_pandas_object(pd.DataFrame(normalized, index=df.index), index=False)
+
+
+def _read_export(path):
+    """Read a new export (xlsx, Parquet or CSV) as a typed DataFrame."""
+    if path.endswith('.xlsx'):
+        # Imported lazily: openpyxl is only needed when refreshing straight from Excel
+        from convert_to_parquet import convert_workbook
+        # The suffix matters: _read_source picks its reader by extension
+        converted = _temp_path(PARQUET_PATH + '.incoming') + '.parquet'
+        convert_workbook(path, converted)
+        try:
+            return apply_schema(_read_source(converted))
+        finally:
+            os.remove(converted)
+    return apply_schema(_read_source(path))
+
+
+def refresh_dataset(new_export, key_columns=None, store_path=STORE_PATH):
+    """
+    Apply a new export to the store incrementally.
+
+    The export is diffed against the current store by a stable row key and a per-row
+    content hash. Only inserted, updated and deleted rows change; the partitions of
+    the projects those rows belong to are rewritten, every other partition file (and
+    the aggregates computed from it) is left untouched. The dataset version is bumped
+    when anything changed, which is what the app's load_data() caches on.
+
+    Args:
+        new_export (str): Path of the new .xlsx, .parquet or .csv export
+        key_columns (list): Row key columns (defaults to the first ROW_KEY_CANDIDATES
+            column present)
+        store_path (str): Equipment store to update
+
+    Returns:
+        dict: Counts of inserted, updated and deleted rows and the resulting version
+    """
+    if not os.path.exists(store_path):
+        # Nothing to diff against yet: this export becomes the initial store
+        if new_export.endswith('.xlsx'):
+            from convert_to_parquet import convert_workbook
+            convert_workbook(new_export, PARQUET_PATH)
+            new_export = PARQUET_PATH
+        build_store(new_export, store_path)
+        table = feather.read_table(store_path, memory_map=True)
+        build_partitions(table)
+        return {'inserted': table.num_rows, 'updated': 0, 'deleted': 0, 'version': dataset_version()}
+
+    current = feather.read_table(store_path, memory_map=True).to_pandas(split_blocks=True)
+    incoming = _read_export(new_export)
+
+    if key_columns is None:
+        key_columns = [next((c for c in ROW_KEY_CANDIDATES if c in incoming.columns), None)]
+        if key_columns[0] is None:
+            raise KeyError(f"New export has none of the row key columns {ROW_KEY_CANDIDATES}; "
+                           f"pass key_columns explicitly")
+    if list(current.columns) != list(incoming.columns):
+        # Schema changed: there is nothing meaningful to diff against
+        build_partitions(_write_store(incoming, store_path))
+        version = bump_version({'source': new_export, 'rows': len(incoming), 'full_rebuild': True})
+        return {'inserted': len(incoming), 'updated': 0, 'deleted': len(current), 'version': version}
+
+    value_columns = [c for c in current.columns if c not in key_columns]
+    current_keys = pd.MultiIndex.from_frame(current[key_columns].astype(object))
+    incoming_keys = pd.MultiIndex.from_frame(incoming[key_columns].astype(object))
+    if incoming_keys.has_duplicates:
+        raise ValueError(f"Row key {key_columns} is not unique in {new_export}")
+
+    current_hashes = pd.Series(_row_hashes(current, value_columns).to_numpy(), index=current_keys)
+    incoming_hashes = pd.Series(_row_hashes(incoming, value_columns).to_numpy(), index=incoming_keys)
+
+    in_current = incoming_keys.isin(current_keys)
+    in_incoming = current_keys.isin(incoming_keys)
+    inserted = ~in_current
+    deleted = ~in_incoming
+    updated = in_current.copy()
+    updated[in_current] = incoming_hashes[in_current].to_numpy() != \
+        current_hashes.reindex(incoming_keys[in_current]).to_numpy()
+
+    if not (inserted.any() or deleted.any() or updated.any()):
+        return {'inserted': 0, 'updated': 0, 'deleted': 0, 'version': dataset_version()}
+
+    # Keep unchanged rows as they are and take changed/new rows from the export
+    replaced = deleted | current_keys.isin(incoming_keys[updated])
+    changed_rows = incoming[inserted | updated]
+    merged = pd.concat([current[~replaced], changed_rows], ignore_index=True)
+    merged = apply_schema(merged)
+    table = _write_store(merged, store_path)
+
+    if PROJECT_COLUMN in merged.columns:
+        touched = pd.concat([current.loc[replaced, PROJECT_COLUMN], changed_rows[PROJECT_COLUMN]])
+        build_partitions(table, project_ids=sorted(touched.dropna().astype(int).unique().tolist()))
+    else:
+        build_partitions(table)
+
+    changes = {
+        'source': new_export,
+        'rows': len(merged),
+        'inserted': int(inserted.sum()),
+        'updated': int(updated.sum()),
+        'deleted': int(deleted.sum()),
+        'full_rebuild': False,
+    }
+    changes['version'] = bump_version(changes)
+    return {k: changes[k] for k in ('inserted', 'updated', 'deleted', 'version')}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Incrementally apply a new equipment export")
+    parser.add_argument('export', help="New .xlsx, .parquet or .csv export")
+    parser.add_argument('--key', nargs='+', default=None, help="Row key column(s)")
+    args = parser.parse_args()
+
+    result = refresh_dataset(args.export, key_columns=args.key)
+    print(f"Dataset version {result['version']}: {result['inserted']} inserted, "
+          f"{result['updated']} updated, {result['deleted']} deleted")
@@ -0,0 +1,522 @@
+"""
+Floor Plans
+
+RoomPlanner lays out one room at a time; a project floor holds hundreds. FloorPlan
+packs a floor's rooms along double-loaded corridors (a spine corridor on the west
+side feeding east-west corridors with a row of rooms on each side), turns each
+room so its door opens onto its corridor and places its equipment with the
+room's solved layout. Rooms and corridors are kept in uniform-grid spatial
+indexes, so overlap, clearance and corridor queries only look at nearby cells, and
+corridor reachability is one connected-component labelling of the walkable grid.
+When a room is resized, moved or changes type, only that room and the rooms it
+touched before or after the change are re-validated; the whole floor is
+re-checked only if the change opened or blocked a corridor.
+
+Coordinates are in feet with the origin at the floor's lower-left corner; the
+floor entrance is at the foot of the spine corridor.
+"""
+import heapq
+import math
+
+import numpy as np
+from scipy import ndimage
+
+from layout_solver import LayoutSolver, door_zone
+from room_planner import RoomPlanner, room_size
+
+# Clear width of every corridor (ft)
+CORRIDOR_WIDTH = 8.0
+# Gap left between neighbouring rooms for their walls (ft)
+WALL_THICKNESS = 0.5
+# Spatial index cell size (ft); about one room across
+INDEX_CELL_SIZE = 20.0
+# Area of rooms of a type neither knowledge-base table sizes (sq ft)
+DEFAULT_ROOM_AREA = 100.0
+# Planning module (ft): room sides are rounded up to a multiple of it, so rooms
+# of a type and similar area share one layout solve
+PLANNING_MODULE = 2.0
+# Cell size of the walkable grid used for reachability and corridor paths (ft)
+GRID_RESOLUTION = 1.0
+
+
+def _overlaps(a, b):
+    """True if two (x0, y0, x1, y1) rectangles share area (touching edges do not count)."""
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def module_size(area):
+    """(width, depth) of a room of at least `area` sq ft, on the planning module."""
+    width, depth = room_size(area)
+    return (math.ceil(width / PLANNING_MODULE - 1e-9) * PLANNING_MODULE,
+            math.ceil(depth / PLANNING_MODULE - 1e-9) * PLANNING_MODULE)
+
+
+class GridIndex:
+    """Uniform-grid spatial index of axis-aligned rectangles, keyed by id."""
+
+    def __init__(self, cell_size=INDEX_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.rects = {}
+
+    def __len__(self):
+        return len(self.rects)
+
+    def _cells(self, rect):
+        size = self.cell_size
+        x0, y0 = int(math.floor(rect[0] / size)), int(math.floor(rect[1] / size))
+        x1, y1 = int(math.floor(rect[2] / size)), int(math.floor(rect[3] / size))
+        return [(cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)]
+
+    def insert(self, key, rect):
+        """Add a rectangle, replacing any earlier one under the same key."""
+        if key in self.rects:
+            self.remove(key)
+        self.rects[key] = rect
+        for cell in self._cells(rect):
+            self.cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        rect = self.rects.pop(key)
+        for cell in self._cells(rect):
+            members = self.cells[cell]
+            members.discard(key)
+            if not members:
+                del self.cells[cell]
+
+    def query(self, rect, margin=0.0):
+        """
+        Keys whose rectangles overlap a rectangle.
+
+        Args:
+            rect (tuple): (x0, y0, x1, y1) query rectangle
+            margin (float): Grow the query by this much on every side, to find
+                everything within a clearance distance
+
+        Returns:
+            list: Matching keys, sorted
+        """
+        if margin:
+            rect = (rect[0] - margin, rect[1] - margin, rect[2] + margin, rect[3] + margin)
+        found = set()
+        for cell in self._cells(rect):
+            members = self.cells.get(cell)
+            if members:
+                found |= members
+        rects = self.rects
+        return sorted(key for key in found if _overlaps(rects[key], rect))
+
+
+class FloorRoom:
+    """
+    One room placed on a floor.
+
+    `width` and `depth` are the room's own dimensions on the planning module, as
+    its layout is solved, with the door on its left wall. On the floor the room is turned so
+    that wall faces its corridor: `facing` is 'up' for a room below its corridor
+    and 'down' for one above it, and `rect` is the floor rectangle it occupies.
+    """
+    __slots__ = ('id', 'name', 'room_type', 'area', 'width', 'depth', 'rect', 'facing', 'layout')
+
+    def __init__(self, room_id, name, room_type, area):
+        self.id = room_id
+        self.name = name
+        self.room_type = room_type
+        self.area = area
+        self.width, self.depth = module_size(area)
+        self.rect = None
+        self.facing = None
+        self.layout = None
+
+    @property
+    def span(self):
+        """(along the corridor, away from the corridor) extent in feet."""
+        return self.depth, self.width
+
+    def place(self, x, y, facing):
+        """Put the room's lower-left corner at (x, y), its door facing `facing`."""
+        along, away = self.span
+        self.rect = (x, y, x + along, y + away)
+        self.facing = facing
+
+    def to_floor(self, rect):
+        """Map a rectangle from the room's own frame to floor coordinates."""
+        x, y, _, _ = self.rect
+        along, away = self.span
+        if self.facing == 'up':
+            # Room frame rotated -90 degrees: its left wall becomes the top wall
+            return (x + rect[1], y + away - rect[2], x + rect[3], y + away - rect[0])
+        # Rotated +90 degrees: its left wall becomes the bottom wall
+        return (x + along - rect[3], y + rect[0], x + along - rect[1], y + rect[2])
+
+    @property
+    def door(self):
+        """The door opening as a floor segment ((x0, y), (x1, y)) on the corridor wall."""
+        _, low, _, high = self.layout['door'] if self.layout is not None else door_zone(self.width, self.depth)
+        x0, y0, x1, y1 = self.to_floor((0.0, low, 0.0, high))
+        wall = y1 if self.facing == 'up' else y0
+        return (x0, wall), (x1, wall)
+
+    def equipment(self):
+        """
+        The room's solved equipment in floor coordinates.
+
+        Returns:
+            list: dicts with 'name', 'shape', 'mount', 'footprint' and
+                'clearance_zone' floor rectangles
+        """
+        if self.layout is None:
+            return []
+        return [{
+            'name': item['name'],
+            'shape': item['shape'],
+            'mount': item['mount'],
+            'footprint': self.to_floor(item['footprint']),
+            'clearance_zone': self.to_floor(item['clearance_zone']),
+        } for item in self.layout['items']]
+
+
+class FloorPlan:
+    """
+    Rooms, corridors and equipment of one floor, with continuous validation.
+
+    Problems found are kept in `issues` (room id -> list of (kind, detail)):
+    'outside' (not within the floor), 'overlap' (detail: the other room's id),
+    'corridor' (the room intrudes into corridor detail), 'access' (its door
+    does not reach the entrance through the corridors), 'equipment' (number of
+    clearance conflicts in its layout) and 'undersized' (detail: minimum area).
+    """
+
+    def __init__(self, width, depth, corridor_width=CORRIDOR_WIDTH, planner=None):
+        """
+        Args:
+            width (float): Floor width along x (ft)
+            depth (float): Floor depth along y (ft)
+            corridor_width (float): Clear corridor width (ft)
+            planner (RoomPlanner): Source of room types, areas and layouts
+        """
+        self.width = float(width)
+        self.depth = float(depth)
+        self.corridor_width = float(corridor_width)
+        self.planner = planner or RoomPlanner()
+        self.entrance = (self.corridor_width / 2, 0.0)
+        # Solved layouts by (room type, width, depth, knowledge-base version); kept
+        # per plan so a floor's many sizes do not evict the planner's shared cache
+        self._layouts = {}
+        self._reset()
+
+    def _reset(self):
+        self.rooms = {}
+        self.unplaced = []
+        self.room_index = GridIndex()
+        self.corridors = []
+        self.corridor_index = GridIndex()
+        self.issues = {}
+        self._labels = None
+
+    # -- planning ---------------------------------------------------------------
+
+    def _room_area(self, room_type, area):
+        if area:
+            return float(area)
+        limits = self.planner.area_limits(room_type)
+        return float(limits[1]) if limits is not None else DEFAULT_ROOM_AREA
+
+    def _make_room(self, room_id, spec):
+        if isinstance(spec, str):
+            spec = {'room_type': spec}
+        room_type = self._room_type(spec['room_type'])
+        name = spec.get('name') or f"{room_type} {room_id + 1}"
+        return FloorRoom(room_id, name, room_type, self._room_area(room_type, spec.get('area')))
+
+    def _room_type(self, room_type):
+        # Strict matching: a "Storage closet" is not an operating room ("or"); types
+        # the knowledge base does not name are kept as given and left unequipped
+        return self.planner.standardize_room_type(room_type, strict=True) or room_type
+
+    def _solve_room(self, room):
+        geometry = self.planner.room_geometry(room.room_type)
+        if geometry is None:
+            room.layout = None
+            return
+        key = (room.room_type, room.width, room.depth, self.planner.knowledge_base_version)
+        if key not in self._layouts:
+            self._layouts[key] = LayoutSolver(room.width, room.depth).solve(geometry.items())
+        room.layout = self._layouts[key]
+
+    def plan(self, rooms):
+        """
+        Lay out a floor.
+
+        Rooms are packed in rows on both sides of each corridor, deepest rooms
+        first so rows waste little depth. Rooms that do not fit are listed in
+        `unplaced`.
+
+        Args:
+            rooms (list): Room type strings, or dicts with 'room_type' and
+                optional 'area' (sq ft; default: the type's recommended area)
+                and 'name'
+
+        Returns:
+            FloorPlan: self, for chaining
+        """
+        self._reset()
+        pending = [self._make_room(room_id, spec) for room_id, spec in enumerate(rooms)]
+        pending.sort(key=lambda room: -room.span[1])
+        spine = (0.0, 0.0, self.corridor_width, self.depth)
+        self._add_corridor(spine)
+
+        start_x = self.corridor_width + WALL_THICKNESS
+        y = 0.0
+        while pending:
+            lower, pending = self._fill_row(pending, start_x)
+            if not lower:
+                break
+            lower_depth = max(room.span[1] for room in lower)
+            corridor_y = y + lower_depth + WALL_THICKNESS
+            if corridor_y + self.corridor_width > self.depth:
+                pending = lower + pending
+                break
+            for room in lower:
+                room.place(room.rect[0], corridor_y - WALL_THICKNESS - room.span[1], 'up')
+            self._add_corridor((self.corridor_width, corridor_y, self.width, corridor_y + self.corridor_width))
+            self._commit(lower)
+
+            upper_y = corridor_y + self.corridor_width + WALL_THICKNESS
+            upper, pending = self._fill_row(pending, start_x)
+            fits = [room for room in upper if upper_y + room.span[1] <= self.depth]
+            pending = [room for room in upper if upper_y + room.span[1] > self.depth] + pending
+            for room in fits:
+                room.place(room.rect[0], upper_y, 'down')
+            self._commit(fits)
+            if not fits:
+                break
+            y = upper_y + max(room.span[1] for room in fits) + WALL_THICKNESS
+        self.unplaced = sorted(pending, key=lambda room: room.id)
+
+        self._build_walkable()
+        self.validate()
+        return self
+
+    def _fill_row(self, pending, start_x):
+        """Take rooms from `pending` until the row is full; returns (row, rest)."""
+        row, rest = [], []
+        x = start_x
+        for room in pending:
+            along = room.span[0]
+            if x + along <= self.width:
+                room.place(x, 0.0, None)
+                row.append(room)
+                x += along + WALL_THICKNESS
+            else:
+                rest.append(room)
+        return row, rest
+
+    def _add_corridor(self, rect):
+        self.corridor_index.insert(len(self.corridors), rect)
+        self.corridors.append(rect)
+
+    def _commit(self, rooms):
+        for room in rooms:
+            self._solve_room(room)
+            self.rooms[room.id] = room
+            self.room_index.insert(room.id, room.rect)
+
+    # -- validation -------------------------------------------------------------
+
+    def _cell(self, x, y):
+        return int(y // GRID_RESOLUTION), int(x // GRID_RESOLUTION)
+
+    @staticmethod
+    def _cell_slice(rect, shape):
+        rows, cols = shape
+        return (slice(max(0, int(rect[1] // GRID_RESOLUTION)), min(rows, int(math.ceil(rect[3] / GRID_RESOLUTION)))),
+                slice(max(0, int(rect[0] // GRID_RESOLUTION)), min(cols, int(math.ceil(rect[2] / GRID_RESOLUTION)))))
+
+    def _build_walkable(self):
+        """Label the corridor cells connected to the entrance, with rooms blocking what they cover."""
+        shape = (int(math.ceil(self.depth / GRID_RESOLUTION)), int(math.ceil(self.width / GRID_RESOLUTION)))
+        walkable = np.zeros(shape, dtype=bool)
+        for rect in self.corridors:
+            walkable[self._cell_slice(rect, shape)] = True
+        for corridor in self.corridors:
+            for room_id in self.room_index.query(corridor):
+                walkable[self._cell_slice(self.rooms[room_id].rect, shape)] = False
+        labels, _ = ndimage.label(walkable)
+        self._labels = labels
+        self._entrance_label = labels[self._cell(*self.entrance)]
+
+    def _access_cell(self, room):
+        """Grid cell just outside the middle of the room's door, across its wall."""
+        (x0, y), (x1, _) = room.door
+        step = WALL_THICKNESS + GRID_RESOLUTION / 2
+        return self._cell((x0 + x1) / 2, y + step if room.facing == 'up' else y - step)
+
+    def _reachable(self, room):
+        row, col = self._access_cell(room)
+        rows, cols = self._labels.shape
+        if not (0 <= row < rows and 0 <= col < cols):
+            return False
+        return self._entrance_label != 0 and self._labels[row, col] == self._entrance_label
+
+    def _room_issues(self, room):
+        issues = []
+        x0, y0, x1, y1 = room.rect
+        if x0 < 0 or y0 < 0 or x1 > self.width or y1 > self.depth:
+            issues.append(('outside', None))
+        for other in self.room_index.query(room.rect):
+            if other != room.id:
+                issues.append(('overlap', other))
+        for corridor in self.corridor_index.query(room.rect):
+            issues.append(('corridor', corridor))
+        if not self._reachable(room):
+            issues.append(('access', None))
+        if room.layout is not None and room.layout['conflicts']:
+            issues.append(('equipment', len(room.layout['conflicts'])))
+        limits = self.planner.area_limits(room.room_type)
+        if limits is not None and room.area < limits[0]:
+            issues.append(('undersized', limits[0]))
+        return issues
+
+    def validate(self, room_ids=None):
+        """
+        Re-check rooms (all by default) and update `issues`.
+
+        Returns:
+            dict: `issues`, room id -> list of (kind, detail)
+        """
+        for room_id in (self.rooms if room_ids is None else room_ids):
+            issues = self._room_issues(self.rooms[room_id])
+            if issues:
+                self.issues[room_id] = issues
+            else:
+                self.issues.pop(room_id, None)
+        return self.issues
+
+    def update_room(self, room_id, room_type=None, area=None, position=None):
+        """
+        Change one placed room and re-validate what the change can affect.
+
+        A resized room keeps its corner at the corridor wall, so it grows away
+        from its corridor and along it to the east.
+
+        Args:
+            room_id (int): Room to change
+            room_type (str): New room type (any recognized spelling)
+            area (float): New area in square feet
+            position (tuple): New (x, y) of the room's lower-left corner
+
+        Returns:
+            dict: `issues`, room id -> list of (kind, detail)
+        """
+        room = self.rooms[room_id]
+        old_rect = room.rect
+        affected = set(self.room_index.query(old_rect)) | {room_id}
+        touched_corridor = bool(self.corridor_index.query(old_rect))
+
+        if room_type is not None:
+            room.room_type = self._room_type(room_type)
+        if area is not None:
+            room.area = float(area)
+            room.width, room.depth = module_size(room.area)
+        x, y = position if position is not None else (old_rect[0], old_rect[1])
+        if position is None and room.facing == 'up':
+            # Keep the door wall on the corridor
+            y = old_rect[3] - room.span[1]
+        room.place(x, y, room.facing)
+        if room_type is not None or area is not None:
+            self._solve_room(room)
+
+        self.room_index.insert(room_id, room.rect)
+        affected |= set(self.room_index.query(room.rect))
+        if touched_corridor or self.corridor_index.query(room.rect):
+            # Walkable space changed: reachability may have changed anywhere
+            self._build_walkable()
+            return self.validate()
+        return self.validate(affected)
+
+    # -- queries ----------------------------------------------------------------
+
+    def rooms_in(self, rect, margin=0.0):
+        """Rooms overlapping a floor rectangle, or within `margin` feet of it."""
+        return [self.rooms[room_id] for room_id in self.room_index.query(rect, margin)]
+
+    def equipment_in(self, rect, margin=0.0):
+        """Equipment (as FloorRoom.equipment()) whose footprint overlaps a floor rectangle grown by `margin`."""
+        grown = (rect[0] - margin, rect[1] - margin, rect[2] + margin, rect[3] + margin)
+        found = []
+        for room in self.rooms_in(grown):
+            for item in room.equipment():
+                if _overlaps(item['footprint'], grown):
+                    found.append(dict(item, room=room.id))
+        return found
+
+    def corridor_path(self, from_room, to_room=None):
+        """
+        Shortest corridor route between two rooms' doors (or a room and the entrance).
+
+        Args:
+            from_room (int): Start room id
+            to_room (int): End room id; None for the floor entrance
+
+        Returns:
+            dict: 'length' in feet and 'path', the (x, y) turning points from door
+                to door; None if the corridors do not connect them
+        """
+        labels = self._labels
+        start = self._access_cell(self.rooms[from_room])
+        goal = self._cell(*self.entrance) if to_room is None else self._access_cell(self.rooms[to_room])
+        rows, cols = labels.shape
+        if not all(0 <= r < rows and 0 <= c < cols and labels[r, c] for r, c in (start, goal)):
+            return None
+        if labels[start] != labels[goal]:
+            return None
+
+        # A* over the walkable cells with a Manhattan heuristic
+        frontier = [(0, 0, start)]
+        came_from = {start: None}
+        cost = {start: 0}
+        while frontier:
+            _, steps, cell = heapq.heappop(frontier)
+            if cell == goal:
+                break
+            if steps > cost[cell]:
+                continue
+            r, c = cell
+            for nxt in ((r + 1, c), (r - 1, c), (r, c + 1), (r, c - 1)):
+                if 0 <= nxt[0] < rows and 0 <= nxt[1] < cols and labels[nxt] and steps + 1 < cost.get(nxt, 1 << 60):
+                    cost[nxt] = steps + 1
+                    came_from[nxt] = cell
+                    heapq.heappush(frontier, (steps + 1 + abs(nxt[0] - goal[0]) + abs(nxt[1] - goal[1]),
+                                              steps + 1, nxt))
+
+        cells = []
+        cell = goal
+        while cell is not None:
+            cells.append(cell)
+            cell = came_from[cell]
+        cells.reverse()
+        # Keep only the cells where the route turns
+        turns = [cells[0]] + [cells[i] for i in range(1, len(cells) - 1)
+                              if (cells[i][0] - cells[i - 1][0], cells[i][1] - cells[i - 1][1])
+                              != (cells[i + 1][0] - cells[i][0], cells[i + 1][1] - cells[i][1])] + [cells[-1]]
+        half = GRID_RESOLUTION / 2
+        return {
+            'length': round(cost[goal] * GRID_RESOLUTION, 1),
+            'path': [(c * GRID_RESOLUTION + half, r * GRID_RESOLUTION + half) for r, c in turns],
+        }
+
+    def summary(self):
+        """Counts of placed and unplaced rooms by type, and of rooms with each kind of issue."""
+        placed, issue_counts = {}, {}
+        for room in self.rooms.values():
+            placed[room.room_type] = placed.get(room.room_type, 0) + 1
+        for issues in self.issues.values():
+            for kind in {kind for kind, _ in issues}:
+                issue_counts[kind] = issue_counts.get(kind, 0) + 1
+        return {
+            'placed': placed,
+            'unplaced': len(self.unplaced),
+            'corridors': len(self.corridors),
+            'issues': issue_counts,
+        }
@@ -0,0 +1,262 @@
+"""
+Incremental Patient Recommendations
+
+Clinicians build a patient profile one edit at a time: add a condition, change
+the acuity, correct the weight. IncrementalRecommender keeps one patient's
+equipment scores and rationales between edits and, on each change, only
+retracts and applies the knowledge-base rules of the features that changed, so
+a large multi-morbidity profile is not re-scored from scratch. Its results are
+identical to PatientRecommender.get_recommendations() on the same profile,
+including tie order and rationale order, and with a memo-enabled recommender
+they are shared through the same process-wide memo.
+"""
+import heapq
+from bisect import bisect_left
+
+import numpy as np
+
+from patient_recommender import PatientRecommender
+
+# Order in which KnowledgeBaseIndex.patient_features emits each kind of feature
+SECTION_ORDER = ('condition', 'demographic', 'need', 'treatment', 'acuity')
+
+# Rule keys are packed into one int, (section, sequence, rule position) from the
+# most significant end, so they compare and bisect as plain integers
+SECTION_SPAN = 1 << 48
+RULE_SPAN = 1 << 16
+
+
+class IncrementalRecommender:
+    """
+    One patient's recommendations, kept up to date as the profile changes.
+
+    Every matched feature occupies a slot keyed on (section, sequence), which
+    sorts in the order the full scorer applies features. Each equipment item keeps the
+    sorted keys of the rules that touched it alongside their rationales, so its
+    first key gives the full scorer's tie order and its rationale list is always
+    in application order.
+    """
+
+    def __init__(self, patient_data=None, recommender=None):
+        """
+        Args:
+            patient_data (dict): Initial profile, as taken by get_recommendations();
+                defaults to an empty profile
+            recommender (PatientRecommender): Source of the knowledge-base index
+        """
+        self.recommender = recommender or PatientRecommender(use_memo=False)
+        self._reset()
+        self.update(patient_data if patient_data is not None else {})
+
+    def _reset(self):
+        self.index = self.recommender.index
+        feature_sections = {feature: SECTION_ORDER.index(kind)
+                            for (kind, _), feature in self.index.feature_codes.items()}
+        self._feature_sections = [feature_sections[feature] for feature in range(len(self.index.rules))]
+        # Per section: list of (slot key, matched feature tuple)
+        self._sections = [[] for _ in SECTION_ORDER]
+        self._sequence = 0
+        # Equipment code -> total score, sorted rule keys and rationales in key order
+        self._scores = {}
+        self._keys = {}
+        self._rationales = {}
+
+    def update(self, patient_data):
+        """
+        Replace the profile, applying only the changes since the last one.
+
+        Args:
+            patient_data (dict): The full new profile
+
+        Returns:
+            IncrementalRecommender: self, for chaining
+        """
+        if self.recommender.index is not self.index:
+            # The knowledge base was reloaded; nothing computed so far still holds
+            self._reset()
+        self.patient_data = patient_data
+
+        matched = [[] for _ in SECTION_ORDER]
+        sections = self._feature_sections
+        for entry in self.index.patient_features(patient_data):
+            matched[sections[entry[0]]].append(entry)
+
+        for section, new in enumerate(matched):
+            self._replace_section(section, new)
+        return self
+
+    def _replace_section(self, section, new):
+        old = self._sections[section]
+        # Keep the unchanged prefix; everything after it is retracted and re-applied
+        common = 0
+        while common < len(old) and common < len(new) and old[common][1] == new[common]:
+            common += 1
+        for slot, entry in old[common:]:
+            self._retract(slot, entry)
+        del old[common:]
+        for entry in new[common:]:
+            old.append((self._apply(section, entry), entry))
+
+    def _apply(self, section, entry):
+        """Apply a matched feature's rules in a new last slot of `section`; returns the slot."""
+        self._sequence += 1
+        slot = (section * SECTION_SPAN + self._sequence) * RULE_SPAN
+        feature, label, weight = entry
+        prefix = "[" + label
+        for position, rule in enumerate(self.index.rules[feature]):
+            code, key = rule.code, slot + position
+            keys = self._keys.get(code)
+            if keys is None:
+                self._keys[code] = [key]
+                self._rationales[code] = [prefix + rule.rationale_suffix]
+                self._scores[code] = rule.priority * weight
+            else:
+                at = bisect_left(keys, key)
+                keys.insert(at, key)
+                self._rationales[code].insert(at, prefix + rule.rationale_suffix)
+                self._scores[code] += rule.priority * weight
+        return slot
+
+    def _retract(self, slot, entry):
+        feature, _, weight = entry
+        for position, rule in enumerate(self.index.rules[feature]):
+            code = rule.code
+            keys = self._keys[code]
+            at = bisect_left(keys, slot + position)
+            del keys[at]
+            if keys:
+                del self._rationales[code][at]
+                self._scores[code] -= rule.priority * weight
+            else:
+                del self._keys[code], self._rationales[code], self._scores[code]
+
+    def _changed(self, field, value):
+        """
+        Replace one field in a shallow copy of the profile (earlier inputs are never mutated).
+
+        Returns:
+            bool: False if the knowledge base was reloaded and the profile has been
+                re-scored in full, leaving no delta to apply
+        """
+        patient_data = dict(self.patient_data)
+        patient_data[field] = value
+        if self.recommender.index is not self.index:
+            self.update(patient_data)
+            return False
+        self.patient_data = patient_data
+        return True
+
+    def _add_item(self, field, kind, value):
+        if not self._changed(field, list(self.patient_data.get(field, [])) + [value]):
+            return self
+        feature = self.index.feature_codes.get((kind, value.lower()))
+        if feature is not None:
+            # Matched list items are applied in list order, so an appended item goes last
+            section = SECTION_ORDER.index(kind)
+            entry = (feature, value, 1)
+            self._sections[section].append((self._apply(section, entry), entry))
+        return self
+
+    def _remove_item(self, field, kind, value):
+        values = list(self.patient_data.get(field, []))
+        values.remove(value)
+        if not self._changed(field, values):
+            return self
+        if self.index.feature_codes.get((kind, value.lower())) is not None:
+            # The first matched slot labelled `value` belongs to its first occurrence in the list
+            slots = self._sections[SECTION_ORDER.index(kind)]
+            position = next(i for i, (_, entry) in enumerate(slots) if entry[1] == value)
+            self._retract(*slots.pop(position))
+        return self
+
+    def add_condition(self, condition):
+        """Append a condition to the profile."""
+        return self._add_item('conditions', 'condition', condition)
+
+    def remove_condition(self, condition):
+        """Remove the first occurrence of a condition from the profile."""
+        return self._remove_item('conditions', 'condition', condition)
+
+    def add_clinical_need(self, need):
+        """Append a clinical need to the profile."""
+        return self._add_item('clinical_needs', 'need', need)
+
+    def remove_clinical_need(self, need):
+        """Remove the first occurrence of a clinical need from the profile."""
+        return self._remove_item('clinical_needs', 'need', need)
+
+    def add_treatment(self, treatment):
+        """Append a treatment to the profile."""
+        return self._add_item('treatments', 'treatment', treatment)
+
+    def remove_treatment(self, treatment):
+        """Remove the first occurrence of a treatment from the profile."""
+        return self._remove_item('treatments', 'treatment', treatment)
+
+    def set_acuity(self, acuity):
+        """Change the patient's acuity level (1-5)."""
+        if not self._changed('acuity', acuity):
+            return self
+        # Mirrors the acuity adjustment in KnowledgeBaseIndex.patient_features
+        boost = [(self.index.acuity_feature, f"High Acuity (Level {acuity})", acuity - 2)] if acuity >= 4 else []
+        self._replace_section(SECTION_ORDER.index('acuity'), boost)
+        return self
+
+    def set_demographics(self, **demographics):
+        """Change demographic fields, e.g. set_demographics(age=70, weight=95)."""
+        patient_data = dict(self.patient_data, demographics=dict(self.patient_data.get('demographics', {}),
+                                                                 **demographics))
+        return self.update(patient_data)
+
+    def score_vector(self):
+        """Current priority scores as an int array indexed like index.equipment."""
+        vector = np.zeros(len(self.index.equipment), dtype=np.int64)
+        if self._scores:
+            vector[list(self._scores)] = list(self._scores.values())
+        return vector
+
+    def get_recommendations(self, top_k=None):
+        """
+        Recommendations for the current profile, as PatientRecommender.get_recommendations().
+
+        When the recommender has a memo, a profile another session already ranked
+        is served from it, and a newly ranked one is added to it.
+
+        Args:
+            top_k (int): Only return the k highest-scoring items; None returns all
+
+        Returns:
+            dict: 'patient_info' and 'recommendations'. A memoized recommendation
+                list may be shared with other patients and must not be modified.
+        """
+        memo = self.recommender.memo
+        if memo is None:
+            recommendations = self._ranked(top_k)
+        else:
+            # Sections hold the matched features in patient_features order: the memo's profile key
+            key = (top_k, tuple(entry for section in self._sections for _, entry in section))
+            recommendations = memo.get(key, self.index.version)
+            if recommendations is None:
+                recommendations = self._ranked(top_k)
+                memo.put(key, recommendations, self.index.version)
+        return {
+            'patient_info': PatientRecommender._patient_info(self.patient_data),
+            'recommendations': recommendations
+        }
+
+    def _ranked(self, top_k):
+        scores, keys = self._scores, self._keys
+        # Highest score first, ties in the order the full scorer first touched each item
+        order = [(-score, keys[code][0], code) for code, score in scores.items()]
+        if top_k is None or top_k >= len(order):
+            order.sort()
+        else:
+            order = heapq.nsmallest(top_k, order)
+        ranked = [code for _, _, code in order]
+
+        names, rationales = self.index.equipment, self._rationales
+        return [{
+            'name': names[code],
+            'priority_score': scores[code],
+            'rationales': list(rationales[code])
+        } for code in ranked]
@@ -0,0 +1,230 @@
+"""
+Compiled Chat Intent Parser
+
+Classifies a chat query and extracts its project id, room type, area and project
+name in one pass. Every literal trigger phrase is compiled into a single
+Aho-Corasick automaton, so scanning a query costs the same however many phrases
+are registered; the two numeric entities (project id, area) share one compiled
+regular expression with named groups.
+"""
+import re
+from collections import deque
+
+# Shorter room type synonyms ("or", "er", "ed") are everyday words or word parts
+MIN_SYNONYM_LENGTH = 3
+
+# Trigger phrases per intent, with (a|b) alternatives expanded to literals
+INTENT_PHRASES = {
+    'patient_recommendations': [
+        'patient-specific', 'patient specific',
+        'personalized recommendations',
+        'recommend for a patient', 'recommend for my patient', 'recommend for this patient',
+        'patient needs',
+        'individual patient',
+        'patient recommender',
+        'based on patient', 'based on condition', 'based on diagnosis',
+        'patient equipment',
+    ],
+    'room_planning': [
+        'where should i put',
+        'equipment placement', 'equipment location',
+        'room layout',
+        'design a room', 'design the room',
+        'plan a room', 'plan the room',
+        'set up a room', 'set up the room',
+        'what equipment should i put in', 'what equipment should i need in',
+        'what equipment do i put in', 'what equipment do i need in',
+        'help me plan',
+        'equipment goes in', 'equipment should go in',
+        'equip a', 'equip the', 'equip my',
+        'layout for',
+    ],
+    'project_options': [
+        'what projects',
+        'project options',
+        'available projects',
+        'show projects',
+        'list projects',
+        'list all projects',
+        'view projects',
+        'projects can i view',
+    ],
+    'all_projects': [
+        'all projects',
+        'every project',
+        'entire system',
+        'entire dataset',
+        'across all',
+    ],
+}
+
+# Project id ("project id 5", "project: 3", "project_id = 2") and area ("300 sq ft")
+_ENTITY_PATTERN = re.compile(
+    r'project(?:\s+id|_id)?\s*[=:]*\s*(?P<project_id>\d+)'
+    r'|(?P<area>\d+)\s*(?:square\s*feet|sq\s*ft|sqft)'
+)
+
+
+class ParsedQuery:
+    """Structured result of parsing one chat query."""
+    __slots__ = ('query_type', 'project_id', 'room_type', 'area', 'project_name')
+
+    def __init__(self, query_type, project_id=None, room_type=None, area=None, project_name=None):
+        self.query_type = query_type
+        self.project_id = project_id
+        self.room_type = room_type
+        self.area = area
+        self.project_name = project_name
+
+    def intent_key(self):
+        """Hashable key of everything an answer to this query depends on."""
+        room_type, area = (self.room_type, self.area) if self.query_type == 'room_planning' else (None, None)
+        project_name = self.project_name if self.query_type == 'scoped_project' else None
+        return (self.query_type, room_type, area, self.project_id, project_name)
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'ParsedQuery({fields})'
+
+
+class PhraseAutomaton:
+    """Aho-Corasick automaton reporting every occurrence of a set of literal phrases."""
+    __slots__ = ('_goto', '_fail', '_output')
+
+    def __init__(self, phrases):
+        """
+        Args:
+            phrases (iterable): (phrase, label) pairs; phrases must be lower case
+        """
+        goto, output = [{}], [[]]
+        for phrase, label in phrases:
+            state = 0
+            for char in phrase:
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    goto.append({})
+                    output.append([])
+                    nxt = len(goto) - 1
+                    goto[state][char] = nxt
+                state = nxt
+            output[state].append((label, len(phrase)))
+
+        # Breadth-first failure links; each state also reports its suffix states' phrases
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in goto[state].items():
+                queue.append(nxt)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[nxt] = goto[fallback].get(char, 0) if state else 0
+                output[nxt] = output[nxt] + output[fail[nxt]]
+
+        self._goto, self._fail, self._output = goto, fail, output
+
+    def finditer(self, text):
+        """Yield (label, start, end) for every phrase occurrence in text."""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for label, length in output[state]:
+                yield label, i + 1 - length, i + 1
+
+
+def _is_word_bounded(text, start, end):
+    """Equivalent of wrapping the match in \\b ... \\b."""
+    return (start == 0 or not (text[start - 1].isalnum() or text[start - 1] == '_')) and \
+        (end == len(text) or not (text[end].isalnum() or text[end] == '_'))
+
+
+class IntentParser:
+    """
+    Single-pass query classifier and entity extractor.
+
+    Classification precedence: patient recommendations, room planning (needs a
+    room type or the word "room"), project options, scoped project (a project id
+    or an all-projects phrase), then general question.
+    """
+
+    def __init__(self, projects=(), room_types=None):
+        """
+        Args:
+            projects (iterable): Project dicts with 'id' and 'name', matched by name
+            room_types (dict): Lower-case room type name or synonym -> standard name,
+                standard names first (default: the room knowledge base's, see
+                RoomPlanner.room_type_phrases())
+        """
+        if room_types is None:
+            from room_planner import RoomPlanner
+            room_types = RoomPlanner().room_type_phrases()
+        self.project_names = [project['name'] for project in projects]
+        phrases = [(phrase, (intent, None))
+                   for intent, intent_phrases in INTENT_PHRASES.items()
+                   for phrase in intent_phrases]
+        standard_names = {name.lower() for name in room_types.values()}
+        for phrase, room_type in room_types.items():
+            # Synonyms must stand as whole words ("lab" is not "label")
+            if phrase in standard_names:
+                phrases.append((phrase, ('room_type', room_type)))
+            elif len(phrase) >= MIN_SYNONYM_LENGTH:
+                phrases.append((phrase, ('room_synonym', room_type)))
+        phrases.append(('room', ('room_word', None)))
+        phrases += [(name.lower(), ('project_name', name)) for name in self.project_names]
+        self._automaton = PhraseAutomaton(phrases)
+        self._room_order = {room_type: i for i, room_type in enumerate(dict.fromkeys(room_types.values()))}
+        self._project_order = {name: i for i, name in enumerate(self.project_names)}
+
+    def parse(self, query):
+        """Classify a query and extract its entities in one scan."""
+        text = ' '.join(query.lower().split())
+
+        intents = set()
+        room_types = []
+        has_room_type = False
+        has_room_word = False
+        project_names = []
+        for (kind, value), start, end in self._automaton.finditer(text):
+            if kind == 'room_type':
+                room_types.append(value)
+                has_room_type = has_room_type or _is_word_bounded(text, start, end)
+            elif kind == 'room_synonym':
+                if _is_word_bounded(text, start, end):
+                    room_types.append(value)
+                    has_room_type = True
+            elif kind == 'room_word':
+                has_room_word = has_room_word or _is_word_bounded(text, start, end)
+            elif kind == 'project_name':
+                project_names.append(value)
+            else:
+                intents.add(kind)
+
+        project_id, area = None, None
+        for match in _ENTITY_PATTERN.finditer(text):
+            if project_id is None and match.group('project_id'):
+                project_id = int(match.group('project_id'))
+            elif area is None and match.group('area'):
+                area = int(match.group('area'))
+        if project_id is None and 'all_projects' in intents:
+            project_id = 0  # 0 represents "all projects"
+
+        # First room type in knowledge-base order, first project in listing order
+        room_type = min(room_types, key=self._room_order.get) if room_types else None
+        project_name = min(project_names, key=self._project_order.get) if project_names else None
+
+        if 'patient_recommendations' in intents:
+            query_type = 'patient_recommendations'
+        elif 'room_planning' in intents and (has_room_type or has_room_word):
+            query_type = 'room_planning'
+        elif 'project_options' in intents:
+            query_type = 'project_options'
+        elif project_id is not None:
+            query_type = 'scoped_project'
+        else:
+            query_type = 'general_question'
+
+        return ParsedQuery(query_type, project_id, room_type, area, project_name)
@@ -0,0 +1,107 @@
+"""
+Hot-Reloadable Knowledge Base Files
+
+The clinical and room-planning knowledge bases live as versioned JSON files in
+knowledge_data/. Each file is compiled on first load (parsed and, optionally,
+turned into an index by its owner) and the result is pickled into a snapshot next
+to it, so later processes load the compiled form in milliseconds instead of
+re-parsing and re-compiling. Running servers pick up edits without a restart: the
+source file's mtime is re-checked at most every RELOAD_CHECK_SECONDS and a changed
+file is recompiled and swapped in atomically.
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+
+KB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'knowledge_data')
+SNAPSHOT_DIR = os.path.join(KB_DIR, '.snapshots')
+
+# Bump when the snapshot layout changes so old snapshots are ignored
+SNAPSHOT_FORMAT = 1
+# Minimum interval between checks of a source file for changes
+RELOAD_CHECK_SECONDS = 1.0
+
+
+class KnowledgeBase:
+    """
+    One knowledge-base JSON file with a compiled snapshot and hot reload.
+
+    `compiler` turns the parsed JSON into whatever the owner serves (e.g. an
+    index); `compiler_version` must change whenever the compiled form does, so
+    snapshots written by older code are rebuilt rather than unpickled.
+    """
+
+    def __init__(self, name, compiler=None, compiler_version=0, kb_dir=KB_DIR, snapshot_dir=SNAPSHOT_DIR):
+        self.name = name
+        self.path = os.path.join(kb_dir, f'{name}.json')
+        self.snapshot_path = os.path.join(snapshot_dir, f'{name}.pickle')
+        self.compiler = compiler
+        self.compiler_version = compiler_version
+        # (compiled value, content hash, file revision, (mtime_ns, size)), replaced as one object
+        self._current = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the compiled knowledge base, reloading it if the source file changed."""
+        now = time.monotonic()
+        if self._current is None or now - self._checked >= RELOAD_CHECK_SECONDS:
+            with self._lock:
+                self._checked = now
+                stat = os.stat(self.path)
+                stamp = (stat.st_mtime_ns, stat.st_size)
+                if self._current is None or stamp != self._current[3]:
+                    self._load(stamp)
+        return self._current[0]
+
+    @property
+    def version(self):
+        """Content hash of the loaded file, for invalidating anything derived from it."""
+        self.get()
+        return self._current[1]
+
+    @property
+    def revision(self):
+        """The file's own 'revision' field."""
+        self.get()
+        return self._current[2]
+
+    def _load(self, stamp):
+        snapshot = self._read_snapshot()
+        if snapshot is not None and snapshot['source'] == stamp:
+            value, version, revision = snapshot['value'], snapshot['version'], snapshot['revision']
+        else:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+            data = json.loads(raw)
+            version = hashlib.sha1(raw).hexdigest()
+            revision = data.get('revision')
+            value = self.compiler(data) if self.compiler else data
+            self._write_snapshot({'format': SNAPSHOT_FORMAT, 'compiler_version': self.compiler_version,
+                                  'source': stamp, 'version': version, 'revision': revision, 'value': value})
+        # Swap in a single step so concurrent readers see the old or the new state, never a mix
+        self._current = (value, version, revision, stamp)
+
+    def _read_snapshot(self):
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError):
+            return None
+        if snapshot.get('format') != SNAPSHOT_FORMAT or snapshot.get('compiler_version') != self.compiler_version:
+            return None
+        return snapshot
+
+    def _write_snapshot(self, snapshot):
+        # Best effort: a read-only install still works, it just compiles on every start
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+            tmp_path = f'{self.snapshot_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError:
+            pass
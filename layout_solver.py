@@ -0,0 +1,383 @@
+"""
+Automatic Room Layout Solver
+
+Places a room's equipment (the numeric footprints and clearances parsed by
+room_geometry) in a room of any size. Placement is solved by simulated
+annealing: one item is moved, rotated or re-seated per step, and the
+energy of the layout (footprints overlapping other items' clearance zones, access
+sides pushed out of the room, blocked doors and unmet placement hints such as
+"Along wall" or "Right side of bed") is updated only for that item and its
+neighbours. Neighbours come from a spatial hash of clearance zones, so a step
+costs the same in a six-item ICU as in an operating room with fifty items.
+
+Coordinates are in feet with the origin at the room's lower-left corner; the door
+is on the left wall.
+"""
+import math
+import random
+
+# Spatial hash cell size (ft)
+CELL_SIZE = 4.0
+# Annealing steps per item and the geometric cooling range
+STEPS_PER_ITEM = 150
+MIN_STEPS = 800
+# Items start at their hints, so the search starts cool enough to refine rather than scramble them
+START_TEMPERATURE = 3.0
+END_TEMPERATURE = 0.01
+
+# Energy weights: collisions dominate, hints only order feasible layouts
+OVERLAP_WEIGHT = 100.0
+ACCESS_WEIGHT = 50.0
+HINT_WEIGHT = 1.0
+
+# Door on the left wall: opening width and the swing zone kept clear in front of it
+DOOR_WIDTH = 3.5
+# Gap left between an item and the side of the anchor it is placed at
+ANCHOR_GAP = 0.5
+
+
+def door_zone(width, depth):
+    """The door's swing zone, (x0, y0, x1, y1), centered on the left wall of a width x depth room."""
+    door_low = max(0.0, depth / 2 - DOOR_WIDTH / 2)
+    return (0.0, door_low, min(width, DOOR_WIDTH), min(depth, door_low + DOOR_WIDTH))
+
+
+def _overlap(a, b):
+    """Overlap area of two (x0, y0, x1, y1) rectangles."""
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    if width <= 0:
+        return 0.0
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    return width * height if height > 0 else 0.0
+
+
+def _without_side(zone, footprint, side):
+    """A clearance zone with one room-frame side (0 down, 1 right, 2 up, 3 left) cut back to the footprint."""
+    zone = list(zone)
+    edge = (1, 2, 3, 0)[side]
+    zone[edge] = footprint[edge]
+    return tuple(zone)
+
+
+class LayoutSolver:
+    """
+    Simulated-annealing placement of equipment items in a rectangular room.
+
+    Items are placed by their lower-left corner and an orientation 0-3 giving the
+    direction their front (access side) faces: down, right, up, left. Wall items
+    are always seated against the nearest wall facing into the room; ceiling
+    items float over the floor and only need to be inside the room.
+    """
+
+    def __init__(self, width, depth, seed=0, steps=None):
+        """
+        Args:
+            width (float): Room width along x (ft)
+            depth (float): Room depth along y (ft)
+            seed (int): Random seed; the same inputs and seed give the same layout
+            steps (int): Annealing steps (default: STEPS_PER_ITEM per item)
+        """
+        self.width = float(width)
+        self.depth = float(depth)
+        self.seed = seed
+        self.steps = steps
+        # The door opening and its swing zone are a fixed obstacle
+        self.door = door_zone(self.width, self.depth)
+        self.bounds = (0.0, 0.0, self.width, self.depth)
+
+    # -- geometry ---------------------------------------------------------------
+
+    def _size(self, i, orientation):
+        item = self.items[i]
+        return (item.width, item.depth) if orientation % 2 == 0 else (item.depth, item.width)
+
+    def _footprint(self, i, x, y, orientation):
+        w, d = self._size(i, orientation)
+        return (x, y, x + w, y + d)
+
+    def _zone(self, i, x, y, orientation):
+        """Footprint grown by the item's clearance on each side, per its orientation."""
+        w, d = self._size(i, orientation)
+        clearance = self.items[i].clearance
+        # Room-frame sides (down, right, up, left) get the item's (front, right, back, left) rotated
+        down, right, up, left = (clearance[(side - orientation) % 4] for side in range(4))
+        return (x - left, y - down, x + w + right, y + d + up)
+
+    def _seat_on_wall(self, i, x, y, orientation):
+        """Move a wall item onto the wall nearest its center, facing into the room."""
+        w, d = self._size(i, orientation)
+        cx, cy = x + w / 2, y + d / 2
+        distances = [cy, self.width - cx, self.depth - cy, cx]  # to the bottom, right, top, left walls
+        wall = distances.index(min(distances))
+        # Front faces away from the wall: bottom wall -> up (2), right -> left (3), top -> down (0), left -> right (1)
+        orientation = (wall + 2) % 4
+        w, d = self._size(i, orientation)
+        x = min(max(cx - w / 2, 0.0), self.width - w)
+        y = min(max(cy - d / 2, 0.0), self.depth - d)
+        if wall == 0:
+            y = 0.0
+        elif wall == 1:
+            x = self.width - w
+        elif wall == 2:
+            y = self.depth - d
+        else:
+            x = 0.0
+        return x, y, orientation
+
+    def _clamp(self, i, x, y, orientation):
+        w, d = self._size(i, orientation)
+        return min(max(x, 0.0), max(0.0, self.width - w)), min(max(y, 0.0), max(0.0, self.depth - d))
+
+    # -- spatial hash -----------------------------------------------------------
+
+    def _cells(self, rect):
+        x0, y0 = int(math.floor(rect[0] / CELL_SIZE)), int(math.floor(rect[1] / CELL_SIZE))
+        x1, y1 = int(math.floor(rect[2] / CELL_SIZE)), int(math.floor(rect[3] / CELL_SIZE))
+        return [(cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)]
+
+    def _insert(self, i):
+        cells = self._cells(self.zones[i])
+        self.item_cells[i] = cells
+        for cell in cells:
+            self.grid.setdefault(cell, set()).add(i)
+
+    def _remove(self, i):
+        for cell in self.item_cells[i]:
+            self.grid[cell].discard(i)
+
+    def _neighbours(self, i, zone):
+        grid = self.grid
+        found = set()
+        for cx in range(int(math.floor(zone[0] / CELL_SIZE)), int(math.floor(zone[2] / CELL_SIZE)) + 1):
+            for cy in range(int(math.floor(zone[1] / CELL_SIZE)), int(math.floor(zone[3] / CELL_SIZE)) + 1):
+                members = grid.get((cx, cy))
+                if members:
+                    found |= members
+        found.discard(i)
+        return found
+
+    # -- energy -----------------------------------------------------------------
+
+    def _pair_energy(self, i, j, footprint_i, zone_i):
+        """Overlap of each item's footprint with the other's clearance zone."""
+        layer_i, layer_j = self.items[i].mount, self.items[j].mount
+        # Ceiling items never collide; wall and floor items only share a layer near the floor
+        if layer_i == 'ceiling' or layer_j == 'ceiling' or (layer_i == 'wall') != (layer_j == 'wall'):
+            return 0.0
+        footprint_j = self.footprints[j]
+        # Equipment serving the anchor is worked from the anchor's side: the two may
+        # share clearance space, only their footprints must not meet
+        if (j == self.anchor and self.items[i].anchor_side) or (i == self.anchor and self.items[j].anchor_side):
+            return OVERLAP_WEIGHT * _overlap(footprint_i, footprint_j)
+        return OVERLAP_WEIGHT * (_overlap(footprint_i, self.zones[j]) + _overlap(zone_i, footprint_j))
+
+    def _access_energy(self, i, footprint, zone, orientation):
+        item = self.items[i]
+        if item.mount == 'ceiling':
+            return 0.0
+        # Clearance zones may share the free space in front of the door; footprints may not
+        energy = OVERLAP_WEIGHT * _overlap(footprint, self.door)
+        # Clearance is working space, so it has to be inside the room - except on the
+        # wall side of wall-mounted items and at the head of an item seated head to the wall
+        if item.mount == 'wall':
+            zone = _without_side(zone, footprint, (orientation + 2) % 4)
+        if item.head_wall:
+            zone = _without_side(zone, footprint, 2)
+        outside = (zone[2] - zone[0]) * (zone[3] - zone[1]) - _overlap(zone, self.bounds)
+        if outside > 1e-9:
+            energy += ACCESS_WEIGHT * outside
+        return energy
+
+    def _anchor_target(self, i):
+        """Point the item's center should sit at relative to the anchor, or None."""
+        side = self.items[i].anchor_side
+        if side is None or self.anchor is None or i == self.anchor:
+            return None
+        ax0, ay0, ax1, ay1 = self.footprints[self.anchor]
+        w, d = self._size(i, self.state[i][2])
+        cx, cy = (ax0 + ax1) / 2, (ay0 + ay1) / 2
+        # The anchor's head is its top edge (it is seated head to the top wall)
+        if side == 'head':
+            return cx, ay1 + ANCHOR_GAP + d / 2
+        if side == 'foot':
+            return cx, ay0 - ANCHOR_GAP - d / 2
+        if side == 'right':
+            return ax1 + ANCHOR_GAP + w / 2, cy
+        if side == 'left':
+            return ax0 - ANCHOR_GAP - w / 2, cy
+        return cx, cy
+
+    def _hint_energy(self, i, footprint):
+        item = self.items[i]
+        cx, cy = (footprint[0] + footprint[2]) / 2, (footprint[1] + footprint[3]) / 2
+        energy = 0.0
+        if item.center:
+            energy += abs(cx - self.width / 2) + (0.0 if item.head_wall else abs(cy - self.depth / 2))
+        if item.head_wall:
+            energy += self.depth - footprint[3]
+        if item.wall and item.mount != 'wall':
+            energy += min(footprint[0], footprint[1], self.width - footprint[2], self.depth - footprint[3])
+        if item.door:
+            energy += math.hypot(cx - self.door[2], cy - (self.door[1] + self.door[3]) / 2)
+        if item.corner:
+            energy += min(math.hypot(cx - x, cy - y) for x in (0.0, self.width) for y in (0.0, self.depth))
+        target = self._anchor_target(i)
+        if target is not None:
+            energy += math.hypot(cx - target[0], cy - target[1])
+        if item.opposite and self.anchor is not None and i != self.anchor:
+            ax0, ay0, ax1, ay1 = self.footprints[self.anchor]
+            energy += max(0.0, self.width / 2 - abs(cx - (ax0 + ax1) / 2))
+        return HINT_WEIGHT * energy
+
+    def _unary_energy(self, i, footprint, zone, orientation):
+        return self._access_energy(i, footprint, zone, orientation) + self._hint_energy(i, footprint)
+
+    # -- solving ----------------------------------------------------------------
+
+    def _initial_state(self, rng):
+        """Seed each item at its hint: the anchor centered, its equipment at its side, the rest nearby."""
+        self.state = [None] * len(self.items)
+        order = sorted(range(len(self.items)), key=lambda i: i != self.anchor)
+        for i in order:
+            item = self.items[i]
+            orientation = 0 if not item.center or item.depth >= item.width else 1
+            w, d = self._size(i, orientation)
+            self.state[i] = [0.0, 0.0, orientation]
+            target = self._anchor_target(i)
+            if item.center:
+                x, y = (self.width - w) / 2, (self.depth - d) / 2
+                if item.head_wall:
+                    y = self.depth - d
+            elif target is not None:
+                x, y = target[0] - w / 2, target[1] - d / 2
+            elif item.door:
+                x, y = self.door[2] + ANCHOR_GAP, (self.door[1] + self.door[3]) / 2 - d / 2
+            elif item.corner:
+                x, y = rng.choice([0.0, self.width - w]), rng.choice([0.0, self.depth - d])
+            else:
+                x, y = rng.uniform(0, max(0.0, self.width - w)), rng.uniform(0, max(0.0, self.depth - d))
+            if item.mount == 'wall':
+                x, y, orientation = self._seat_on_wall(i, x, y, orientation)
+            else:
+                x, y = self._clamp(i, x, y, orientation)
+            self.state[i] = [x, y, orientation]
+            self._place(i)
+
+    def _place(self, i):
+        x, y, orientation = self.state[i]
+        self.footprints[i] = self._footprint(i, x, y, orientation)
+        self.zones[i] = self._zone(i, x, y, orientation)
+
+    def _propose(self, i, rng, scale):
+        x, y, orientation = self.state[i]
+        item = self.items[i]
+        move = rng.random()
+        if move < 0.1:
+            # Re-seat anywhere, to escape crowded spots
+            x, y = rng.uniform(0, self.width), rng.uniform(0, self.depth)
+        elif move < 0.25 and item.mount != 'wall' and not item.center:
+            orientation = rng.randrange(4)
+        else:
+            x, y = x + rng.gauss(0, scale), y + rng.gauss(0, scale)
+        if item.mount == 'wall':
+            return self._seat_on_wall(i, x, y, orientation)
+        x, y = self._clamp(i, x, y, orientation)
+        return x, y, orientation
+
+    def _local_energy(self, i, footprint, zone, orientation):
+        """
+        Energy terms that change when item i moves: its own terms and its pairs.
+
+        The anchor's dependants' hints are left out on purpose: the anchor is
+        placed by its own hints and the equipment serving it follows, rather than
+        the anchor being held back by items that have not caught up yet.
+        """
+        energy = self._unary_energy(i, footprint, zone, orientation)
+        for j in self._neighbours(i, zone):
+            energy += self._pair_energy(i, j, footprint, zone)
+        return energy
+
+    def solve(self, items):
+        """
+        Place items in the room.
+
+        Args:
+            items (list): EquipmentGeometry per unit, as from RoomGeometry.items()
+
+        Returns:
+            dict: 'width', 'depth', 'door' rectangle, 'items' (name, x, y, width,
+                depth, orientation, shape, mount, footprint and clearance_zone
+                rectangles), 'conflicts' (pairs of overlapping item names and items
+                whose access side is blocked) and final 'energy'
+        """
+        self.items = items
+        n = len(items)
+        rng = random.Random(self.seed)
+        self.anchor = next((i for i, item in enumerate(items) if item.center), None)
+        self.footprints, self.zones = [None] * n, [None] * n
+        self._initial_state(rng)
+        self.grid, self.item_cells = {}, [None] * n
+        for i in range(n):
+            self._insert(i)
+
+        steps = self.steps or max(MIN_STEPS, STEPS_PER_ITEM * n)
+        cooling = (END_TEMPERATURE / START_TEMPERATURE) ** (1.0 / max(1, steps))
+        temperature = START_TEMPERATURE
+        max_scale = max(self.width, self.depth) / 4
+        for _ in range(steps if n else 0):
+            i = rng.randrange(n)
+            scale = max(0.1, max_scale * temperature / START_TEMPERATURE)
+            old = self.state[i]
+            old_footprint, old_zone = self.footprints[i], self.zones[i]
+            before = self._local_energy(i, old_footprint, old_zone, old[2])
+
+            new = list(self._propose(i, rng, scale))
+            self.state[i] = new
+            self._place(i)
+            after = self._local_energy(i, self.footprints[i], self.zones[i], new[2])
+
+            delta = after - before
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                self._remove(i)
+                self._insert(i)
+            else:
+                self.state[i] = old
+                self.footprints[i], self.zones[i] = old_footprint, old_zone
+            temperature *= cooling
+        return self._result()
+
+    def _result(self):
+        conflicts = []
+        energy = 0.0
+        for i in range(len(self.items)):
+            footprint, zone, orientation = self.footprints[i], self.zones[i], self.state[i][2]
+            unary = self._access_energy(i, footprint, zone, orientation)
+            if unary > 0:
+                conflicts.append((self.items[i].name, 'access'))
+            energy += unary + self._hint_energy(i, footprint)
+            for j in self._neighbours(i, zone):
+                if j > i:
+                    pair = self._pair_energy(i, j, footprint, zone)
+                    if pair > 0:
+                        conflicts.append((self.items[i].name, self.items[j].name))
+                    energy += pair
+        return {
+            'width': self.width,
+            'depth': self.depth,
+            'door': self.door,
+            'items': [{
+                'name': item.name,
+                'x': round(x, 2),
+                'y': round(y, 2),
+                'width': round(footprint[2] - footprint[0], 2),
+                'depth': round(footprint[3] - footprint[1], 2),
+                'orientation': orientation,
+                'shape': item.shape,
+                'mount': item.mount,
+                'footprint': footprint,
+                'clearance_zone': zone,
+            } for item, (x, y, orientation), footprint, zone
+                in zip(self.items, self.state, self.footprints, self.zones)],
+            'conflicts': conflicts,
+            'energy': round(energy, 2),
+        }
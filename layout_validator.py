@@ -0,0 +1,244 @@
+"""
+Layout Validation
+
+Checks an equipment arrangement, e.g. one a user is dragging around in an
+editor, against the clearances of the room knowledge base. Every pair of items
+is tested at once with broadcast NumPy comparisons: footprints against footprints
+(collisions) and footprints against the other items' clearance zones, for
+rectangles and circles alike. Access is then checked on a rasterized floor: an
+item is blocked when its clearance leaves the room, when it stands in the door
+swing, or when no free floor connects the door to the working space in front of
+it. A sixty-item room validates in a few milliseconds, so the check can run on
+every drag event.
+
+Items use the layout solver's conventions: (x, y) is the footprint's lower-left
+corner in feet, width and depth are its extent as placed, and orientation 0-3
+is the direction its front (access side) faces: down, right, up, left.
+"""
+import numpy as np
+from scipy import ndimage
+
+from layout_solver import door_zone
+
+# Cell size of the rasterized floor used for access paths (ft)
+ACCESS_RESOLUTION = 0.5
+# Overlaps smaller than this (sq ft) are treated as touching
+TOLERANCE = 1e-6
+# Mount codes
+FLOOR, WALL, CEILING = 0, 1, 2
+_MOUNTS = {'floor': FLOOR, 'wall': WALL, 'ceiling': CEILING}
+
+
+def _overlap_matrix(a, b):
+    """Pairwise overlap area of rectangles a (n x 4) and b (m x 4)."""
+    width = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    height = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    return np.clip(width, 0, None) * np.clip(height, 0, None)
+
+
+def _circle_hits(centers, radii, rects):
+    """Pairwise: does circle i (center, radius) reach into rectangle j."""
+    nearest_x = np.clip(centers[:, None, 0], rects[None, :, 0], rects[None, :, 2])
+    nearest_y = np.clip(centers[:, None, 1], rects[None, :, 1], rects[None, :, 3])
+    distance = np.hypot(centers[:, None, 0] - nearest_x, centers[:, None, 1] - nearest_y)
+    return distance < radii[:, None] - TOLERANCE
+
+
+class LayoutValidator:
+    """
+    Validates arrangements of one room type's equipment in one room.
+
+    Clearances and placement hints come from the room's parsed geometry, looked
+    up by item name; items the knowledge base does not list can bring their own
+    'clearance' (front, right, back, left) and 'mount'.
+    """
+
+    def __init__(self, room_type, width, depth, planner=None):
+        """
+        Args:
+            room_type (str): Room type (any recognized spelling)
+            width (float): Room width along x (ft)
+            depth (float): Room depth along y (ft)
+            planner (RoomPlanner): Source of the room geometry
+        """
+        if planner is None:
+            from room_planner import RoomPlanner
+            planner = RoomPlanner()
+        geometry = planner.room_geometry(planner.standardize_room_type(room_type))
+        self.width = float(width)
+        self.depth = float(depth)
+        self.door = door_zone(self.width, self.depth)
+        self.specs = {item.name.lower(): item for item in geometry.equipment} if geometry is not None else {}
+        shape = (int(np.ceil(self.depth / ACCESS_RESOLUTION)), int(np.ceil(self.width / ACCESS_RESOLUTION)))
+        self._grid_shape = shape
+        self._door_cells = self._cells(self.door)
+
+    def _cells(self, rect):
+        rows, cols = self._grid_shape
+        return (slice(max(0, int(rect[1] / ACCESS_RESOLUTION)), min(rows, int(np.ceil(rect[3] / ACCESS_RESOLUTION)))),
+                slice(max(0, int(rect[0] / ACCESS_RESOLUTION)), min(cols, int(np.ceil(rect[2] / ACCESS_RESOLUTION)))))
+
+    def _arrays(self, items):
+        """Footprints, rotated clearances, shapes, mounts and hint flags of the items as arrays."""
+        n = len(items)
+        footprints = np.empty((n, 4))
+        clearance = np.zeros((n, 4))
+        orientation = np.zeros(n, dtype=np.int64)
+        circle = np.zeros(n, dtype=bool)
+        mount = np.zeros(n, dtype=np.int8)
+        head_wall = np.zeros(n, dtype=bool)
+        anchor = np.zeros(n, dtype=bool)
+        attends = np.zeros(n, dtype=bool)
+        for i, item in enumerate(items):
+            spec = self.specs.get(item['name'].lower())
+            o = orientation[i] = item.get('orientation', 0) % 4
+            if 'width' in item:
+                w, d = item['width'], item['depth']
+            elif spec is not None:
+                w, d = (spec.width, spec.depth) if o % 2 == 0 else (spec.depth, spec.width)
+            else:
+                raise ValueError(f"Item {item['name']!r} has no size and is not in the room's knowledge base")
+            footprints[i] = (item['x'], item['y'], item['x'] + w, item['y'] + d)
+            clearance[i] = item.get('clearance', spec.clearance if spec is not None else (0.0, 0.0, 0.0, 0.0))
+            circle[i] = item.get('shape', spec.shape if spec is not None else 'rect') == 'circle'
+            mount[i] = _MOUNTS[item.get('mount', spec.mount if spec is not None else 'floor')]
+            if spec is not None:
+                head_wall[i] = spec.head_wall
+                anchor[i] = spec.center
+                attends[i] = spec.anchor_side is not None
+        # Room-frame clearance (down, right, up, left) from the item's (front, right, back, left)
+        sides = (np.arange(4)[None, :] - orientation[:, None]) % 4
+        rotated = np.take_along_axis(clearance, sides, axis=1)
+        return footprints, rotated, orientation, circle, mount, head_wall, anchor, attends
+
+    def validate(self, items):
+        """
+        Check an arrangement.
+
+        Args:
+            items (list): dicts with 'name', 'x', 'y', optional 'orientation'
+                (default 0), 'width'/'depth' as placed (default: the knowledge
+                base's size), 'shape', 'mount' and 'clearance'. The 'items' of a
+                RoomPlanner.plan_layout() result are accepted as they are.
+
+        Returns:
+            dict: 'valid', 'violations' (dicts with 'kind' - 'collision' for
+                touching footprints, 'clearance' for a footprint inside another
+                item's clearance zone - the two item 'names', their 'indices'
+                and the 'overlap' in sq ft) and 'blocked' (dicts with 'name',
+                'index' and 'reason': 'outside', 'door' or 'no_path')
+        """
+        n = len(items)
+        if not n:
+            return {'valid': True, 'violations': [], 'blocked': []}
+        footprints, rotated, orientation, circle, mount, head_wall, anchor, attends = self._arrays(items)
+        down, right, up, left = rotated.T
+        zones = footprints + np.stack([-left, -down, right, up], axis=1)
+        centers = (footprints[:, :2] + footprints[:, 2:]) / 2
+        radii = (footprints[:, 2] - footprints[:, 0]) / 2
+        # Circles with even clearance keep a circular zone
+        even = (rotated == rotated[:, :1]).all(axis=1)
+        zone_circle = circle & even
+        zone_radii = radii + rotated[:, 0]
+
+        # Pairwise footprint/footprint and footprint/zone contact, shape by shape
+        collide = _overlap_matrix(footprints, footprints)
+        intrude = _overlap_matrix(footprints, zones)
+        rect_collide, rect_intrude = collide > TOLERANCE, intrude > TOLERANCE
+        circle_collide = _circle_hits(centers, radii, footprints)
+        circle_intrude = _circle_hits(centers, radii, zones)
+        distance = np.hypot(centers[:, None, 0] - centers[None, :, 0], centers[:, None, 1] - centers[None, :, 1])
+        both = circle[:, None] & circle[None, :]
+        collide_hit = np.where(both, distance < radii[:, None] + radii[None, :] - TOLERANCE,
+                               np.where(circle[:, None], circle_collide,
+                                        np.where(circle[None, :], circle_collide.T, rect_collide)))
+        rect_into_circle = _circle_hits(centers, zone_radii, footprints).T
+        intrude_hit = np.where(zone_circle[None, :],
+                               np.where(circle[:, None], distance < radii[:, None] + zone_radii[None, :] - TOLERANCE,
+                                        rect_into_circle),
+                               np.where(circle[:, None], circle_intrude, rect_intrude))
+
+        # Pairs that cannot conflict: ceiling items, wall vs floor layers, and the
+        # anchor with its attendant equipment (they share its clearance space)
+        same_layer = (mount[:, None] != CEILING) & (mount[None, :] != CEILING) & \
+            ((mount[:, None] == WALL) == (mount[None, :] == WALL))
+        attending = (anchor[:, None] & attends[None, :]) | (attends[:, None] & anchor[None, :])
+        upper = np.triu(np.ones((n, n), dtype=bool), k=1)
+        collisions = collide_hit & same_layer & upper
+        clearances = (intrude_hit | intrude_hit.T) & same_layer & ~attending & upper & ~collisions
+
+        names = [item['name'] for item in items]
+        violations = []
+        for kind, pairs, area in (('collision', collisions, collide), ('clearance', clearances, intrude + intrude.T)):
+            for i, j in zip(*np.nonzero(pairs)):
+                violations.append({'kind': kind, 'names': (names[i], names[j]), 'indices': (int(i), int(j)),
+                                   'overlap': round(float(area[i, j]), 2)})
+
+        blocked = self._blocked(footprints, rotated, orientation, mount, head_wall, anchor, attends, names)
+        return {
+            'valid': not violations and not blocked,
+            'violations': violations,
+            'blocked': blocked,
+        }
+
+    def _door_region(self, free):
+        """Connected-component labels of free cells and the labels touching the door."""
+        labels, _ = ndimage.label(free)
+        door_labels = np.unique(labels[self._door_cells])
+        return labels, door_labels[door_labels > 0]
+
+    def _blocked(self, footprints, rotated, orientation, mount, head_wall, anchor, attends, names):
+        blocked = []
+        floor = mount != CEILING
+        # Clearance must stay in the room, except behind wall-mounted items and at a head-wall item's head
+        access = rotated.copy()
+        wall = mount == WALL
+        access[wall, (orientation[wall] + 2) % 4] = 0.0
+        access[head_wall, 2] = 0.0
+        down, right, up, left = access.T
+        zones = footprints + np.stack([-left, -down, right, up], axis=1)
+        outside = floor & ((zones[:, 0] < -TOLERANCE) | (zones[:, 1] < -TOLERANCE) |
+                           (zones[:, 2] > self.width + TOLERANCE) | (zones[:, 3] > self.depth + TOLERANCE))
+        in_door = floor & (_overlap_matrix(footprints, np.array([self.door]))[:, 0] > TOLERANCE)
+
+        # Free floor reachable from the door: floor-standing footprints are obstacles
+        free = np.ones(self._grid_shape, dtype=bool)
+        standing = np.nonzero(mount == FLOOR)[0]
+        for i in standing:
+            if not anchor[i]:
+                free[self._cells(footprints[i])] = False
+        # Equipment attending the anchor is worked from the anchor's side, so its
+        # access may lead over the anchor's place; everything else walks around it
+        attendant_labels = self._door_region(free) if (attends & (mount == FLOOR)).any() else None
+        for i in standing:
+            if anchor[i]:
+                free[self._cells(footprints[i])] = False
+        labels = self._door_region(free)
+
+        # The strip in front of each floor item, as deep as its front clearance (at least one cell)
+        x0, y0, x1, y1 = footprints.T
+        reach = np.maximum(rotated[np.arange(len(names)), orientation], ACCESS_RESOLUTION)
+        strips = np.stack([
+            np.stack([x0, y0 - reach, x1, y0], axis=1),
+            np.stack([x1, y0, x1 + reach, y1], axis=1),
+            np.stack([x0, y1, x1, y1 + reach], axis=1),
+            np.stack([x0 - reach, y0, x0, y1], axis=1),
+        ], axis=1)[np.arange(len(names)), orientation]
+
+        for i, name in enumerate(names):
+            if not floor[i]:
+                continue
+            if outside[i]:
+                reason = 'outside'
+            elif in_door[i]:
+                reason = 'door'
+            elif mount[i] == FLOOR and not self._reachable(attendant_labels if attends[i] else labels, strips[i]):
+                reason = 'no_path'
+            else:
+                continue
+            blocked.append({'name': name, 'index': i, 'reason': reason})
+        return blocked
+
+    def _reachable(self, region, rect):
+        labels, door_labels = region
+        return bool(np.isin(labels[self._cells(rect)], door_labels).any())
@@ -0,0 +1,291 @@
+"""
+Learned Equipment Scorer
+
+Optional companion to the rule-based PatientRecommender: a sparse logistic model,
+trained offline on historical patient-to-equipment allocations, that estimates
+how likely each item is to be allocated to a patient. Patients are encoded by the
+same knowledge-base features the rules match (plus their acuity level), with one
+logistic regression per equipment item. The fitted weights are saved as a single
+.npz artifact that is only read on first use; inference for a whole batch is one
+sparse matrix product and a vectorized sigmoid, and its probabilities are blended
+with the rule scores.
+
+Train from an allocation file in the census format (see census_recommendations)
+with an extra 'equipment' list column:
+
+    python learned_recommender.py allocations.parquet --output models/learned_recommender.npz
+"""
+import argparse
+import os
+import threading
+
+import numpy as np
+from scipy import sparse
+
+from patient_recommender import PatientRecommender
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'learned_recommender.npz')
+# Bump when the artifact layout changes
+MODEL_FORMAT = 1
+
+# Acuity levels encoded as their own one-hot features
+ACUITY_LEVELS = (1, 2, 3, 4, 5)
+# Score points a probability of 1.0 adds to the rule score (rule priorities run 1-5)
+LEARNED_WEIGHT = 5.0
+# Items without a rule score are only recommended on the model's word above this probability
+MIN_PROBABILITY = 0.5
+# Inverse regularization strength of each logistic regression
+REGULARIZATION = 1.0
+
+
+def feature_names(index):
+    """Model feature names for a knowledge-base index, ordered by feature code."""
+    names = [None] * len(index.rules)
+    for (kind, key), feature in index.feature_codes.items():
+        names[feature] = f"{kind}:{key}"
+    return names + [f"acuity_level:{level}" for level in ACUITY_LEVELS]
+
+
+def encode_patients(patients, index):
+    """
+    Encode patients as a sparse patient x feature matrix.
+
+    Columns are the index's feature codes (weighted as the rules weight them)
+    followed by a one-hot acuity level.
+
+    Returns:
+        sparse.csr_matrix: float32 feature matrix
+    """
+    rows, cols, values = [], [], []
+    acuity_base = len(index.rules) - ACUITY_LEVELS[0]
+    for p, patient in enumerate(patients):
+        for feature, _, weight in index.patient_features(patient):
+            rows.append(p)
+            cols.append(feature)
+            values.append(weight)
+        acuity = patient.get('acuity', 3)
+        if acuity in ACUITY_LEVELS:
+            rows.append(p)
+            cols.append(acuity_base + acuity)
+            values.append(1)
+    return sparse.csr_matrix((values, (rows, cols)), shape=(len(patients), len(index.rules) + len(ACUITY_LEVELS)),
+                             dtype=np.float32)
+
+
+def train(patients, allocations, recommender=None, regularization=REGULARIZATION):
+    """
+    Fit one logistic regression per allocated equipment item.
+
+    Args:
+        patients (list): patient_data dicts
+        allocations (list): Equipment names allocated to each patient
+        recommender (PatientRecommender): Source of the knowledge-base index
+        regularization (float): Inverse regularization strength (C)
+
+    Returns:
+        LearnedScorer: The fitted model, already loaded
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    index = (recommender or PatientRecommender(use_memo=False)).index
+    features = encode_patients(patients, index)
+    equipment = sorted({name for names in allocations for name in names})
+    columns = {name: i for i, name in enumerate(equipment)}
+    labels = np.zeros((len(patients), len(equipment)), dtype=bool)
+    for p, names in enumerate(allocations):
+        labels[p, [columns[name] for name in names]] = True
+
+    coef = np.zeros((features.shape[1], len(equipment)), dtype=np.float32)
+    intercept = np.zeros(len(equipment), dtype=np.float32)
+    for i in range(len(equipment)):
+        positives = labels[:, i].mean()
+        if positives in (0.0, 1.0):
+            # A constant label carries no feature signal: only a (clipped) base rate
+            intercept[i] = 20.0 if positives else -20.0
+            continue
+        model = LogisticRegression(C=regularization, solver='liblinear')
+        model.fit(features, labels[:, i])
+        coef[:, i] = model.coef_[0]
+        intercept[i] = model.intercept_[0]
+
+    scorer = LearnedScorer()
+    scorer._set(feature_names(index), equipment, coef, intercept)
+    return scorer
+
+
+class LearnedScorer:
+    """
+    A trained allocation model, read from its artifact on first use.
+
+    The artifact stores features and equipment by name, so it stays usable after
+    knowledge-base edits: features the current knowledge base no longer has are
+    ignored, and only items the knowledge base knows are blended.
+    """
+
+    def __init__(self, path=MODEL_PATH):
+        self.path = path
+        self._model = None
+        self._aligned = None
+        self._lock = threading.Lock()
+
+    def _set(self, features, equipment, coef, intercept):
+        self._model = (list(features), list(equipment), coef, intercept)
+        self._aligned = None
+
+    def _load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    with np.load(self.path, allow_pickle=False) as artifact:
+                        if int(artifact['format']) != MODEL_FORMAT:
+                            raise ValueError(f"{self.path} has model format {int(artifact['format'])}, "
+                                             f"expected {MODEL_FORMAT}; retrain the model")
+                        self._set(artifact['features'].tolist(), artifact['equipment'].tolist(),
+                                  artifact['coef'], artifact['intercept'])
+        return self._model
+
+    def save(self, path=None):
+        """Write the model artifact (to its own path by default) and return the path."""
+        features, equipment, coef, intercept = self._load()
+        path = path or self.path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez_compressed(tmp_path, format=MODEL_FORMAT, features=np.array(features), equipment=np.array(equipment),
+                            coef=coef, intercept=intercept)
+        os.replace(tmp_path, path)
+        self.path = path
+        return path
+
+    @property
+    def equipment(self):
+        """Equipment items the model was trained on."""
+        return self._load()[1]
+
+    def _weights_for(self, index):
+        """Model weights re-indexed to an index's feature codes and equipment codes."""
+        aligned = self._aligned
+        if aligned is None or aligned[0] is not index:
+            features, equipment, coef, intercept = self._load()
+            rows = {name: i for i, name in enumerate(features)}
+            current = feature_names(index)
+            # Features unknown to the model get zero weight
+            weights = np.zeros((len(current), coef.shape[1]), dtype=np.float32)
+            known = [(i, rows[name]) for i, name in enumerate(current) if name in rows]
+            if known:
+                weights[[i for i, _ in known]] = coef[[row for _, row in known]]
+            # Model columns of the index's equipment (-1 for items the model never saw)
+            columns = {name: i for i, name in enumerate(equipment)}
+            equipment_columns = np.array([columns.get(name, -1) for name in index.equipment], dtype=np.int64)
+            aligned = self._aligned = (index, weights, intercept, equipment_columns)
+        return aligned
+
+    def predict_proba(self, patients, recommender=None):
+        """
+        Allocation probabilities for a batch of patients.
+
+        Returns:
+            np.ndarray: float32 patients x index.equipment; 0 for items the model never saw
+        """
+        index = (recommender or PatientRecommender(use_memo=False)).index
+        return self._predict(encode_patients(patients, index), index)
+
+    def _predict(self, features, index):
+        _, weights, intercept, equipment_columns = self._weights_for(index)
+        probabilities = np.zeros((features.shape[0], len(index.equipment)), dtype=np.float32)
+        seen = equipment_columns >= 0
+        logits = features @ weights[:, equipment_columns[seen]] + intercept[equipment_columns[seen]]
+        probabilities[:, seen] = 1.0 / (1.0 + np.exp(-logits))
+        return probabilities
+
+    def blended_scores(self, patients, recommender=None, weight=LEARNED_WEIGHT):
+        """
+        Rule scores plus `weight` x the learned probability, for the index's equipment.
+
+        Patients are matched against the knowledge base once; the rule scores are
+        the product of their feature weights with the index's priority matrix, as
+        in PatientRecommender.get_score_matrix().
+
+        Returns:
+            tuple: (blended float array, rule score array and probability array,
+                each patients x index.equipment, and the equipment names)
+        """
+        index = (recommender or PatientRecommender(use_memo=False)).index
+        features = encode_patients(list(patients), index)
+        rule_scores = (features[:, :len(index.rules)] @ index.priority_matrix).toarray().astype(np.int64)
+        probabilities = self._predict(features, index)
+        return rule_scores + weight * probabilities, rule_scores, probabilities, index.equipment
+
+    def recommend_batch(self, patients, recommender=None, top_k=10, weight=LEARNED_WEIGHT,
+                        min_probability=MIN_PROBABILITY):
+        """
+        Rank equipment for many patients by blended rule and learned scores.
+
+        An item is eligible when the rules score it or the model gives it at least
+        `min_probability`.
+
+        Returns:
+            list: Per patient, up to top_k dicts with 'name', blended
+                'priority_score', 'rule_score' and 'learned_probability'
+        """
+        blended, rule_scores, probabilities, names = self.blended_scores(patients, recommender, weight)
+        eligible = (rule_scores > 0) | (probabilities >= min_probability)
+        # Stable descending order of the eligible items; only the first top_k columns are kept
+        order = np.argsort(np.where(eligible, -blended, np.inf), axis=1, kind='stable')[:, :top_k]
+        kept = np.take_along_axis(eligible, order, axis=1).sum(axis=1).tolist()
+        # Gathered and converted to Python values per array, not per element
+        blended = np.take_along_axis(blended, order, axis=1).round(2).tolist()
+        rule_scores = np.take_along_axis(rule_scores, order, axis=1).tolist()
+        probabilities = np.take_along_axis(probabilities, order, axis=1).astype(np.float64).round(3).tolist()
+
+        results = []
+        for p, columns in enumerate(order.tolist()):
+            results.append([{
+                'name': names[code],
+                'priority_score': blended[p][i],
+                'rule_score': rule_scores[p][i],
+                'learned_probability': probabilities[p][i]
+            } for i, code in enumerate(columns[:kept[p]])])
+        return results
+
+
+_shared_scorer = None
+
+
+def get_learned_scorer(path=MODEL_PATH):
+    """Return the process-wide learned scorer, or None when no model has been trained."""
+    global _shared_scorer
+    if not os.path.exists(path):
+        return None
+    if _shared_scorer is None or _shared_scorer.path != path:
+        _shared_scorer = LearnedScorer(path)
+    return _shared_scorer
+
+
+def load_allocations(path, separator=None):
+    """
+    Read historical allocations: a census file with an 'equipment' list column.
+
+    Returns:
+        tuple: (patient_data dicts, equipment name lists)
+    """
+    from census_recommendations import LIST_SEPARATOR, _as_list, census_patients, iter_census_chunks
+
+    separator = separator or LIST_SEPARATOR
+    patients, allocations = [], []
+    for chunk in iter_census_chunks(path):
+        patients.extend(census_patients(chunk, separator))
+        allocations.extend(_as_list(value, separator) for value in chunk['equipment'])
+    return patients, allocations
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train the learned equipment scorer on historical allocations")
+    parser.add_argument('allocations', help="Census .csv or .parquet file with an 'equipment' list column")
+    parser.add_argument('--output', default=MODEL_PATH, help="Model artifact path")
+    parser.add_argument('--regularization', type=float, default=REGULARIZATION, help="Inverse regularization (C)")
+    args = parser.parse_args()
+
+    patients, allocations = load_allocations(args.allocations)
+    print(f"Training on {len(patients):,} patients...")
+    scorer = train(patients, allocations, regularization=args.regularization)
+    print(f"Saved a model for {len(scorer.equipment)} equipment items to {scorer.save(args.output)}")
@@ -4,209 +4,206 @@ Patient-Specific Equipment Recommendation Engine
 This module provides personalized equipment recommendations based on patient characteristics,
 medical conditions, and specific needs.
 """
+import hashlib
+import heapq
+import json
+import sys
 import pandas as pd
 import numpy as np
-from collections import defaultdict
+from scipy import sparse
+
+from knowledge_base import KnowledgeBase
+from response_cache import ResponseCache
+
+# Bump when KnowledgeBaseIndex changes shape, so compiled snapshots are rebuilt
+INDEX_FORMAT = 1
+
+
+class EquipmentRule:
+    """One compiled knowledge-base entry: equipment a feature calls for, and why."""
+    __slots__ = ('code', 'priority', 'rationale_suffix')
+
+    def __init__(self, code, priority, rationale):
+        self.code = code
+        self.priority = priority
+        # Rationales read "[<label>] <rationale>"; only the label varies per patient
+        self.rationale_suffix = sys.intern(f"] {rationale}")
+
+
+class KnowledgeBaseIndex:
+    """
+    Immutable, integer-coded form of the knowledge-base maps.
+
+    Every equipment name gets an interned string and an integer code, and every key
+    of every map (plus the high-acuity boost) becomes a feature code whose rules are
+    kept in map order, so scoring a patient only does integer-keyed lookups.
+    """
+    __slots__ = ('equipment', 'equipment_codes', 'feature_codes', 'rules', 'acuity_feature',
+                 'priority_matrix', 'version', 'data')
+
+    def __init__(self, data):
+        """
+        Args:
+            data (dict): Parsed knowledge_data/patient_equipment.json
+        """
+        maps = [('condition', data['condition_equipment_map']),
+                ('demographic', data['demographic_equipment_map']),
+                ('need', data['clinical_needs_map']),
+                ('treatment', data['treatment_equipment_map'])]
+        entries = [((kind, key), [(e['name'], e['priority'], e['rationale']) for e in items])
+                   for kind, mapping in maps for key, items in mapping.items()]
+        # Acuity adds (acuity - 2) to each monitoring item: priority 1, weighted per patient
+        entries.append((('acuity', None),
+                        [(name, 1, 'Enhanced monitoring required') for name in data['monitoring_equipment']]))
+        self.data = data
+
+        equipment_codes = {}
+        feature_codes = {}
+        rules = []
+        for feature, items in entries:
+            feature_codes[feature] = len(rules)
+            feature_rules = []
+            for name, priority, rationale in items:
+                code = equipment_codes.setdefault(sys.intern(name), len(equipment_codes))
+                feature_rules.append(EquipmentRule(code, priority, rationale))
+            rules.append(tuple(feature_rules))
+
+        self.equipment = tuple(equipment_codes)
+        self.equipment_codes = equipment_codes
+        self.feature_codes = feature_codes
+        self.rules = tuple(rules)
+        self.acuity_feature = feature_codes[('acuity', None)]
+        # Fingerprint of the compiled rules, used to invalidate memoized recommendations
+        self.version = hashlib.sha1(json.dumps(entries).encode()).hexdigest()
+
+        # Sparse feature x equipment priority matrix for batch scoring
+        rows = [feature for feature, feature_rules in enumerate(rules) for _ in feature_rules]
+        cols = [rule.code for feature_rules in rules for rule in feature_rules]
+        priorities = [rule.priority for feature_rules in rules for rule in feature_rules]
+        self.priority_matrix = sparse.csr_matrix((priorities, (rows, cols)),
+                                                 shape=(len(rules), len(equipment_codes)), dtype=np.int64)
+
+    def patient_features(self, patient_data):
+        """
+        List a patient's matched features in the order their rules are applied.
+
+        Returns:
+            list: (feature code, rationale label, weight) tuples
+        """
+        feature_codes = self.feature_codes
+        matched = []
+        for condition in patient_data.get('conditions', []):
+            feature = feature_codes.get(('condition', condition.lower()))
+            if feature is not None:
+                matched.append((feature, condition, 1))
+
+        # Demographics: bariatric (simplified BMI) first, then the age band
+        demographics = patient_data.get('demographics', {})
+        age = demographics.get('age', 0)
+        weight = demographics.get('weight', 0)
+        height = demographics.get('height', 170)  # cm
+        if height > 0 and weight > 0 and weight / ((height/100) ** 2) > 35:
+            matched.append((feature_codes[('demographic', 'bariatric')], 'Bariatric needs', 1))
+        demo_type = 'pediatric' if age < 18 else 'geriatric' if age > 65 else 'adult'
+        feature = feature_codes.get(('demographic', demo_type))
+        if feature is not None:
+            matched.append((feature, f"{demo_type.title()} patient", 1))
+
+        for kind, values in (('need', patient_data.get('clinical_needs', [])),
+                             ('treatment', patient_data.get('treatments', []))):
+            for value in values:
+                feature = feature_codes.get((kind, value.lower()))
+                if feature is not None:
+                    matched.append((feature, value, 1))
+
+        # Acuity adjustment - boost monitoring equipment by acuity level for high acuity
+        acuity = patient_data.get('acuity', 3)
+        if acuity >= 4:
+            matched.append((self.acuity_feature, f"High Acuity (Level {acuity})", acuity - 2))
+        return matched
+
+
+# Compiled once per process (or loaded from its snapshot) and shared by every recommender;
+# edits to the data file are picked up by running servers
+_patient_knowledge_base = KnowledgeBase('patient_equipment', compiler=KnowledgeBaseIndex,
+                                        compiler_version=INDEX_FORMAT)
+
+
+def get_knowledge_base_index():
+    """Return the process-wide compiled knowledge-base index, reloaded if its file changed."""
+    return _patient_knowledge_base.get()
+
+
+def get_patient_knowledge_base():
+    """Return the patient knowledge-base file, whose version covers every section of it."""
+    return _patient_knowledge_base
+
+
+# Distinct canonical profiles whose ranked recommendations are kept
+MEMO_SIZE = 4096
+
+_shared_memo = None
+
+
+def get_recommendation_memo():
+    """
+    Return the process-wide memo of ranked recommendations.
+
+    Entries are keyed on a patient's canonical profile - the ordered features it
+    matches, which already reduce age and BMI to bands and drop unknown labels -
+    and are dropped when the knowledge-base version changes.
+    """
+    global _shared_memo
+    if _shared_memo is None:
+        _shared_memo = ResponseCache(max_entries=MEMO_SIZE, ttl_seconds=float('inf'))
+    return _shared_memo
+
 
 class PatientRecommender:
-    def __init__(self):
-        """Initialize the patient recommendation engine with clinical knowledge base."""
-        # Map conditions to equipment needs with priority levels (1-5, with 5 being highest)
-        self.condition_equipment_map = {
-            # Respiratory conditions
-            'pneumonia': [
-                {'name': 'Oxygen Delivery System', 'priority': 5, 'rationale': 'Required for oxygen therapy to maintain adequate saturation'},
-                {'name': 'Pulse Oximeter', 'priority': 5, 'rationale': 'Continuous monitoring of oxygen saturation'},
-                {'name': 'Suction Device', 'priority': 4, 'rationale': 'Airway clearance for secretions'},
-                {'name': 'Nebulizer', 'priority': 3, 'rationale': 'Delivery of bronchodilators if needed'}
-            ],
-            'copd': [
-                {'name': 'BiPAP/CPAP Machine', 'priority': 5, 'rationale': 'Non-invasive ventilation for respiratory support'},
-                {'name': 'Oxygen Delivery System', 'priority': 5, 'rationale': 'Low-flow oxygen as prescribed'},
-                {'name': 'Pulse Oximeter', 'priority': 4, 'rationale': 'Monitoring of oxygen saturation'},
-                {'name': 'Nebulizer', 'priority': 4, 'rationale': 'Administration of bronchodilators'}
-            ],
-            'asthma': [
-                {'name': 'Peak Flow Meter', 'priority': 4, 'rationale': 'Monitoring lung function'},
-                {'name': 'Nebulizer', 'priority': 4, 'rationale': 'Delivery of bronchodilators'},
-                {'name': 'Oxygen Delivery System', 'priority': 3, 'rationale': 'Supplemental oxygen as needed'}
-            ],
-            'respiratory_failure': [
-                {'name': 'Ventilator', 'priority': 5, 'rationale': 'Mechanical ventilation support'},
-                {'name': 'Arterial Line Equipment', 'priority': 4, 'rationale': 'Continuous blood pressure monitoring and ABG sampling'},
-                {'name': 'End-Tidal CO2 Monitor', 'priority': 4, 'rationale': 'Monitoring ventilation adequacy'}
-            ],
-            
-            # Cardiovascular conditions
-            'myocardial_infarction': [
-                {'name': 'Cardiac Monitor', 'priority': 5, 'rationale': 'Continuous ECG monitoring'},
-                {'name': 'Defibrillator', 'priority': 5, 'rationale': 'Ready for cardiac emergencies'},
-                {'name': 'Oxygen Delivery System', 'priority': 4, 'rationale': 'Supplemental oxygen as needed'},
-                {'name': 'IV Pump', 'priority': 4, 'rationale': 'Precise delivery of cardiac medications'}
-            ],
-            'heart_failure': [
-                {'name': 'Cardiac Monitor', 'priority': 5, 'rationale': 'Monitoring for arrhythmias'},
-                {'name': 'IV Pump', 'priority': 4, 'rationale': 'Diuretic and inotropic medication delivery'},
-                {'name': 'Oxygen Delivery System', 'priority': 4, 'rationale': 'Supplemental oxygen therapy'},
-                {'name': 'Digital Scale', 'priority': 3, 'rationale': 'Daily weight monitoring'}
-            ],
-            'hypertension': [
-                {'name': 'Automated Blood Pressure Cuff', 'priority': 4, 'rationale': 'Regular BP monitoring'},
-                {'name': 'IV Pump', 'priority': 3, 'rationale': 'For antihypertensive medications if needed'}
-            ],
-            'arrhythmia': [
-                {'name': 'Cardiac Monitor', 'priority': 5, 'rationale': 'Continuous rhythm monitoring'},
-                {'name': 'Defibrillator', 'priority': 5, 'rationale': 'Available for emergency cardioversion'},
-                {'name': 'Temporary Pacemaker', 'priority': 4, 'rationale': 'For bradyarrhythmias if needed'}
-            ],
-            
-            # Neurological conditions
-            'stroke': [
-                {'name': 'Neurological Assessment Tools', 'priority': 5, 'rationale': 'Regular neuro checks'},
-                {'name': 'Swallow Evaluation Kit', 'priority': 4, 'rationale': 'Dysphagia screening'},
-                {'name': 'Blood Pressure Monitor', 'priority': 4, 'rationale': 'Close BP management'},
-                {'name': 'Oxygen Delivery System', 'priority': 3, 'rationale': 'As needed for hypoxia'}
-            ],
-            'seizure_disorder': [
-                {'name': 'Padded Bed Rails', 'priority': 5, 'rationale': 'Prevention of injury during seizures'},
-                {'name': 'Suction Device', 'priority': 4, 'rationale': 'Airway management during seizure'},
-                {'name': 'Oxygen Delivery System', 'priority': 3, 'rationale': 'Post-ictal oxygen supplementation'}
-            ],
-            'traumatic_brain_injury': [
-                {'name': 'ICP Monitoring Equipment', 'priority': 5, 'rationale': 'Intracranial pressure monitoring'},
-                {'name': 'Neurological Assessment Tools', 'priority': 5, 'rationale': 'Frequent neuro checks'},
-                {'name': 'Ventilator', 'priority': 4, 'rationale': 'If respiratory drive compromised'}
-            ],
-            
-            # Gastrointestinal conditions
-            'gi_bleed': [
-                {'name': 'Suction Device', 'priority': 5, 'rationale': 'For hematemesis management'},
-                {'name': 'IV Pump', 'priority': 5, 'rationale': 'Fluid and blood product administration'},
-                {'name': 'Nasogastric Tube Kit', 'priority': 4, 'rationale': 'For gastric decompression and lavage'},
-                {'name': 'Fluid Warmer', 'priority': 3, 'rationale': 'For prevention of hypothermia during resuscitation'}
-            ],
-            'inflammatory_bowel_disease': [
-                {'name': 'IV Pump', 'priority': 4, 'rationale': 'For hydration and medication'},
-                {'name': 'Patient-Controlled Analgesia Pump', 'priority': 3, 'rationale': 'Pain management'}
-            ],
-            
-            # Endocrine conditions
-            'diabetes': [
-                {'name': 'Glucometer', 'priority': 5, 'rationale': 'Regular blood glucose monitoring'},
-                {'name': 'IV Pump', 'priority': 4, 'rationale': 'For insulin infusions if needed'},
-                {'name': 'Meal Delivery System', 'priority': 3, 'rationale': 'Consistent carbohydrate meal timing'}
-            ],
-            'diabetic_ketoacidosis': [
-                {'name': 'IV Pump', 'priority': 5, 'rationale': 'Precise insulin and fluid administration'},
-                {'name': 'Glucometer', 'priority': 5, 'rationale': 'Hourly glucose monitoring'},
-                {'name': 'Cardiac Monitor', 'priority': 4, 'rationale': 'Monitoring for arrhythmias from electrolyte shifts'}
-            ],
-            
-            # Renal conditions
-            'acute_kidney_injury': [
-                {'name': 'IV Pump', 'priority': 5, 'rationale': 'Precise fluid management'},
-                {'name': 'Fluid Balance Chart', 'priority': 4, 'rationale': 'Strict input/output monitoring'},
-                {'name': 'Digital Scale', 'priority': 4, 'rationale': 'Daily weight monitoring'}
-            ],
-            'chronic_kidney_disease': [
-                {'name': 'Dialysis Access Care Kit', 'priority': 4, 'rationale': 'Maintenance of vascular access'},
-                {'name': 'Blood Pressure Monitor', 'priority': 4, 'rationale': 'Regular BP monitoring'},
-                {'name': 'Digital Scale', 'priority': 4, 'rationale': 'Daily weight monitoring'}
-            ],
-            
-            # Surgical patients
-            'post_surgical': [
-                {'name': 'Wound Care Supplies', 'priority': 5, 'rationale': 'Surgical site management'},
-                {'name': 'Patient-Controlled Analgesia Pump', 'priority': 4, 'rationale': 'Pain management'},
-                {'name': 'Incentive Spirometer', 'priority': 4, 'rationale': 'Prevention of atelectasis'},
-                {'name': 'Sequential Compression Devices', 'priority': 4, 'rationale': 'DVT prophylaxis'}
-            ],
-            
-            # Infectious disease
-            'sepsis': [
-                {'name': 'Cardiac Monitor', 'priority': 5, 'rationale': 'Hemodynamic monitoring'},
-                {'name': 'IV Pump', 'priority': 5, 'rationale': 'Fluid and vasopressor administration'},
-                {'name': 'Temperature Management System', 'priority': 4, 'rationale': 'Fever management'}
-            ],
-            
-            # Mobility/fall risk
-            'fall_risk': [
-                {'name': 'Bed Alarm', 'priority': 5, 'rationale': 'Alert for unauthorized bed exit'},
-                {'name': 'Low Height Bed', 'priority': 4, 'rationale': 'Minimizing fall injury risk'},
-                {'name': 'Gait Belt', 'priority': 4, 'rationale': 'Support during ambulation'}
-            ],
-            'mobility_impairment': [
-                {'name': 'Mechanical Lift', 'priority': 5, 'rationale': 'Safe patient handling'},
-                {'name': 'Pressure-Relieving Mattress', 'priority': 4, 'rationale': 'Prevention of pressure injuries'},
-                {'name': 'Transfer Board', 'priority': 4, 'rationale': 'Assist with lateral transfers'}
-            ]
-        }
-        
-        # Demographics-based considerations (age, weight, etc.)
-        self.demographic_equipment_map = {
-            'pediatric': [
-                {'name': 'Pediatric-Sized Equipment', 'priority': 5, 'rationale': 'Appropriately sized for children'},
-                {'name': 'Child-Friendly Environment', 'priority': 3, 'rationale': 'Reduce stress and anxiety'}
-            ],
-            'geriatric': [
-                {'name': 'Pressure-Relieving Mattress', 'priority': 4, 'rationale': 'Prevention of pressure injuries in thin skin'},
-                {'name': 'Assistive Devices', 'priority': 4, 'rationale': 'Support mobility and independence'}
-            ],
-            'bariatric': [
-                {'name': 'Bariatric Bed', 'priority': 5, 'rationale': 'Weight capacity and width requirements'},
-                {'name': 'Bariatric Commode', 'priority': 4, 'rationale': 'Weight capacity requirements'},
-                {'name': 'Ceiling Lift', 'priority': 5, 'rationale': 'Safe patient handling'}
-            ]
-        }
-        
-        # Additional equipment for specific clinical needs
-        self.clinical_needs_map = {
-            'isolation': [
-                {'name': 'Negative Pressure Room', 'priority': 5, 'rationale': 'Airborne infection control'},
-                {'name': 'PPE Station', 'priority': 5, 'rationale': 'Infection control supplies'}
-            ],
-            'immunocompromised': [
-                {'name': 'HEPA Filter', 'priority': 5, 'rationale': 'Air filtration'},
-                {'name': 'Positive Pressure Room', 'priority': 4, 'rationale': 'Protection from external contaminants'}
-            ],
-            'limited_mobility': [
-                {'name': 'Ceiling Lift', 'priority': 4, 'rationale': 'Safe transfers'},
-                {'name': 'Pressure-Relieving Mattress', 'priority': 4, 'rationale': 'Prevention of pressure injuries'}
-            ],
-            'visually_impaired': [
-                {'name': 'Braille Signage', 'priority': 3, 'rationale': 'Navigation assistance'},
-                {'name': 'Audible Alert Systems', 'priority': 4, 'rationale': 'Communication of important information'}
-            ],
-            'hearing_impaired': [
-                {'name': 'Visual Alert System', 'priority': 4, 'rationale': 'Visual cues for alarms'},
-                {'name': 'Communication Board', 'priority': 3, 'rationale': 'Alternative communication method'}
-            ]
-        }
-        
-        # Treatment-specific equipment needs
-        self.treatment_equipment_map = {
-            'chemotherapy': [
-                {'name': 'Chemotherapy-Rated IV Pump', 'priority': 5, 'rationale': 'Safe administration of cytotoxic drugs'},
-                {'name': 'Spill Kit', 'priority': 5, 'rationale': 'Management of cytotoxic spills'},
-                {'name': 'Anti-Nausea Medication Delivery', 'priority': 4, 'rationale': 'Symptom management'}
-            ],
-            'radiation_therapy': [
-                {'name': 'Positioning Aids', 'priority': 5, 'rationale': 'Reproducible patient positioning'},
-                {'name': 'Radiation Shield', 'priority': 5, 'rationale': 'Protection of non-targeted areas'}
-            ],
-            'dialysis': [
-                {'name': 'Dialysis Machine', 'priority': 5, 'rationale': 'Renal replacement therapy'},
-                {'name': 'Dialysis Chair', 'priority': 4, 'rationale': 'Patient comfort during treatment'},
-                {'name': 'Fluid Balance Equipment', 'priority': 5, 'rationale': 'Precise fluid removal monitoring'}
-            ],
-            'physical_therapy': [
-                {'name': 'Therapeutic Exercise Equipment', 'priority': 4, 'rationale': 'Rehabilitation progress'},
-                {'name': 'Parallel Bars', 'priority': 3, 'rationale': 'Gait training'},
-                {'name': 'Therapy Mats', 'priority': 3, 'rationale': 'Safe exercise surface'}
-            ]
+    def __init__(self, use_memo=True):
+        """
+        Initialize the patient recommendation engine with clinical knowledge base.
+
+        Args:
+            use_memo (bool): Share ranked recommendations between patients with the
+                same canonical profile through the process-wide memo
+        """
+        self.memo = get_recommendation_memo() if use_memo else None
+
+    # The knowledge base is shared, read-only data; every access sees the current file
+    @property
+    def index(self):
+        return get_knowledge_base_index()
+
+    @property
+    def condition_equipment_map(self):
+        return self.index.data['condition_equipment_map']
+
+    @property
+    def demographic_equipment_map(self):
+        return self.index.data['demographic_equipment_map']
+
+    @property
+    def clinical_needs_map(self):
+        return self.index.data['clinical_needs_map']
+
+    @property
+    def treatment_equipment_map(self):
+        return self.index.data['treatment_equipment_map']
+
+    def memo_stats(self):
+        """Hit/miss counters of the recommendation memo (None when it is disabled)."""
+        return self.memo.stats() if self.memo is not None else None
+
+    @staticmethod
+    def _patient_info(patient_data):
+        return {
+            'conditions': patient_data.get('conditions', []),
+            'demographics': patient_data.get('demographics', {}),
+            'acuity': patient_data.get('acuity', 3)
         }
-        
-    def get_recommendations(self, patient_data):
+
+    def get_recommendations(self, patient_data, top_k=None):
         """
         Generate personalized equipment recommendations based on patient data.
         
@@ -217,125 +214,167 @@ class PatientRecommender:
                 - clinical_needs (list): Special clinical requirements
                 - treatments (list): Current treatments
                 - acuity (int): Patient acuity level (1-5)
+            top_k (int): Only return the k highest-scoring items, selected with a
+                heap; rationales are then built for those items only. None (the
+                default) returns every item.
                 
         Returns:
-            dict: Personalized equipment recommendations with rationales
+            dict: Personalized equipment recommendations with rationales. With the
+                memo enabled, the recommendation list may be shared with other
+                patients of the same profile and must not be modified.
         """
-        recommendations = []
-        equipment_scores = defaultdict(int)
-        equipment_rationales = {}
-        
-        # Process medical conditions
-        conditions = patient_data.get('conditions', [])
-        for condition in conditions:
-            if condition.lower() in self.condition_equipment_map:
-                for equip in self.condition_equipment_map[condition.lower()]:
-                    equipment_scores[equip['name']] += equip['priority']
-                    if equip['name'] not in equipment_rationales:
-                        equipment_rationales[equip['name']] = []
-                    equipment_rationales[equip['name']].append(
-                        f"[{condition}] {equip['rationale']}"
-                    )
-        
-        # Process demographics
-        demographics = patient_data.get('demographics', {})
-        age = demographics.get('age', 0)
-        weight = demographics.get('weight', 0)
-        
-        # Apply demographic rules
-        if age < 18:
-            demo_type = 'pediatric'
-        elif age > 65:
-            demo_type = 'geriatric'
+        index = self.index
+        matched = index.patient_features(patient_data)
+        if self.memo is None:
+            recommendations = self._rank(matched, top_k, index)
         else:
-            demo_type = 'adult'
-            
-        # Weight-based considerations (simplified BMI calculation)
-        height = demographics.get('height', 170)  # cm
-        if height > 0 and weight > 0:
-            bmi = weight / ((height/100) ** 2)
-            if bmi > 35:  # Simplified classification
-                for equip in self.demographic_equipment_map['bariatric']:
-                    equipment_scores[equip['name']] += equip['priority']
-                    if equip['name'] not in equipment_rationales:
-                        equipment_rationales[equip['name']] = []
-                    equipment_rationales[equip['name']].append(
-                        f"[Bariatric needs] {equip['rationale']}"
-                    )
-        
-        # Apply demographic equipment
-        if demo_type in self.demographic_equipment_map:
-            for equip in self.demographic_equipment_map[demo_type]:
-                equipment_scores[equip['name']] += equip['priority']
-                if equip['name'] not in equipment_rationales:
-                    equipment_rationales[equip['name']] = []
-                equipment_rationales[equip['name']].append(
-                    f"[{demo_type.title()} patient] {equip['rationale']}"
-                )
-        
-        # Process special clinical needs
-        clinical_needs = patient_data.get('clinical_needs', [])
-        for need in clinical_needs:
-            if need.lower() in self.clinical_needs_map:
-                for equip in self.clinical_needs_map[need.lower()]:
-                    equipment_scores[equip['name']] += equip['priority']
-                    if equip['name'] not in equipment_rationales:
-                        equipment_rationales[equip['name']] = []
-                    equipment_rationales[equip['name']].append(
-                        f"[{need}] {equip['rationale']}"
-                    )
-        
-        # Process treatments
-        treatments = patient_data.get('treatments', [])
-        for treatment in treatments:
-            if treatment.lower() in self.treatment_equipment_map:
-                for equip in self.treatment_equipment_map[treatment.lower()]:
-                    equipment_scores[equip['name']] += equip['priority']
-                    if equip['name'] not in equipment_rationales:
-                        equipment_rationales[equip['name']] = []
-                    equipment_rationales[equip['name']].append(
-                        f"[{treatment}] {equip['rationale']}"
-                    )
-        
-        # Acuity adjustment - increase priority of monitoring equipment for high acuity
-        acuity = patient_data.get('acuity', 3)
-        if acuity >= 4:
-            monitoring_equipment = [
-                'Cardiac Monitor', 'Pulse Oximeter', 'Blood Pressure Monitor', 
-                'Ventilator', 'IV Pump'
-            ]
-            for equip in monitoring_equipment:
-                equipment_scores[equip] += acuity - 2  # Boost by acuity level
-                if equip not in equipment_rationales:
-                    equipment_rationales[equip] = []
-                equipment_rationales[equip].append(
-                    f"[High Acuity (Level {acuity})] Enhanced monitoring required"
-                )
-        
-        # Sort equipment by score (priority)
-        sorted_equipment = sorted(
-            equipment_scores.items(), 
-            key=lambda x: x[1], 
-            reverse=True
-        )
-        
-        # Format final recommendations
-        for equip_name, score in sorted_equipment:
-            recommendations.append({
-                'name': equip_name,
-                'priority_score': score,
-                'rationales': equipment_rationales[equip_name]
-            })
-        
+            key = (top_k, tuple(matched))
+            recommendations = self.memo.get(key, index.version)
+            if recommendations is None:
+                recommendations = self._rank(matched, top_k, index)
+                self.memo.put(key, recommendations, index.version)
+
         return {
-            'patient_info': {
-                'conditions': conditions,
-                'demographics': demographics,
-                'acuity': acuity
-            },
+            'patient_info': self._patient_info(patient_data),
             'recommendations': recommendations
         }
-    
+
+    def _rank(self, matched, top_k=None, index=None):
+        """Score and rank one patient's matched features into recommendation dicts."""
+        # The index the features were matched against, so a reload mid-call cannot mix versions
+        index = index or self.index
+        rules = index.rules
+        # Keyed on equipment code; insertion order is first-touch order, which breaks ties
+        equipment_scores = {}
+        equipment_rationales = {}
+        # Upper bound on the items touched; when it is within top_k nothing gets cut
+        if top_k is None or sum(len(rules[feature]) for feature, _, _ in matched) <= top_k:
+            for feature, label, weight in matched:
+                prefix = "[" + label
+                for rule in rules[feature]:
+                    code = rule.code
+                    if code in equipment_scores:
+                        equipment_scores[code] += rule.priority * weight
+                        equipment_rationales[code].append(prefix + rule.rationale_suffix)
+                    else:
+                        equipment_scores[code] = rule.priority * weight
+                        equipment_rationales[code] = [prefix + rule.rationale_suffix]
+
+            # Sort equipment by score (priority)
+            ranked = sorted(equipment_scores, key=equipment_scores.__getitem__, reverse=True)
+        else:
+            score = equipment_scores.get
+            for feature, _, weight in matched:
+                for rule in rules[feature]:
+                    equipment_scores[rule.code] = score(rule.code, 0) + rule.priority * weight
+            # Both selections are stable, so ties keep first-touch order as the full sort does;
+            # the heap only pays off once there are many more items than top_k
+            if len(equipment_scores) > 2 * top_k:
+                ranked = heapq.nlargest(top_k, equipment_scores, key=equipment_scores.__getitem__)
+            else:
+                ranked = sorted(equipment_scores, key=equipment_scores.__getitem__, reverse=True)[:top_k]
+            equipment_rationales = self._rationales(matched, ranked, index)
+        
+        return [{
+            'name': index.equipment[code],
+            'priority_score': equipment_scores[code],
+            'rationales': equipment_rationales[code]
+        } for code in ranked]
+
+    def _rationales(self, matched, codes, index):
+        """Build rationale lists for the given equipment codes only, in application order."""
+        rationales = {code: [] for code in codes}
+        for feature, label, _ in matched:
+            for rule in index.rules[feature]:
+                if rule.code in rationales:
+                    rationales[rule.code].append("[" + label + rule.rationale_suffix)
+        return rationales
+
+    def _score_features(self, matched, index):
+        """Score lists of matched features with one sparse patient x feature matrix product."""
+        rows = [p for p, patient_features in enumerate(matched) for _ in patient_features]
+        cols = [feature for patient_features in matched for feature, _, _ in patient_features]
+        weights = [weight for patient_features in matched for _, _, weight in patient_features]
+        patient_matrix = sparse.csr_matrix((weights, (rows, cols)),
+                                           shape=(len(matched), len(index.rules)), dtype=np.int64)
+        return (patient_matrix @ index.priority_matrix).tocsr()
+
+    def get_score_matrix(self, patients):
+        """
+        Score many patients without building ranked lists or rationales.
+
+        Returns:
+            tuple: (CSR matrix of priority scores, patients x equipment, and the
+                equipment names by column)
+        """
+        index = self.index
+        matched = [index.patient_features(patient) for patient in patients]
+        return self._score_features(matched, index), index.equipment
+
+    def get_recommendations_batch(self, patients, top_k=None, learned=False):
+        """
+        Generate recommendations for many patients, ranking each distinct profile once.
+
+        Patients are first reduced to canonical profiles; profiles already in the
+        memo (or repeated within the batch) are not ranked again, and the rest take
+        the single-patient path. The result is identical to calling
+        get_recommendations() on each patient, including tie order and rationales.
+        Building rationales dominates the cost, so profiles are ranked one by one
+        rather than scored through the sparse priority matrix (see
+        get_score_matrix() for scores alone).
+
+        With learned=True and a trained learned scorer (see learned_recommender),
+        items are instead ranked by its blended scores, bypassing the memo; that
+        ranking differs from get_recommendations(), so it has to be asked for.
+
+        Args:
+            patients (iterable): patient_data dicts as taken by get_recommendations()
+            top_k (int): Keep only each patient's k highest-scoring items (and build
+                only their rationales); None keeps every item
+            learned (bool): Blend in the learned scorer when one has been trained
+
+        Returns:
+            list: One recommendation dict per patient, in input order
+        """
+        index = self.index
+        patients = list(patients)
+        if learned:
+            # Imported here: learned_recommender builds on this module
+            from learned_recommender import get_learned_scorer
+            scorer = get_learned_scorer()
+            if scorer is not None:
+                return self._learned_batch(scorer, patients, top_k, index)
+        keys = [(top_k, tuple(index.patient_features(patient))) for patient in patients]
+
+        ranked = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            cached = self.memo.get(key, index.version) if self.memo is not None else None
+            if cached is None:
+                missing.append(key)
+            else:
+                ranked[key] = cached
+        for key in missing:
+            recommendations = ranked[key] = self._rank(key[1], top_k, index)
+            if self.memo is not None:
+                self.memo.put(key, recommendations, index.version)
+
+        return [{'patient_info': self._patient_info(patient), 'recommendations': ranked[key]}
+                for patient, key in zip(patients, keys)]
+
+    def _learned_batch(self, scorer, patients, top_k, index):
+        """Rank by blended rule and learned scores, keeping the rules' rationales."""
+        results = []
+        for patient, items in zip(patients, scorer.recommend_batch(patients, self, top_k=top_k)):
+            codes = [index.equipment_codes[item['name']] for item in items]
+            rationales = self._rationales(index.patient_features(patient), codes, index)
+            for item, code in zip(items, codes):
+                # Items only the model recommends have no rule to cite
+                item['rationales'] = rationales[code] or [
+                    f"[Allocation history] Allocated to {item['learned_probability']:.0%} of similar patients"]
+            results.append({'patient_info': self._patient_info(patient), 'recommendations': items})
+        return results
+
     def get_equipment_details(self, equipment_name):
         """
         Get detailed specifications for a specific piece of equipment.
@@ -344,62 +383,30 @@ class PatientRecommender:
             equipment_name (str): Name of the equipment
             
         Returns:
-            dict: Equipment specifications
+            dict: Equipment specifications, with the room types listing the item
+                and the number on hand in the equipment dataset
         """
-        equipment_specs = {
-            'Cardiac Monitor': {
-                'description': 'Continuous electrocardiographic monitoring device',
-                'dimensions': '12" x 10" x 6"',
-                'electrical': '120V AC',
-                'connectivity': 'Wireless telemetry',
-                'features': ['Arrhythmia detection', 'ST segment analysis', 'QT monitoring'],
-                'placement': 'Wall mount or cart at head of bed, visible from door'
-            },
-            'Ventilator': {
-                'description': 'Mechanical breathing support device',
-                'dimensions': '15" x 15" x 48"',
-                'electrical': '120V AC, battery backup',
-                'connectivity': 'HL7 integration',
-                'features': ['Volume/pressure modes', 'PEEP', 'Pressure support'],
-                'placement': 'Right side of bed (for right-handed clinicians)'
-            },
-            'IV Pump': {
-                'description': 'Precision intravenous fluid/medication delivery device',
-                'dimensions': '6" x 8" x 10" per channel',
-                'electrical': '120V AC, battery backup',
-                'connectivity': 'Wireless medication library updates',
-                'features': ['Drug library', 'Dose error reduction', 'Multiple infusion modes'],
-                'placement': 'IV pole, left side of bed'
-            },
-            'Defibrillator': {
-                'description': 'Cardiac resuscitation device',
-                'dimensions': '12" x 14" x 8"',
-                'electrical': '120V AC, battery powered',
-                'connectivity': 'Code event documentation',
-                'features': ['Biphasic waveform', 'AED mode', 'Transcutaneous pacing'],
-                'placement': 'Crash cart, accessible from all sides of patient'
-            },
-            'Oxygen Delivery System': {
-                'description': 'Wall-mounted or portable oxygen source',
-                'dimensions': 'Wall outlet or E-cylinder (4" x 26")',
-                'features': ['Flowmeter', 'Humidification capability'],
-                'placement': 'Head wall, left side'
-            }
-        }
-        
-        # Add more equipment specs as needed
-        
-        # Return details if available, otherwise return basic info
-        if equipment_name in equipment_specs:
-            return {
-                'name': equipment_name,
-                'details': equipment_specs[equipment_name]
-            }
-        else:
-            return {
-                'name': equipment_name,
-                'details': {
-                    'description': 'Medical equipment',
-                    'placement': 'As per clinical need'
-                }
-            }
+        return self.get_equipment_details_batch([equipment_name])[0]
+
+    def get_equipment_details_batch(self, equipment_names):
+        """
+        Get specifications for several pieces of equipment with one catalog lookup each.
+
+        Args:
+            equipment_names (list): Equipment names; matched ignoring case,
+                punctuation and plurals
+
+        Returns:
+            list: One get_equipment_details() dict per name, in order
+        """
+        from equipment_catalog import DEFAULT_DETAILS, get_equipment_catalog
+
+        results = []
+        for name, entry in zip(equipment_names, get_equipment_catalog().lookup_many(equipment_names)):
+            if entry is None:
+                # Return basic info for equipment no knowledge base describes
+                results.append({'name': name, 'details': DEFAULT_DETAILS, 'rooms': [], 'on_hand': None})
+            else:
+                results.append({'name': name, 'details': entry['details'],
+                                'rooms': list(entry['rooms']), 'on_hand': entry['on_hand']})
+        return results
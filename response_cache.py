@@ -0,0 +1,76 @@
+"""
+Chatbot Response Cache
+
+Process-wide LRU/TTL cache for chatbot answers keyed on a normalized query intent,
+so identical questions from different sessions are answered without recomputing.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache with per-entry time-to-live and hit/miss counters.
+
+    Every lookup carries a `generation` (e.g. dataset version and knowledge-base
+    fingerprint); when it differs from the generation the cached entries were
+    stored under, the whole cache is dropped.
+    """
+
+    def __init__(self, max_entries=2048, ttl_seconds=900):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._generation = None
+        # Streamlit serves sessions from threads of one process
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_generation(self, generation):
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, key, generation=None):
+        """Return the cached value for key, or None on a miss or expiry."""
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, generation=None):
+        """Store a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._check_generation(generation)
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and the current hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,194 @@
+"""
+Room Equipment Geometry
+
+The room knowledge base describes equipment in free text: "7.5ft x 3.3ft",
+"4ft on all sides", "3-4 units", "Center of room, head against wall". This module
+parses that text once, when the knowledge base is compiled, into typed records:
+numeric footprints, per-side clearances, quantity ranges and placement hints per
+item, plus a NumPy structured array per room for whole-room arithmetic. Layout
+solving, compatibility checks and rendering read the numbers directly and never
+touch the source strings.
+"""
+import re
+
+import numpy as np
+
+# Footprints for specs without numeric dimensions
+DEFAULT_FOOTPRINT = (2.0, 2.0)
+WALL_UNIT_FOOTPRINT = (2.0, 0.5)
+
+_NUMBER = r'(\d+(?:\.\d+)?)'
+_RECTANGLE = re.compile(_NUMBER + r'\s*ft\s*x\s*' + _NUMBER + r'\s*ft')
+_DIAMETER = re.compile(_NUMBER + r'\s*ft\s+diameter')
+_FEET = re.compile(_NUMBER + r'\s*ft')
+_QUANTITY = re.compile(r'(\d+)(?:\s*-\s*(\d+))?')
+
+# Clearance sides, in the item's own frame
+FRONT, RIGHT, BACK, LEFT = range(4)
+
+# Mounting layers, as stored in the structured array
+MOUNTS = ('floor', 'wall', 'ceiling')
+
+# One row per equipment entry of a room
+GEOMETRY_DTYPE = np.dtype([
+    ('width', 'f8'),
+    ('depth', 'f8'),
+    ('clearance', 'f8', (4,)),
+    ('min_quantity', 'i4'),
+    ('max_quantity', 'i4'),
+    ('circle', '?'),
+    ('mount', 'i1'),
+])
+
+
+def parse_dimensions(text):
+    """
+    Parse a dimensions string into a footprint.
+
+    Returns:
+        tuple: (width, depth, shape) in feet, shape being 'rect' or 'circle';
+            None for sizes the text does not give (e.g. "Wall-mounted system")
+    """
+    text = text.lower()
+    match = _RECTANGLE.search(text)
+    if match:
+        return float(match.group(1)), float(match.group(2)), 'rect'
+    match = _DIAMETER.search(text)
+    if match:
+        return float(match.group(1)), float(match.group(1)), 'circle'
+    return None
+
+
+def parse_clearance(text):
+    """
+    Parse a clearance string into per-side clearances.
+
+    "4ft on all sides", "1ft around monitor" and "5ft swing radius" apply to every
+    side; any other distance ("3ft in front", "2ft for access") is the access
+    side, the item's front. Text without a distance means no clearance.
+
+    Returns:
+        tuple: (front, right, back, left) clearance in feet
+    """
+    text = text.lower()
+    match = _FEET.search(text)
+    if not match:
+        return (0.0, 0.0, 0.0, 0.0)
+    distance = float(match.group(1))
+    if 'all sides' in text or 'around' in text or 'radius' in text:
+        return (distance, distance, distance, distance)
+    return (distance, 0.0, 0.0, 0.0)
+
+
+def parse_quantity(text):
+    """Parse a quantity string ("3-4 units") into a (minimum, maximum) pair; (1, 1) when absent."""
+    match = _QUANTITY.search(text or '')
+    if not match:
+        return (1, 1)
+    low = int(match.group(1))
+    return (low, int(match.group(2) or low))
+
+
+def parse_placement(text):
+    """
+    Reduce a placement description to layout hints.
+
+    Returns:
+        dict: 'mount' ('floor', 'wall' or 'ceiling'), 'center', 'wall', 'door',
+            'corner', 'opposite' and 'head_wall' flags, and 'anchor_side' - where
+            relative to the room's central item (bed or table) the item belongs:
+            'head', 'foot', 'left', 'right', 'near' or None
+    """
+    text = text.lower()
+    mount = 'ceiling' if 'ceiling' in text else \
+        'wall' if 'wall-mounted' in text or 'wall mounted' in text or 'head wall' in text else 'floor'
+    anchor_side = None
+    if 'bed' in text or 'table' in text:
+        anchor_side = 'head' if 'head' in text else 'foot' if 'foot' in text else \
+            'right' if 'right side' in text else 'left' if 'left side' in text else 'near'
+    return {
+        'mount': mount,
+        'center': 'center of room' in text,
+        'head_wall': 'head against wall' in text,
+        'wall': 'along wall' in text or mount == 'wall',
+        'door': 'entrance' in text or 'door' in text,
+        'corner': 'corner' in text,
+        'opposite': 'opposite' in text,
+        'anchor_side': anchor_side,
+    }
+
+
+class EquipmentGeometry:
+    """
+    Parsed geometry of one room knowledge-base equipment entry.
+
+    Sizes are in feet; `clearance` is (front, right, back, left) in the item's
+    own frame. The placement hints are those of parse_placement().
+    """
+    __slots__ = ('name', 'width', 'depth', 'shape', 'clearance', 'min_quantity', 'max_quantity',
+                 'mount', 'center', 'head_wall', 'wall', 'door', 'corner', 'opposite', 'anchor_side')
+
+    def __init__(self, equipment):
+        """
+        Args:
+            equipment (dict): Room knowledge-base equipment entry
+        """
+        hints = parse_placement(equipment['placement'])
+        footprint = parse_dimensions(equipment['dimensions'])
+        if footprint is None:
+            footprint = (WALL_UNIT_FOOTPRINT if hints['mount'] == 'wall' else DEFAULT_FOOTPRINT) + ('rect',)
+        self.name = equipment['name']
+        self.width, self.depth, self.shape = footprint
+        self.clearance = parse_clearance(equipment['clearance'])
+        self.min_quantity, self.max_quantity = parse_quantity(equipment.get('quantity'))
+        for hint, value in hints.items():
+            setattr(self, hint, value)
+
+    @property
+    def floor_area(self):
+        """Footprint area in square feet."""
+        if self.shape == 'circle':
+            return np.pi * self.width * self.width / 4
+        return self.width * self.depth
+
+
+class RoomGeometry:
+    """
+    Parsed geometry of one room type: its area limits and equipment.
+
+    `equipment` holds an EquipmentGeometry per knowledge-base entry and
+    `footprints` the same data as a GEOMETRY_DTYPE structured array, row for row.
+    """
+    __slots__ = ('name', 'min_area', 'recommended_area', 'equipment', 'footprints')
+
+    def __init__(self, name, room_info):
+        """
+        Args:
+            name (str): Room type
+            room_info (dict): Room knowledge-base entry with an 'equipment' list
+        """
+        self.name = name
+        self.min_area = room_info['min_area']
+        self.recommended_area = room_info['recommended_area']
+        self.equipment = tuple(EquipmentGeometry(equipment) for equipment in room_info['equipment'])
+        self.footprints = np.array([(item.width, item.depth, item.clearance, item.min_quantity, item.max_quantity,
+                                     item.shape == 'circle', MOUNTS.index(item.mount))
+                                    for item in self.equipment], dtype=GEOMETRY_DTYPE)
+
+    def items(self, use_max_quantity=True):
+        """
+        Expand the room's equipment into one entry per unit.
+
+        Items with a quantity are repeated (the upper end of a "3-4 units" range
+        by default); repeats share one EquipmentGeometry.
+        """
+        return [item for item in self.equipment
+                for _ in range(item.max_quantity if use_max_quantity else item.min_quantity)]
+
+    def floor_area(self, use_max_quantity=True):
+        """Total equipment footprint in square feet, excluding ceiling-mounted items."""
+        footprints = self.footprints
+        quantity = footprints['max_quantity' if use_max_quantity else 'min_quantity']
+        area = np.where(footprints['circle'], np.pi * footprints['width'] ** 2 / 4,
+                        footprints['width'] * footprints['depth'])
+        return float((area * quantity)[footprints['mount'] != MOUNTS.index('ceiling')].sum())
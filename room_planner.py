@@ -2,243 +2,184 @@ import pandas as pd
 import numpy as np
 from sklearn.preprocessing import LabelEncoder
 from collections import defaultdict
+from functools import lru_cache
+
+from knowledge_base import KnowledgeBase
+from layout_solver import LayoutSolver
+from layout_validator import LayoutValidator
+from room_geometry import RoomGeometry
+
+# Bump when RoomPlanningIndex's layout changes so compiled snapshots are rebuilt
+INDEX_FORMAT = 2
+
+# area_compliance() statuses, worst first
+COMPLIANCE_STATUSES = ['unrecognized', 'no_area', 'below_minimum', 'below_recommended', 'adequate']
+
+# Width:depth ratio assumed when a layout is requested for an area rather than dimensions
+ROOM_ASPECT = 1.2
+
+
+def _equipment_details(equip):
+    """Recommendation text for one room equipment entry."""
+    details = f"{equip['name']}:\n"
+    details += f"  • Specifications: {equip['specs']}\n"
+    details += f"  • Dimensions: {equip['dimensions']}\n"
+    details += f"  • Placement: {equip['placement']}\n"
+    details += f"  • Required Clearance: {equip['clearance']}"
+    if 'quantity' in equip:
+        details += f"\n  • Quantity: {equip['quantity']}"
+    return details
+
+
+class RoomPlanningIndex:
+    """
+    Compiled form of the room knowledge base.
+
+    Everything the planner derives from the free-text entries is built here once
+    per knowledge-base version: the parsed RoomGeometry of each room type, its
+    formatted recommendation text, the lower-case room type lookups and the
+    (minimum, recommended) area of every room type.
+    """
+    __slots__ = ('data', 'geometry', 'recommendations', 'room_type_names', 'synonym_names', 'area_limits')
+
+    def __init__(self, data):
+        """
+        Args:
+            data (dict): Parsed knowledge_data/room_planning.json
+        """
+        self.data = data
+        self.geometry = {room_type: RoomGeometry(room_type, room_info)
+                         for room_type, room_info in data['room_equipment'].items()}
+        self.recommendations = {room_type: tuple(_equipment_details(equip) for equip in room_info['equipment'])
+                                for room_type, room_info in data['room_equipment'].items()}
+        # Synonym keys are lower case; room_equipment/room_dimensions use display names
+        self.room_type_names = {name.lower(): name
+                                for name in list(data['room_dimensions']) + list(data['room_equipment'])}
+        synonym_names = {}
+        for standard_name, synonyms in data['room_type_synonyms'].items():
+            for synonym in synonyms:
+                synonym_names.setdefault(synonym, self.room_type_names.get(standard_name, standard_name))
+        self.synonym_names = synonym_names
+        # Equipment specs win over room_dimensions, since layouts are sized by them
+        area_limits = {room_type: (limits['min_area'], limits['recommended_area'])
+                       for room_type, limits in data['room_dimensions'].items()}
+        area_limits.update((room_type, (geometry.min_area, geometry.recommended_area))
+                           for room_type, geometry in self.geometry.items())
+        self.area_limits = area_limits
+
+
+# Room knowledge base (synonyms, equipment, dimensions, layout guidelines); edits to
+# the data file are picked up without restarting
+_room_knowledge_base = KnowledgeBase('room_planning', compiler=RoomPlanningIndex, compiler_version=INDEX_FORMAT)
+
+
+def room_size(area):
+    """(width, depth) in feet of a room with the given area, at ROOM_ASPECT."""
+    width = round((area * ROOM_ASPECT) ** 0.5, 1)
+    return width, round(area / width, 1)
+
+
+def _as_series(values, index=None):
+    """A pandas Series from a list, array, Series or pyarrow array."""
+    if isinstance(values, pd.Series):
+        return values
+    if hasattr(values, 'to_pandas'):
+        values = values.to_pandas()
+        return values if index is None else values.set_axis(index)
+    return pd.Series(values, index=index)
+
+
+@lru_cache(maxsize=64)
+def _solve_layout(room_type, width, depth, seed, knowledge_base_version):
+    # Layouts are deterministic per inputs, so reruns of the same view reuse them
+    geometry = _room_knowledge_base.get().geometry[room_type]
+    return LayoutSolver(width, depth, seed=seed).solve(geometry.items())
+
+
+@lru_cache(maxsize=64)
+def _layout_validator(room_type, width, depth, knowledge_base_version):
+    # An editor validates the same room on every drag, so its validator is built once
+    return LayoutValidator(room_type, width, depth, planner=RoomPlanner())
+
 
 class RoomPlanner:
     def __init__(self):
+        # The knowledge base is shared; the attributes below read its current version
+        self.knowledge_base = _room_knowledge_base
+
+    @property
+    def room_type_synonyms(self):
         # NLP synonyms for room types to improve recognition
-        self.room_type_synonyms = {
-            "icu": ["icu", "intensive care", "intensive care unit", "critical care"],
-            "operating room": ["operating room", "or", "surgery room", "surgical suite", "operation theater"],
-            "emergency room": ["emergency room", "er", "emergency department", "ed", "a&e", "accident and emergency", "trauma room"],
-            "patient room": ["patient room", "hospital room", "inpatient room", "ward room", "recovery room"],
-            "laboratory": ["laboratory", "lab", "clinical lab", "testing lab", "diagnostic lab"],
-            "radiology": ["radiology", "imaging", "diagnostic imaging", "x-ray room", "mri room", "ct room"],
-            "pharmacy": ["pharmacy", "drug dispensary", "medication room", "dispensary"],
-            "physical therapy": ["physical therapy", "pt room", "rehabilitation", "rehab room", "therapy room"]
-        }
-        
-        # Detailed equipment specifications by room type
-        self.room_equipment = {
-            "ICU": {
-                "min_area": 250,
-                "recommended_area": 400,
-                "equipment": [
-                    {
-                        "name": "Patient Bed",
-                        "specs": "Electric adjustable ICU bed with side rails",
-                        "dimensions": "7.5ft x 3.3ft",
-                        "placement": "Center of room, head against wall",
-                        "clearance": "4ft on all sides"
-                    },
-                    {
-                        "name": "Patient Monitor",
-                        "specs": "Multi-parameter vital signs monitor",
-                        "dimensions": "1.5ft x 1ft",
-                        "placement": "Wall-mounted at head of bed",
-                        "clearance": "1ft around monitor"
-                    },
-                    {
-                        "name": "Ventilator",
-                        "specs": "ICU-grade mechanical ventilator",
-                        "dimensions": "2ft x 2ft",
-                        "placement": "Right side of bed head",
-                        "clearance": "2ft for access"
-                    },
-                    {
-                        "name": "Infusion Pumps",
-                        "specs": "Multiple channel smart pumps",
-                        "dimensions": "1ft x 1ft each",
-                        "placement": "Left side of bed",
-                        "quantity": "3-4 units",
-                        "clearance": "1.5ft for access"
-                    },
-                    {
-                        "name": "Supply Cart",
-                        "specs": "Mobile medical supply cart",
-                        "dimensions": "3ft x 2ft",
-                        "placement": "Along wall, easy access",
-                        "clearance": "3ft in front"
-                    },
-                    {
-                        "name": "Code Cart",
-                        "specs": "Emergency resuscitation cart",
-                        "dimensions": "2.5ft x 2ft",
-                        "placement": "Near room entrance",
-                        "clearance": "4ft for emergency access"
-                    }
-                ],
-                "layout_guidelines": [
-                    "Maintain 4ft clearance around bed for 360° patient access",
-                    "Position bed to allow direct line of sight from nurse station",
-                    "Keep emergency equipment (code cart) near entrance for quick access",
-                    "Group infusion pumps and monitors on patient's left side",
-                    "Ensure adequate space for family seating area",
-                    "Maintain clear path to head of bed for emergency procedures"
-                ]
-            },
-            "Operating Room": {
-                "min_area": 400,
-                "recommended_area": 600,
-                "equipment": [
-                    {
-                        "name": "Operating Table",
-                        "specs": "Electric surgical table with articulation",
-                        "dimensions": "6.5ft x 2.5ft",
-                        "placement": "Center of room",
-                        "clearance": "6ft on all sides"
-                    },
-                    {
-                        "name": "Surgical Lights",
-                        "specs": "Dual-head LED surgical lights",
-                        "dimensions": "Ceiling mounted, 2ft diameter each",
-                        "placement": "Ceiling mounted over table",
-                        "clearance": "Height adjustable"
-                    },
-                    {
-                        "name": "Anesthesia Machine",
-                        "specs": "Complete anesthesia workstation",
-                        "dimensions": "2.5ft x 2.5ft",
-                        "placement": "At head of table",
-                        "clearance": "3ft for anesthesiologist"
-                    },
-                    {
-                        "name": "Surgical Equipment Cart",
-                        "specs": "Sterile instrument cart",
-                        "dimensions": "4ft x 2ft",
-                        "placement": "Right side of table",
-                        "clearance": "3ft for scrub nurse"
-                    },
-                    {
-                        "name": "Imaging Equipment",
-                        "specs": "Mobile C-arm X-ray unit",
-                        "dimensions": "6ft x 3ft when deployed",
-                        "placement": "Parked at foot of table when needed",
-                        "clearance": "5ft swing radius"
-                    },
-                    {
-                        "name": "Supply Cabinets",
-                        "specs": "Wall-mounted medical supply storage",
-                        "dimensions": "6ft x 2ft",
-                        "placement": "Along walls",
-                        "clearance": "4ft in front"
-                    }
-                ],
-                "layout_guidelines": [
-                    "Position table to allow 360° access with 6ft clearance",
-                    "Ensure adequate overhead lighting coverage",
-                    "Maintain sterile field boundaries",
-                    "Plan for equipment power and gas connections",
-                    "Allow space for mobile imaging equipment",
-                    "Create separate clean and dirty utility areas"
-                ]
-            },
-            "Emergency Room": {
-                "min_area": 250,
-                "recommended_area": 350,
-                "equipment": [
-                    {
-                        "name": "Trauma/Resuscitation Bed",
-                        "specs": "Specialized emergency treatment bed with X-ray capability",
-                        "dimensions": "7ft x 3ft",
-                        "placement": "Center of room with 360° access",
-                        "clearance": "5ft on all sides"
-                    },
-                    {
-                        "name": "Defibrillator/Monitor",
-                        "specs": "Combined defibrillator with multi-parameter vital signs monitoring",
-                        "dimensions": "1.5ft x 1.5ft",
-                        "placement": "Wall-mounted or on mobile stand at head of bed",
-                        "clearance": "2ft for quick access"
-                    },
-                    {
-                        "name": "Crash Cart",
-                        "specs": "Emergency medication and equipment cart",
-                        "dimensions": "3ft x 2ft",
-                        "placement": "Near head of bed",
-                        "clearance": "3ft for rapid access in emergencies"
-                    },
-                    {
-                        "name": "Suction Equipment",
-                        "specs": "Wall-mounted medical suction unit",
-                        "dimensions": "1ft x 1ft",
-                        "placement": "Wall-mounted at head of bed",
-                        "clearance": "1ft for access"
-                    },
-                    {
-                        "name": "Oxygen Supply System",
-                        "specs": "Medical gas outlets with flow regulators",
-                        "dimensions": "Wall-mounted system",
-                        "placement": "Head wall near bed",
-                        "clearance": "1.5ft for connections"
-                    },
-                    {
-                        "name": "Supply Storage",
-                        "specs": "Cabinets with immediate access supplies",
-                        "dimensions": "5ft x 2ft",
-                        "placement": "Along wall opposite to bed",
-                        "clearance": "3ft in front"
-                    },
-                    {
-                        "name": "Mobile X-ray Unit",
-                        "specs": "Portable diagnostic imaging equipment",
-                        "dimensions": "4ft x 2ft",
-                        "placement": "Parked in corner when not in use",
-                        "clearance": "Access pathway of 4ft"
-                    }
-                ],
-                "layout_guidelines": [
-                    "Central placement of bed with 360° access for resuscitation efforts",
-                    "Critical equipment (defibrillator, suction) must be within arm's reach",
-                    "Maintain clear pathway from door to bed for rapid access",
-                    "Equipment organization must follow resuscitation protocols",
-                    "All monitoring equipment must be visible from main work area",
-                    "Ensure trauma team has adequate space to work (minimum 5-7 providers)",
-                    "Maintain separate clean and contaminated areas"
-                ]
-            }
-        }
-        self.room_equipment_mapping = {
-            'ICU': ['Patient Monitor', 'Ventilator', 'Infusion Pump', 'Defibrillator', 'Vital Signs Monitor'],
-            'Operating Room': ['Anesthesia Machine', 'Surgical Table', 'Surgical Lights', 'Patient Monitor', 'Electrosurgical Unit'],
-            'Emergency Room': ['Patient Monitor', 'Defibrillator', 'ECG Machine', 'Crash Cart', 'Portable X-ray'],
-            'Patient Room': ['Hospital Bed', 'Patient Monitor', 'Infusion Pump', 'Over-bed Table', 'Blood Pressure Monitor'],
-            'Laboratory': ['Centrifuge', 'Microscope', 'Analyzer', 'Refrigerator', 'Lab Information System'],
-            'Radiology': ['X-ray Machine', 'CT Scanner', 'MRI Machine', 'Ultrasound Machine', 'PACS Workstation'],
-            'Pharmacy': ['Medicine Cabinet', 'Refrigerator', 'Laminar Flow Hood', 'Pill Counter', 'Label Printer'],
-            'Physical Therapy': ['Treadmill', 'Exercise Bike', 'Parallel Bars', 'Ultrasound Therapy', 'TENS Unit']
-        }
-        self.room_dimensions = {
-            'ICU': {'min_area': 250, 'recommended_area': 300},
-            'Operating Room': {'min_area': 400, 'recommended_area': 600},
-            'Emergency Room': {'min_area': 200, 'recommended_area': 250},
-            'Patient Room': {'min_area': 180, 'recommended_area': 200},
-            'Laboratory': {'min_area': 300, 'recommended_area': 400},
-            'Radiology': {'min_area': 350, 'recommended_area': 450},
-            'Pharmacy': {'min_area': 200, 'recommended_area': 300},
-            'Physical Therapy': {'min_area': 400, 'recommended_area': 500}
-        }
+        return self.knowledge_base.get().data['room_type_synonyms']
 
-    def standardize_room_type(self, input_room_type):
-        """Match user input to standardized room type using NLP matching."""
+    @property
+    def room_equipment(self):
+        return self.knowledge_base.get().data['room_equipment']
+
+    @property
+    def room_equipment_mapping(self):
+        return self.knowledge_base.get().data['room_equipment_mapping']
+
+    @property
+    def room_dimensions(self):
+        return self.knowledge_base.get().data['room_dimensions']
+
+    def room_geometry(self, room_type):
+        """Parsed RoomGeometry of a standardized room type, or None for types without equipment specs."""
+        return self.knowledge_base.get().geometry.get(room_type)
+
+    def area_limits(self, room_type):
+        """(minimum, recommended) area in sq ft of a standardized room type, or None if unknown."""
+        return self.knowledge_base.get().area_limits.get(room_type)
+
+    def room_type_phrases(self):
+        """Lower-case names, then synonyms, of every room type, mapped to its standard name."""
+        index = self.knowledge_base.get()
+        phrases = dict(index.room_type_names)
+        for synonym, name in index.synonym_names.items():
+            phrases.setdefault(synonym, name)
+        return phrases
+
+    @property
+    def knowledge_base_version(self):
+        """Fingerprint of the planner's knowledge base, used to invalidate cached answers."""
+        return self.knowledge_base.version
+
+    def standardize_room_type(self, input_room_type, strict=False):
+        """
+        Match user input to standardized room type using NLP matching.
+
+        Args:
+            input_room_type (str): Room type as typed or recorded
+            strict (bool): Accept only exact names and synonyms. Bulk records are
+                matched strictly, as the partial match would take "Storage" for an
+                operating room ("or")
+
+        Returns:
+            str: Standard room type name, or None if not recognized
+        """
         if not input_room_type:
             return None
             
         input_room_type = input_room_type.lower().strip()
+        index = self.knowledge_base.get()
         
         # Direct match to standard name
-        if input_room_type in self.room_equipment:
-            return input_room_type
+        if input_room_type in index.room_type_names:
+            return index.room_type_names[input_room_type]
         
         # Check synonyms
-        for standard_name, synonyms in self.room_type_synonyms.items():
-            if input_room_type in synonyms:
-                return standard_name
+        if input_room_type in index.synonym_names:
+            return index.synonym_names[input_room_type]
+
+        if strict:
+            return None
         
         # Partial matching (if user enters partial name)
-        for standard_name, synonyms in self.room_type_synonyms.items():
+        for standard_name, synonyms in index.data['room_type_synonyms'].items():
             for synonym in synonyms:
                 if synonym in input_room_type or input_room_type in synonym:
-                    return standard_name
+                    return index.room_type_names.get(standard_name, standard_name)
         
         return None
                 
@@ -256,76 +197,138 @@ class RoomPlanner:
                 'layout_guidelines': []
             }
         
-        room_info = self.room_equipment[std_room_type]
+        index = self.knowledge_base.get()
+        geometry = index.geometry[std_room_type]
         
         # Area analysis
         area_status = None
         if area:
-            if area < room_info['min_area']:
-                area_status = f'WARNING: The provided area of {area} sq ft is below the minimum recommended area of {room_info["min_area"]} sq ft for a {room_type}.'
-            elif area < room_info['recommended_area']:
-                area_status = f'The provided area of {area} sq ft meets minimum requirements but is below the recommended {room_info["recommended_area"]} sq ft for optimal {room_type} layout.'
+            if area < geometry.min_area:
+                area_status = f'WARNING: The provided area of {area} sq ft is below the minimum recommended area of {geometry.min_area} sq ft for a {room_type}.'
+            elif area < geometry.recommended_area:
+                area_status = f'The provided area of {area} sq ft meets minimum requirements but is below the recommended {geometry.recommended_area} sq ft for optimal {room_type} layout.'
             else:
                 area_status = f'The provided area of {area} sq ft is adequate for a {room_type}.'
         else:
-            area_status = f'Recommended minimum area: {room_info["min_area"]} sq ft, Optimal area: {room_info["recommended_area"]} sq ft'
-        
-        # Format equipment details
-        equipment_details = []
-        for equip in room_info['equipment']:
-            details = f"{equip['name']}:\n"
-            details += f"  • Specifications: {equip['specs']}\n"
-            details += f"  • Dimensions: {equip['dimensions']}\n"
-            details += f"  • Placement: {equip['placement']}\n"
-            details += f"  • Required Clearance: {equip['clearance']}"
-            if 'quantity' in equip:
-                details += f"\n  • Quantity: {equip['quantity']}"
-            equipment_details.append(details)
+            area_status = f'Recommended minimum area: {geometry.min_area} sq ft, Optimal area: {geometry.recommended_area} sq ft'
         
+        # Equipment details are formatted once per knowledge-base version
         return {
             'room_type': std_room_type,
             'area_status': area_status,
-            'recommendations': equipment_details,
-            'layout_guidelines': room_info['layout_guidelines']
+            'recommendations': list(index.recommendations[std_room_type]),
+            'layout_guidelines': self.room_equipment[std_room_type]['layout_guidelines']
         }
 
+    def area_compliance(self, room_types, areas):
+        """
+        Check many rooms' areas against their room type's limits at once.
+
+        Room types may be any exact room type name or synonym (e.g. the
+        equipment dataset's soa_room_type codes); other rooms, such as storage or
+        corridors, are 'unrecognized'. Each distinct spelling is standardized once
+        and the limits are gathered and compared as arrays.
+
+        Args:
+            room_types (array-like): Room type per room; a list, NumPy array,
+                pandas Series or pyarrow array
+            areas (array-like): Area per room in sq ft; missing or non-positive
+                areas get status 'no_area'
+
+        Returns:
+            pd.DataFrame: One row per room (indexed like `room_types` when it is
+                a Series) with the input 'room_type' and 'area', the
+                'standard_room_type', 'min_area', 'recommended_area', a categorical
+                'status' (one of COMPLIANCE_STATUSES) and the 'shortfall' in sq ft
+                below the recommended area. Limits come from the room dimensions,
+                overridden by the equipment specs where a room type has both
+        """
+        types = _as_series(room_types)
+        areas = pd.to_numeric(_as_series(areas, index=types.index), errors='coerce').to_numpy(dtype=float)
+        if len(areas) != len(types):
+            raise ValueError(f"Got {len(types)} room types but {len(areas)} areas")
+
+        codes, uniques = pd.factorize(types)
+        limits = self.knowledge_base.get().area_limits
+        standard = [self.standardize_room_type(str(value), strict=True) for value in uniques]
+        # Spellings of one room type share a category; the trailing entry is for
+        # missing types, which factorize codes as -1
+        categories = list(dict.fromkeys(name for name in standard if name is not None))
+        standard_codes = np.array([categories.index(name) if name is not None else -1 for name in standard] + [-1])
+        min_area = np.array([limits[name][0] if name in limits else np.nan for name in standard] + [np.nan])
+        recommended_area = np.array([limits[name][1] if name in limits else np.nan for name in standard] + [np.nan])
+        min_area, recommended_area = min_area[codes], recommended_area[codes]
+
+        known = ~np.isnan(recommended_area)
+        has_area = areas > 0
+        status = np.select([~known, ~has_area, areas < min_area, areas < recommended_area],
+                           range(4), default=4)
+        return pd.DataFrame({
+            'room_type': types.array,
+            'area': areas,
+            'standard_room_type': pd.Categorical.from_codes(standard_codes[codes], categories=categories),
+            'min_area': min_area,
+            'recommended_area': recommended_area,
+            'status': pd.Categorical.from_codes(status, categories=COMPLIANCE_STATUSES, ordered=True),
+            'shortfall': np.where(known & has_area, np.clip(recommended_area - areas, 0, None), np.nan),
+        }, index=types.index)
+
+    def plan_layout(self, room_type, width=None, depth=None, seed=0):
+        """
+        Solve an equipment layout for a room.
+
+        Args:
+            room_type (str): Room type (any recognized spelling)
+            width (float): Room width in feet; with depth omitted, both are derived
+                from the room type's recommended area
+            depth (float): Room depth in feet
+            seed (int): Solver seed
+
+        Returns:
+            dict: LayoutSolver.solve() result (shared between callers, do not
+                modify), or None for room types without equipment specs
+        """
+        geometry = self.room_geometry(self.standardize_room_type(room_type))
+        if geometry is None:
+            return None
+        if width is None or depth is None:
+            width, depth = room_size(geometry.recommended_area)
+        return _solve_layout(geometry.name, float(width), float(depth), seed, self.knowledge_base_version)
+
+    def validate_layout(self, room_type, items, width=None, depth=None):
+        """
+        Check a proposed equipment arrangement against the room's clearances.
+
+        Args:
+            room_type (str): Room type (any recognized spelling)
+            items (list): Placed items, as taken by LayoutValidator.validate()
+            width (float): Room width in feet; with depth omitted, both are derived
+                from the room type's recommended area
+            depth (float): Room depth in feet
+
+        Returns:
+            dict: LayoutValidator.validate() result, or None for room types
+                without equipment specs
+        """
+        geometry = self.room_geometry(self.standardize_room_type(room_type))
+        if geometry is None:
+            return None
+        if width is None or depth is None:
+            width, depth = room_size(geometry.recommended_area)
+        return _layout_validator(geometry.name, float(width), float(depth), self.knowledge_base_version).validate(items)
+
     def get_layout_guidelines(self, room_type):
         """Get layout guidelines for a specific room type."""
-        guidelines = {
-            'ICU': [
-                "Place patient monitor at head of bed for clear visibility",
-                "Position ventilator on the head wall",
-                "Keep defibrillator easily accessible near the entrance",
-                "Arrange infusion pumps on either side of the bed",
-                "Ensure 360-degree access around the bed"
-            ],
-            'Operating Room': [
-                "Center surgical table in the room",
-                "Mount surgical lights directly above the table",
-                "Position anesthesia machine at head of table",
-                "Keep surgical equipment on mobile carts for flexibility",
-                "Ensure adequate space for staff movement around table"
-            ],
-            'Emergency Room': [
-                "Position bed against the wall with access from three sides",
-                "Keep crash cart near the entrance",
-                "Mount patient monitor on wall at head of bed",
-                "Ensure easy access to medical gas outlets",
-                "Maintain clear path to entrance/exit"
-            ],
-            'Patient Room': [
-                "Place bed against wall with window view if possible",
-                "Position over-bed table on the dominant hand side",
-                "Mount patient monitor on wall at head of bed",
-                "Keep visitor seating away from medical equipment",
-                "Ensure clear path to bathroom"
-            ]
-            # Add more room types as needed
-        }
+        guidelines = self.knowledge_base.get().data['layout_guidelines']
         return guidelines.get(room_type, ["No specific layout guidelines available for this room type."])
 
-    def analyze_room_compatibility(self, room_type, equipment_list):
-        """Analyze if the provided equipment list is compatible with the room type."""
+    def analyze_room_compatibility(self, room_type, equipment_list, placements=None):
+        """
+        Analyze if the provided equipment list is compatible with the room type.
+
+        With `placements` (placed items as taken by validate_layout()), the
+        arrangement's clearances are checked too, under 'layout_validation'.
+        """
         if room_type not in self.room_equipment_mapping:
             return {
                 'status': 'error',
@@ -341,10 +344,20 @@ class RoomPlanner:
         
         compatibility_score = len(provided_equipment.intersection(recommended_equipment)) / len(recommended_equipment) * 100
         
+        # Floor space the provided equipment takes up, for room types with parsed geometry
+        geometry = self.room_geometry(room_type)
+        floor_area = None
+        if geometry is not None:
+            floor_area = round(sum(item.floor_area * item.max_quantity for item in geometry.equipment
+                                   if item.name in provided_equipment and item.mount != 'ceiling'), 2)
+        
         return {
             'status': 'success',
             'compatibility_score': round(compatibility_score, 2),
             'missing_equipment': list(missing_essential),
             'extra_equipment': list(extra_equipment),
-            'recommendations': self.get_equipment_recommendations(room_type)
+            'equipment_floor_area': floor_area,
+            'floor_area_share': round(floor_area / geometry.recommended_area * 100, 2) if floor_area is not None else None,
+            'recommendations': self.get_equipment_recommendations(room_type),
+            'layout_validation': self.validate_layout(room_type, placements) if placements is not None else None
         }
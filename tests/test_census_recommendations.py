@@ -0,0 +1,46 @@
+import pandas as pd
+
+import census_recommendations
+from census_recommendations import DEMAND_OUTPUT, PATIENT_OUTPUT, process_chunk, run_census
+
+CENSUS = pd.DataFrame({
+    'patient_id': ['p1', 'p2', 'p3', 'p4', 'p5'],
+    'unit': ['ICU', 'ICU', 'Ward', None, 'Ward'],
+    'conditions': ['Sepsis', 'Sepsis;Diabetes', 'Pneumonia', 'Pneumonia', 'Diabetes'],
+    'age': [70, 45, 30, 60, None],
+    'acuity': [5, 4, 2, 3, None],
+})
+
+
+def fractional_chunk(chunk, *args):
+    """process_chunk with fractional score totals, standing in for blended scores."""
+    rows, demand = process_chunk(chunk, *args)
+    demand['total_priority_score'] += 0.25
+    return rows, demand
+
+
+def test_chunk_demand_sums_patient_rows():
+    rows, demand = process_chunk(CENSUS, top_n=4)
+    assert set(rows['unit']) == {'ICU', 'Ward', census_recommendations.UNASSIGNED_UNIT}
+    assert rows.groupby('patient_id').size().max() <= 4
+
+    grouped = rows.groupby(['unit', 'equipment'])['priority_score']
+    assert demand['patients'].sort_index().tolist() == grouped.size().sort_index().tolist()
+    assert demand['total_priority_score'].sort_index().tolist() == grouped.sum().sort_index().tolist()
+
+
+def test_census_demand_keeps_fractional_totals(tmp_path, monkeypatch):
+    census = tmp_path / 'census.csv'
+    CENSUS.to_csv(census, index=False)
+    monkeypatch.setattr(census_recommendations, 'process_chunk', fractional_chunk)
+    stats = run_census(str(census), str(tmp_path), top_n=4, chunk_rows=2, workers=1)
+    assert stats['patients'] == len(CENSUS)
+
+    rows = pd.read_csv(tmp_path / PATIENT_OUTPUT)
+    demand = pd.read_csv(tmp_path / DEMAND_OUTPUT)
+    assert demand['patients'].dtype == 'int64'
+    assert demand['patients'].sum() == len(rows)
+    # Each (unit, equipment) pair gained 0.25 from every chunk it appeared in
+    assert (demand['total_priority_score'] % 1 != 0).any()
+    for unit, group in demand.groupby('unit'):
+        assert group['patients'].is_monotonic_decreasing
@@ -0,0 +1,21 @@
+import pyarrow as pa
+
+from demand_forecast import inventory_counts
+
+TABLE = pa.table({
+    'equipment_name': pa.array(['IV Pump', 'IV Pumps', ' iv-pump ', 'Ventilator', None, 'Bed']).dictionary_encode(),
+    'location': ['ICU', 'ICU', 'Ward', 'ICU', 'ICU', 'Ward'],
+})
+
+
+def test_spellings_of_a_type_are_counted_together():
+    assert inventory_counts(['IV Pump', 'iv pumps', 'Ventilators', 'Monitor'], table=TABLE) == \
+        {'IV Pump': 3, 'iv pumps': 3, 'Ventilators': 1, 'Monitor': 0}
+
+
+def test_unit_limits_the_rows_counted():
+    assert inventory_counts(['IV Pump', 'Bed'], unit='ICU', table=TABLE) == {'IV Pump': 2, 'Bed': 0}
+
+
+def test_export_without_name_column_counts_nothing():
+    assert inventory_counts(['IV Pump'], table=TABLE.drop_columns(['equipment_name'])) == {'IV Pump': 0}
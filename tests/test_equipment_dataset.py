@@ -0,0 +1,52 @@
+import pandas as pd
+import pyarrow.feather as feather
+from openpyxl import Workbook
+
+from equipment_dataset import STORE_PATH, dataset_version, load_project_table, refresh_dataset
+
+HEADER = ['asset_id', 'project_id', 'status', 'cost']
+FIRST = [[1, 1, 'Active', 10.5], [2, 1, 'Active', 20.0], [3, 2, 'Retired', 5.0]]
+# Asset 2 updated, asset 3 deleted, asset 4 inserted
+SECOND = [[1, 1, 'Active', 10.5], [2, 1, 'Retired', 20.0], [4, 2, 'Active', 7.5]]
+
+
+def write_xlsx(path, rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+def write_csv(path, rows):
+    pd.DataFrame(rows, columns=HEADER).to_csv(path, index=False)
+    return str(path)
+
+
+def check_refreshes(write, tmp_path, suffix):
+    first = refresh_dataset(write(tmp_path / f'first{suffix}', FIRST))
+    assert first['inserted'] == 3
+    second = refresh_dataset(write(tmp_path / f'second{suffix}', SECOND))
+    assert (second['inserted'], second['updated'], second['deleted']) == (1, 1, 1)
+    assert second['version'] == dataset_version() == first['version'] + 1
+
+    store = feather.read_table(STORE_PATH).to_pandas().sort_values('asset_id')
+    assert store['asset_id'].tolist() == [1, 2, 4]
+    assert store['status'].astype(str).tolist() == ['Active', 'Retired', 'Active']
+    assert sorted(load_project_table(2).column('asset_id').to_pylist()) == [4]
+
+    # Applying the same export again changes nothing
+    third = refresh_dataset(write(tmp_path / f'third{suffix}', SECOND))
+    assert (third['inserted'], third['updated'], third['deleted']) == (0, 0, 0)
+
+
+def test_refresh_xlsx_export_twice(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    check_refreshes(write_xlsx, tmp_path, '.xlsx')
+
+
+def test_refresh_csv_export_twice(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    check_refreshes(write_csv, tmp_path, '.csv')
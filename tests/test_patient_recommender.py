@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+import learned_recommender
+from benchmarks import build_patient_corpus
+from learned_recommender import LearnedScorer, train
+from patient_recommender import PatientRecommender
+
+# Fewer profiles than patients, so the batch path also dedups repeated profiles
+PATIENTS = build_patient_corpus(40, seed=3)
+PATIENTS += PATIENTS[:10]
+
+
+@pytest.fixture
+def trained_scorer(tmp_path, monkeypatch):
+    """A learned scorer that get_learned_scorer() hands out, as if a model had been trained."""
+    rng = random.Random(0)
+    recommender = PatientRecommender(use_memo=False)
+    allocations = [[item['name'] for item in recommender.get_recommendations(patient, top_k=6)['recommendations']
+                    if rng.random() < 0.9] for patient in PATIENTS]
+    path = str(tmp_path / 'learned_recommender.npz')
+    train(PATIENTS, allocations, recommender).save(path)
+    scorer = LearnedScorer(path)
+    monkeypatch.setattr(learned_recommender, 'get_learned_scorer', lambda path=None: scorer)
+    return scorer
+
+
+def singles(top_k):
+    recommender = PatientRecommender(use_memo=False)
+    return [recommender.get_recommendations(patient, top_k=top_k) for patient in PATIENTS]
+
+
+@pytest.mark.parametrize('top_k', [None, 5])
+def test_batch_matches_single_path(top_k):
+    assert PatientRecommender().get_recommendations_batch(PATIENTS, top_k=top_k) == singles(top_k)
+
+
+@pytest.mark.parametrize('top_k', [None, 5])
+def test_batch_ignores_trained_scorer_by_default(trained_scorer, top_k):
+    assert PatientRecommender().get_recommendations_batch(PATIENTS, top_k=top_k) == singles(top_k)
+
+
+def test_batch_blends_trained_scorer_when_asked(trained_scorer):
+    results = PatientRecommender().get_recommendations_batch(PATIENTS, top_k=5, learned=True)
+    expected = trained_scorer.recommend_batch(PATIENTS, top_k=5)
+    assert [[item['name'] for item in result['recommendations']] for result in results] == \
+        [[item['name'] for item in items] for items in expected]
+    assert all('learned_probability' in item for result in results for item in result['recommendations'])
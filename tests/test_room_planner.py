@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+
+from room_planner import RoomPlanner
+
+
+def test_area_compliance_leaves_non_clinical_rooms_unrecognized():
+    result = RoomPlanner().area_compliance(['Storage', 'Corridor', 'Store room', 'Janitor closet'], [100] * 4)
+    assert (result['status'] == 'unrecognized').all()
+    assert result['standard_room_type'].isna().all()
+    assert result['shortfall'].isna().all()
+
+
+def test_area_compliance_statuses():
+    planner = RoomPlanner()
+    minimum, recommended = planner.area_limits('ICU')
+    types = pd.Series(['ICU', 'icu', 'intensive care', 'ICU', None], index=[10, 11, 12, 13, 14])
+    result = planner.area_compliance(types, [recommended, minimum, minimum - 1, np.nan, 500])
+    assert list(result.index) == [10, 11, 12, 13, 14]
+    assert list(result['status']) == ['adequate', 'below_recommended', 'below_minimum', 'no_area', 'unrecognized']
+    assert list(result['standard_room_type'][:4]) == ['ICU'] * 4
+    assert result['shortfall'][12] == recommended - minimum + 1